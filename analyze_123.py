@@ -1,23 +1,24 @@
 import re
+import sys
 from collections import Counter
+from pathlib import Path
+
+from log_source import LogSource
+
+LOG_FILE = Path(__file__).resolve().parent / "20251216.log"
 
 def analyze_123_failures(file_path):
     try:
-        with open(file_path, 'r', encoding='utf-16') as f:
-            lines = f.readlines()
-    except:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-        except Exception as e:
-            print(f"Error: {e}")
-            return
+        src = LogSource(file_path)
+    except OSError as e:
+        print(f"Error: {e}")
+        return
 
     steps_failed = []
     
-    # Iterate through lines and look for "STRATEGY 1-2-3: Passo X ... Falhou"
-    for line in lines:
-        if "STRATEGY 1-2-3" in line and "Falhou" in line:
+    # Only lines with "STRATEGY 1-2-3" are decoded; look for "Passo X ... Falhou"
+    for line in src.marked_lines(("STRATEGY 1-2-3",)):
+        if "Falhou" in line:
             # Extract step name
             match = re.search(r"Passo (\d+)", line)
             if match:
@@ -32,4 +33,4 @@ def analyze_123_failures(file_path):
         print(f"{step}: {count} ({percentage:.1f}%)")
 
 if __name__ == "__main__":
-    analyze_123_failures("/media/nexustecnologies/Documentos/EA_Projetos/Vertex_Logic_EA/Vertex_Logic_EA/20251216.log")
+    analyze_123_failures(sys.argv[1] if len(sys.argv) > 1 else LOG_FILE)
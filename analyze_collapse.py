@@ -1,27 +1,25 @@
 import re
 import sys
-from datetime import datetime
+from pathlib import Path
 
-def parse_logs(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-16') as f:
-            lines = f.readlines()
-    except UnicodeError:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-        except:
-            with open(file_path, 'r', encoding='latin-1') as f:
-                lines = f.readlines()
+from log_events import split_line
+from log_index import lines_between
+from log_source import LogSource
+from log_time import parse_ts
 
-    # Regex patterns
-    # 2023.01.26 04:00:00 [INFO] Sinal detectado! Bar=1, Entry=-1, Strength=-3, Confluence=50.0%
-    signal_regex = r"(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*Sinal detectado!.*Entry=([-\d]+).*Strength=([-\d]+)"
+def parse_logs(file_path, collapse_date="2023.01.26"):
+    # Só os dias a partir do colapso: com o índice (.event_cache/*.idx) a
+    # leitura pula direto para eles; na primeira vez o índice é montado.
+    lines = lines_between(LogSource(file_path), first_day=collapse_date)
+
+    # Regex patterns (aplicados à mensagem, depois do prefixo do tester)
+    # Sinal detectado! Bar=1, Entry=-1, Strength=-3, Confluence=50.0%
+    signal_regex = re.compile(r"Sinal detectado!.*Entry=([-\d]+).*Strength=([-\d]+)")
     
-    # 2023.01.26 06:15:00 [INFO] Posição fechada - Lucro: -18.32 | Razão: Stop Loss
-    close_regex = r"(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*Posição fechada - Lucro:\s*([\d\.\-]+)\s*\|\s*Razão:\s*(.+)"
+    # Posição fechada - Lucro: -18.32 | Razão: Stop Loss
+    close_regex = re.compile(r"Posição fechada - Lucro:\s*([\d\.\-]+)\s*\|\s*Razão:\s*(.+)")
 
-    collapse_start = datetime.strptime("2023.01.26", "%Y.%m.%d")
+    collapse_start = parse_ts(f"{collapse_date} 00:00:00")
     
     signals = []
     trades = []
@@ -32,35 +30,27 @@ def parse_logs(file_path):
     print("-" * 60)
 
     for line in lines:
-        # Extract Timestamp
-        # Assuming timestamp is always at index 0-19 in the line part after the core info
-        # But looking at the log format: "Tag 0 Time Core Date Time Msg"
-        # We'll use regex to grab the first date-time occurrence
-        
-        timestamp_match = re.search(r"\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}", line)
-        if not timestamp_match:
+        # Timestamp do tester: split_line() fatia o prefixo de largura fixa
+        rec = split_line(line)
+        if rec is None:
             continue
             
-        current_dt_str = timestamp_match.group(0)
-        current_dt = datetime.strptime(current_dt_str, "%Y.%m.%d %H:%M:%S")
-        
-        if current_dt < collapse_start:
-            continue
+        current_dt_str = rec.ts
 
         # Check for Signal
-        sig_match = re.search(signal_regex, line)
+        sig_match = signal_regex.search(rec.msg)
         if sig_match:
-            entry_dir = int(sig_match.group(2))
-            strength = int(sig_match.group(3))
+            entry_dir = int(sig_match.group(1))
+            strength = int(sig_match.group(2))
             direction = "BUY" if entry_dir == 1 else "SELL" if entry_dir == -1 else "NONE"
             print(f"{current_dt_str} | SIGNAL     | {direction} (Str: {strength})")
             continue
 
         # Check for Close
-        close_match = re.search(close_regex, line)
+        close_match = close_regex.search(rec.msg)
         if close_match:
-            profit = float(close_match.group(2))
-            reason = close_match.group(3)
+            profit = float(close_match.group(1))
+            reason = close_match.group(2)
             result = "WIN" if profit > 0 else "LOSS"
             print(f"{current_dt_str} | {result:<8} | Profit: {profit:>6.2f} [{reason}]")
 
@@ -68,4 +58,4 @@ if __name__ == "__main__":
     if len(sys.argv) > 1:
         parse_logs(sys.argv[1])
     else:
-        parse_logs("20251215.log")
+        parse_logs(Path(__file__).resolve().parent / "20251215.log")
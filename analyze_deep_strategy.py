@@ -7,102 +7,162 @@ FOCO: Por que o EA tem sinais falsos e não é lucrativo?
 """
 
 import re
+import sys
 import pandas as pd
 import numpy as np
 from collections import defaultdict
 from datetime import datetime
+from pathlib import Path
 
-LOG_FILE = "20251217_utf8.log"
+from log_events import dispatch
+from log_source import LogSource
+
+LOG_FILE = Path(__file__).resolve().parent / "20251217.log"
+
+# Parsers por evento, despachados pelo literal inicial da mensagem
+# (log_events.dispatch). Cada um devolve (tipo, dados) ou None.
+SIGNAL_RE = re.compile(r'Sinal detectado.*Entry=(-?\d+), Strength=(-?\d+), Confluence=([\d.]+)%')
+TRADE_OPEN_RE = re.compile(r'TRADE: (BUY|SELL) @ ([\d.]+).*SL: ([\d.]+).*TP: ([\d.]+)')
+TRADE_CLOSE_RE = re.compile(r'TRADE CLOSED: (WIN|LOSS).*Profit: ([\-\d.]+)')
+PASSO_FAIL_RE = re.compile(r'STRATEGY 1-2-3: Passo ([123]).*Falhou')
+RSIOMA_BLOCK_RE = re.compile(r'RSIOMA FILTRO:.*(bloqueado|Block)')
+RSIOMA_APPROVED_RE = re.compile(r'RSIOMA ESTADO: APROVADO \((\d+\.\d+) ([><]) (\d+\.\d+)\)')
+RSIOMA_BLOCKED_RE = re.compile(r'RSIOMA FILTRO: (BUY|SELL) bloqueado.*RSI\(([\d.]+)\).*(\d+)')
+OBV_BLOCK_RE = re.compile(r'OBV MACD:.*(REJEITADO|BLOQUEADO)')
+
+PASSO_REASONS = {'1': 'Passo1_Trend', '2': 'Passo2_RSIOMA', '3': 'Passo3_OBV'}
+
+def _parse_signal(rec):
+    m = SIGNAL_RE.match(rec.msg)
+    return m and ('signal', (int(m.group(1)), int(m.group(2)), float(m.group(3))))
+
+def _parse_strategy(rec):
+    m = PASSO_FAIL_RE.match(rec.msg)
+    return m and ('rejection', PASSO_REASONS[m.group(1)])
+
+def _parse_rsioma(rec):
+    m = RSIOMA_APPROVED_RE.match(rec.msg)
+    if m:
+        return 'rsioma_approved', {
+            'rsi': float(m.group(1)),
+            'operator': m.group(2),
+            'ma': float(m.group(3))
+        }
+    if not RSIOMA_BLOCK_RE.match(rec.msg):
+        return None
+    # Bloqueio conta como rejeição; o detalhe (direção/RSI) nem sempre vem na mensagem
+    m = RSIOMA_BLOCKED_RE.match(rec.msg)
+    return 'rsioma_block', m and {
+        'direction': m.group(1),
+        'rsi': float(m.group(2)),
+        'threshold': int(m.group(3))
+    }
+
+def _parse_obv(rec):
+    return ('rejection', 'OBV_Block') if OBV_BLOCK_RE.match(rec.msg) else None
+
+def _parse_alignment(rec):
+    return ('aligned', None) if 'ALINHAMENTO PERFEITO' in rec.msg else None
+
+def _parse_trade_open(rec):
+    m = TRADE_OPEN_RE.match(rec.msg)
+    return m and ('trade_open', (m.group(1), float(m.group(2)), float(m.group(3)), float(m.group(4))))
+
+def _parse_trade_close(rec):
+    m = TRADE_CLOSE_RE.match(rec.msg)
+    return m and ('trade_close', (m.group(1), float(m.group(2))))
+
+# Razões 'Confluence_Low' e 'Regime_Block' não têm mensagem correspondente
+# no EA atual (nunca foram contadas); os bloqueios de regime/confluência
+# aparecem como "FILTRO BLOQUEOU: ...".
+LOG_PARSERS = {
+    'Sinal': _parse_signal,
+    'STRATEGY': _parse_strategy,
+    'RSIOMA': _parse_rsioma,
+    'OBV': _parse_obv,
+    '⭐⭐⭐': _parse_alignment,
+    'TRADE:': _parse_trade_open,
+    'TRADE': _parse_trade_close,
+}
 
 def extract_all_signals(log_file):
-    """Extrai TODOS os sinais detectados e seu destino (executado ou rejeitado)."""
+    """Extrai TODOS os sinais detectados e seu destino (executado ou rejeitado).
+    
+    Uma única passada: cada linha é separada uma vez (log_events.split_line)
+    e só o parser do seu literal inicial é executado. Os estados do RSIOMA
+    (aprovados/bloqueados) são coletados na mesma passada.
+    """
     signals = []
     trades = []
     rejections = defaultdict(int)
-    
-    # Padrões
-    signal_pattern = re.compile(
-        r'(\d{4}\.\d{2}\.\d{2}) (\d{2}:\d{2}:\d{2}).*Sinal detectado.*Entry=(-?\d+), Strength=(-?\d+), Confluence=([\d.]+)%'
-    )
-    
-    trade_open_pattern = re.compile(
-        r'(\d{4}\.\d{2}\.\d{2}) (\d{2}:\d{2}:\d{2}).*TRADE: (BUY|SELL) @ ([\d.]+).*SL: ([\d.]+).*TP: ([\d.]+)'
-    )
-    
-    trade_close_pattern = re.compile(
-        r'(\d{4}\.\d{2}\.\d{2}) (\d{2}:\d{2}:\d{2}).*TRADE CLOSED: (WIN|LOSS).*Profit: ([\-\d.]+)'
-    )
-    
-    rejection_patterns = {
-        'Passo1_Trend': re.compile(r'Passo 1.*Falhou'),
-        'Passo2_RSIOMA': re.compile(r'Passo 2.*Falhou'),
-        'Passo3_OBV': re.compile(r'Passo 3.*Falhou'),
-        'RSIOMA_Block': re.compile(r'RSIOMA FILTRO:.*(bloqueado|Block)'),
-        'OBV_Block': re.compile(r'OBV MACD:.*(REJEITADO|BLOQUEADO)'),
-        'Confluence_Low': re.compile(r'Confluência.*insuficiente'),
-        'Regime_Block': re.compile(r'(RANGING|VOLATILE).*bloqueado'),
-    }
-    
-    alignment_pattern = re.compile(r'ALINHAMENTO PERFEITO')
+    rsioma = {'approved': [], 'blocked': []}
     
     current_signal = None
     pending_trade = None
     
-    with open(log_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            # Detectar sinal
-            sig_match = signal_pattern.search(line)
-            if sig_match:
-                current_signal = {
-                    'date': sig_match.group(1),
-                    'time': sig_match.group(2),
-                    'entry': int(sig_match.group(3)),
-                    'strength': int(sig_match.group(4)),
-                    'confluence': float(sig_match.group(5)),
-                    'executed': False,
-                    'rejection_reason': None
-                }
-                signals.append(current_signal)
-            
-            # Detectar rejeição
-            for reason, pattern in rejection_patterns.items():
-                if pattern.search(line):
-                    rejections[reason] += 1
-                    if current_signal and not current_signal['executed']:
-                        current_signal['rejection_reason'] = reason
-            
-            # Detectar alinhamento aprovado
-            if alignment_pattern.search(line):
-                if current_signal:
-                    current_signal['executed'] = True
-            
-            # Detectar abertura de trade
-            trade_match = trade_open_pattern.search(line)
-            if trade_match:
-                pending_trade = {
-                    'open_date': trade_match.group(1),
-                    'open_time': trade_match.group(2),
-                    'direction': trade_match.group(3),
-                    'entry_price': float(trade_match.group(4)),
-                    'sl': float(trade_match.group(5)),
-                    'tp': float(trade_match.group(6)),
-                }
-                if current_signal:
-                    pending_trade['signal_strength'] = current_signal['strength']
-                    pending_trade['signal_confluence'] = current_signal['confluence']
-                    pending_trade['signal_entry'] = current_signal['entry']
-            
-            # Detectar fechamento de trade
-            close_match = trade_close_pattern.search(line)
-            if close_match and pending_trade:
-                pending_trade['close_date'] = close_match.group(1)
-                pending_trade['close_time'] = close_match.group(2)
-                pending_trade['result'] = close_match.group(3)
-                pending_trade['profit'] = float(close_match.group(4))
+    for rec, (kind, data) in dispatch(LogSource(log_file).lines(), LOG_PARSERS):
+        date, time = rec.ts[:10], rec.ts[11:]
+        
+        # Estados do RSIOMA
+        if kind == 'rsioma_approved':
+            rsioma['approved'].append(data)
+            continue
+        if kind == 'rsioma_block':
+            if data:
+                rsioma['blocked'].append(data)
+            kind, data = 'rejection', 'RSIOMA_Block'
+        
+        # Detectar sinal
+        if kind == 'signal':
+            entry, strength, confluence = data
+            current_signal = {
+                'date': date,
+                'time': time,
+                'entry': entry,
+                'strength': strength,
+                'confluence': confluence,
+                'executed': False,
+                'rejection_reason': None
+            }
+            signals.append(current_signal)
+        
+        # Detectar rejeição
+        elif kind == 'rejection':
+            rejections[data] += 1
+            if current_signal and not current_signal['executed']:
+                current_signal['rejection_reason'] = data
+        
+        # Detectar alinhamento aprovado
+        elif kind == 'aligned':
+            if current_signal:
+                current_signal['executed'] = True
+        
+        # Detectar abertura de trade
+        elif kind == 'trade_open':
+            direction, entry_price, sl, tp = data
+            pending_trade = {
+                'open_date': date,
+                'open_time': time,
+                'direction': direction,
+                'entry_price': entry_price,
+                'sl': sl,
+                'tp': tp,
+            }
+            if current_signal:
+                pending_trade['signal_strength'] = current_signal['strength']
+                pending_trade['signal_confluence'] = current_signal['confluence']
+                pending_trade['signal_entry'] = current_signal['entry']
+        
+        # Detectar fechamento de trade
+        elif kind == 'trade_close':
+            if pending_trade:
+                pending_trade['close_date'] = date
+                pending_trade['close_time'] = time
+                pending_trade['result'], pending_trade['profit'] = data
                 trades.append(pending_trade)
                 pending_trade = None
     
-    return signals, trades, rejections
+    return signals, trades, rejections, rsioma
 
 def analyze_signal_quality(signals, trades):
     """Analisa qualidade dos sinais vs resultados."""
@@ -292,35 +352,14 @@ A confluência mede COMPRESSÃO das EMAs, não QUALIDADE do sinal!
 4. Testar com BE/TS DESATIVADOS primeiro
 """)
 
-def analyze_rsioma_performance(log_file):
-    """Analisa performance do filtro RSIOMA."""
+def analyze_rsioma_performance(rsioma):
+    """Analisa performance do filtro RSIOMA (estados coletados em extract_all_signals)."""
     print("\n" + "=" * 80)
     print("       🔬 ANÁLISE DETALHADA DO RSIOMA")
     print("=" * 80)
     
-    rsioma_approved = []
-    rsioma_blocked = []
-    
-    approved_pattern = re.compile(r'RSIOMA ESTADO: APROVADO \((\d+\.\d+) ([><]) (\d+\.\d+)\)')
-    blocked_pattern = re.compile(r'RSIOMA FILTRO: (BUY|SELL) bloqueado.*RSI\(([\d.]+)\).*(\d+)')
-    
-    with open(log_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            approved = approved_pattern.search(line)
-            if approved:
-                rsioma_approved.append({
-                    'rsi': float(approved.group(1)),
-                    'operator': approved.group(2),
-                    'ma': float(approved.group(3))
-                })
-            
-            blocked = blocked_pattern.search(line)
-            if blocked:
-                rsioma_blocked.append({
-                    'direction': blocked.group(1),
-                    'rsi': float(blocked.group(2)),
-                    'threshold': int(blocked.group(3))
-                })
+    rsioma_approved = rsioma['approved']
+    rsioma_blocked = rsioma['blocked']
     
     print(f"\n   RSIOMA Aprovados: {len(rsioma_approved)}")
     print(f"   RSIOMA Bloqueados: {len(rsioma_blocked)}")
@@ -339,11 +378,12 @@ def analyze_rsioma_performance(log_file):
 
 def main():
     print("🔍 Iniciando análise profunda do EA...")
+    log_file = Path(sys.argv[1]) if len(sys.argv) > 1 else LOG_FILE
     
     try:
-        signals, trades, rejections = extract_all_signals(LOG_FILE)
+        signals, trades, rejections, rsioma = extract_all_signals(log_file)
     except FileNotFoundError:
-        print(f"❌ Arquivo {LOG_FILE} não encontrado!")
+        print(f"❌ Arquivo {log_file} não encontrado!")
         return
     
     print(f"\n✅ Dados extraídos:")
@@ -357,7 +397,7 @@ def main():
     analyze_timing(trades)
     
     # Análise RSIOMA
-    analyze_rsioma_performance(LOG_FILE)
+    analyze_rsioma_performance(rsioma)
     
     # Sugestões
     suggest_improvements()
@@ -9,9 +9,14 @@ import pandas as pd
 import numpy as np
 from collections import defaultdict
 from datetime import datetime
+from pathlib import Path
+import sys
 
-# Configuração do arquivo de log
-LOG_FILE = "20251217_utf8.log"
+from log_source import LogSource
+from trade_metrics import trade_metrics
+
+# Configuração do arquivo de log (o original do tester, UTF-16 ou UTF-8)
+LOG_FILE = Path(__file__).resolve().parent / "20251217.log"
 
 def parse_trades(log_file):
     """Extrai todos os trades do log."""
@@ -41,55 +46,54 @@ def parse_trades(log_file):
     ts_activated = set()
     ts_moves = defaultdict(int)
     
-    with open(log_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            # Extrair data
-            date_match = date_pattern.search(line)
-            if date_match:
-                current_date = date_match.group(1)
-            
-            # Detectar abertura de trade
-            open_match = trade_open_pattern.search(line)
-            if open_match:
-                current_trade = {
-                    'open_time': f"{current_date} {open_match.group(1)}",
-                    'direction': open_match.group(2),
-                    'entry': float(open_match.group(3)),
-                    'volume': float(open_match.group(4)),
-                    'sl': float(open_match.group(5)),
-                    'tp': float(open_match.group(6))
-                }
-            
-            # Detectar Break-Even
-            be_match = be_pattern.search(line)
-            if be_match:
-                ticket = be_match.group(2)
-                be_activated.add(ticket)
-            
-            # Detectar Trailing Start
-            ts_match = ts_start_pattern.search(line)
-            if ts_match:
-                ticket = ts_match.group(2)
-                ts_activated.add(ticket)
-            
-            # Contar movimentos de trailing
-            ts_move_match = ts_move_pattern.search(line)
-            if ts_move_match:
-                ticket = ts_move_match.group(2)
-                ts_moves[ticket] += 1
-            
-            # Detectar fechamento de trade
-            close_match = trade_closed_pattern.search(line)
-            if close_match:
-                trade = {
-                    'close_time': f"{current_date} {close_match.group(1)}",
-                    'result': close_match.group(2),
-                    'profit': float(close_match.group(3)),
-                    'close_reason': close_match.group(4),
-                    **current_trade
-                }
-                trades.append(trade)
-                current_trade = {}
+    for line in LogSource(log_file).lines():
+        # Extrair data
+        date_match = date_pattern.search(line)
+        if date_match:
+            current_date = date_match.group(1)
+        
+        # Detectar abertura de trade
+        open_match = trade_open_pattern.search(line)
+        if open_match:
+            current_trade = {
+                'open_time': f"{current_date} {open_match.group(1)}",
+                'direction': open_match.group(2),
+                'entry': float(open_match.group(3)),
+                'volume': float(open_match.group(4)),
+                'sl': float(open_match.group(5)),
+                'tp': float(open_match.group(6))
+            }
+        
+        # Detectar Break-Even
+        be_match = be_pattern.search(line)
+        if be_match:
+            ticket = be_match.group(2)
+            be_activated.add(ticket)
+        
+        # Detectar Trailing Start
+        ts_match = ts_start_pattern.search(line)
+        if ts_match:
+            ticket = ts_match.group(2)
+            ts_activated.add(ticket)
+        
+        # Contar movimentos de trailing
+        ts_move_match = ts_move_pattern.search(line)
+        if ts_move_match:
+            ticket = ts_move_match.group(2)
+            ts_moves[ticket] += 1
+        
+        # Detectar fechamento de trade
+        close_match = trade_closed_pattern.search(line)
+        if close_match:
+            trade = {
+                'close_time': f"{current_date} {close_match.group(1)}",
+                'result': close_match.group(2),
+                'profit': float(close_match.group(3)),
+                'close_reason': close_match.group(4),
+                **current_trade
+            }
+            trades.append(trade)
+            current_trade = {}
     
     return trades, be_activated, ts_activated, ts_moves
 
@@ -110,18 +114,21 @@ def analyze_trades(trades):
     wins = df[df['result'] == 'WIN']
     losses = df[df['result'] == 'LOSS']
     
-    win_count = len(wins)
-    loss_count = len(losses)
-    win_rate = (win_count / total_trades) * 100
+    # Vitória/derrota pelo rótulo do EA (WIN/LOSS), não pelo sinal do lucro
+    m = trade_metrics(df['profit'].to_numpy(), win=(df['result'] == 'WIN').to_numpy(), loss=(df['result'] == 'LOSS').to_numpy())
+    
+    win_count = m.wins
+    loss_count = m.losses
+    win_rate = m.win_rate_pct
     
-    total_profit = df['profit'].sum()
-    gross_profit = wins['profit'].sum()
-    gross_loss = abs(losses['profit'].sum())
+    total_profit = m.net
+    gross_profit = m.gross_profit
+    gross_loss = m.gross_loss
     
-    avg_win = wins['profit'].mean() if len(wins) > 0 else 0
-    avg_loss = abs(losses['profit'].mean()) if len(losses) > 0 else 0
+    avg_win = m.avg_win
+    avg_loss = abs(m.avg_loss)
     
-    profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
+    profit_factor = m.profit_factor if gross_loss > 0 else 0
     
     print(f"\n📊 MÉTRICAS GERAIS")
     print(f"   Total de Trades: {total_trades}")
@@ -196,11 +203,8 @@ def analyze_trades(trades):
         if kelly < 0:
             print(f"   ⚠️ KELLY NEGATIVO = SISTEMA NÃO DEVE SER OPERADO!")
     
-    # Drawdown
-    cumulative = df['profit'].cumsum()
-    rolling_max = cumulative.cummax()
-    drawdown = rolling_max - cumulative
-    max_dd = drawdown.max()
+    # Drawdown (saldo fechado partindo de 0)
+    max_dd = m.max_dd_abs
     
     print(f"\n📉 DRAWDOWN")
     print(f"   Máximo Drawdown: ${max_dd:.2f}")
@@ -331,11 +335,12 @@ def suggest_fixes():
 
 def main():
     print("Carregando log de trades...")
+    log_file = sys.argv[1] if len(sys.argv) > 1 else LOG_FILE
     
     try:
-        trades, be_activated, ts_activated, ts_moves = parse_trades(LOG_FILE)
+        trades, be_activated, ts_activated, ts_moves = parse_trades(log_file)
     except FileNotFoundError:
-        print(f"❌ Arquivo {LOG_FILE} não encontrado!")
+        print(f"❌ Arquivo {log_file} não encontrado!")
         return
     
     if not trades:
@@ -4,28 +4,20 @@ import sys
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
+from typing import Iterable
 
 import numpy as np
 import pandas as pd
 
+from log_source import LogSource
+from log_time import parse_ts
+from trade_metrics import equity_curve, trade_metrics
+
 
 DEFAULT_LOG_PATH = Path(__file__).resolve().parent / "20251215.log"
 DEFAULT_REPORT_PATH = Path(__file__).resolve().parent / "financial_analysis_report.md"
 
 
-def read_log_lines(log_path: Path) -> list[str]:
-    data = log_path.read_bytes()
-    # MT5 tester logs are often UTF-16LE with BOM (common on Windows/Wine).
-    if data.startswith(b"\xff\xfe") or data.startswith(b"\xfe\xff"):
-        text = data.decode("utf-16", errors="ignore")
-    else:
-        try:
-            text = data.decode("utf-8")
-        except UnicodeDecodeError:
-            text = data.decode("latin-1", errors="ignore")
-    return text.splitlines()
-
-
 @dataclass
 class TradeClose:
     ts: datetime
@@ -49,19 +41,23 @@ def _parse_mt5_ts(line: str) -> datetime | None:
     m = re.search(r"\t(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2})\s+", line)
     if not m:
         return None
-    return datetime.strptime(m.group(1), "%Y.%m.%d %H:%M:%S")
+    return parse_ts(m.group(1))
 
 
-def parse_initial_deposit(lines: list[str]) -> float | None:
-    m = None
+def parse_initial_deposit(lines: Iterable[str]) -> float:
+    """"initial deposit" do tester; senão o primeiro "Saldo inicial:" do CRiskManager; senão 0."""
+    fallback = 0.0
     for line in lines:
         m = re.search(r"initial deposit\s+(\d+(?:\.\d+)?)", line, re.IGNORECASE)
         if m:
             return float(m.group(1))
-    return None
+        m = re.search(r"Saldo inicial:\s+([0-9.]+)", line)
+        if m and not fallback:
+            fallback = float(m.group(1))
+    return fallback
 
 
-def parse_trades(lines: list[str]) -> tuple[list[TradeOpen], list[TradeClose]]:
+def parse_trades(lines: Iterable[str]) -> tuple[list[TradeOpen], list[TradeClose]]:
     open_pattern = re.compile(
         r"\t(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2})\s+\[\d{2}:\d{2}:\d{2}\]\s+\[INFO\]\s+TRADE:\s+(BUY|SELL)\s+@\s+([0-9.]+)\s+\|\s+Vol:\s+([0-9.]+)\s+\|\s+SL:\s+([0-9.]+)\s+\|\s+TP:\s+([0-9.]+)"
     )
@@ -75,7 +71,7 @@ def parse_trades(lines: list[str]) -> tuple[list[TradeOpen], list[TradeClose]]:
     for line in lines:
         mo = open_pattern.search(line)
         if mo:
-            ts = datetime.strptime(mo.group(1), "%Y.%m.%d %H:%M:%S")
+            ts = parse_ts(mo.group(1))
             opens.append(
                 TradeOpen(
                     ts=ts,
@@ -90,7 +86,7 @@ def parse_trades(lines: list[str]) -> tuple[list[TradeOpen], list[TradeClose]]:
 
         mc = close_pattern.search(line)
         if mc:
-            ts = datetime.strptime(mc.group(1), "%Y.%m.%d %H:%M:%S")
+            ts = parse_ts(mc.group(1))
             closes.append(
                 TradeClose(
                     ts=ts,
@@ -133,11 +129,10 @@ def pair_trades(opens: list[TradeOpen], closes: list[TradeClose]) -> pd.DataFram
 
 def compute_equity_curve(df: pd.DataFrame, initial_deposit: float) -> pd.DataFrame:
     df = df.sort_values("close_ts").reset_index(drop=True)
-    df["balance_before"] = initial_deposit + df["profit"].shift(1).fillna(0).cumsum()
-    df["balance_after"] = df["balance_before"] + df["profit"]
-    df["dd_from_peak_pct"] = (
-        (df["balance_after"].cummax() - df["balance_after"]) / df["balance_after"].cummax()
-    ) * 100.0
+    eq = equity_curve(df["profit"].to_numpy(), initial_deposit)
+    df["balance_before"] = eq.balance_before
+    df["balance_after"] = eq.balance_after
+    df["dd_from_peak_pct"] = eq.dd_pct
     df["loss_pct_of_balance"] = np.where(
         df["profit"] < 0,
         (-df["profit"]) / df["balance_before"] * 100.0,
@@ -162,24 +157,17 @@ def render_report(df: pd.DataFrame, initial_deposit: float | None, log_path: Pat
         report.append("Nenhum trade (open/close) foi extraído do log com os padrões atuais.\n")
         return "\n".join(report)
 
-    net = df["profit"].sum()
-    gross_profit = df.loc[df["profit"] > 0, "profit"].sum()
-    gross_loss = -df.loc[df["profit"] < 0, "profit"].sum()
-    profit_factor = (gross_profit / gross_loss) if gross_loss > 0 else np.inf
-    win_rate = (df["profit"] > 0).mean() * 100.0
-    avg_win = df.loc[df["profit"] > 0, "profit"].mean() if (df["profit"] > 0).any() else 0.0
-    avg_loss = df.loc[df["profit"] < 0, "profit"].mean() if (df["profit"] < 0).any() else 0.0
-    expectancy = df["profit"].mean()
+    m = trade_metrics(df["profit"].to_numpy())
     max_dd = df["dd_from_peak_pct"].max() if "dd_from_peak_pct" in df else np.nan
 
     report.append("\n## Sumário\n")
     report.append(f"- Trades analisados: **{len(df)}**\n")
-    report.append(f"- Win rate: **{win_rate:.1f}%**\n")
-    report.append(f"- Lucro líquido: **{net:.2f}**\n")
-    report.append(f"- Profit Factor: **{profit_factor:.2f}**\n")
-    report.append(f"- Expectancy (média por trade): **{expectancy:.2f}**\n")
+    report.append(f"- Win rate: **{m.win_rate_pct:.1f}%**\n")
+    report.append(f"- Lucro líquido: **{m.net:.2f}**\n")
+    report.append(f"- Profit Factor: **{m.profit_factor:.2f}**\n")
+    report.append(f"- Expectancy (média por trade): **{m.expectancy:.2f}**\n")
     report.append(f"- Max Drawdown (por saldo fechado): **{max_dd:.2f}%**\n")
-    report.append(f"- Média WIN: **{avg_win:.2f}** | Média LOSS: **{avg_loss:.2f}**\n")
+    report.append(f"- Média WIN: **{m.avg_win:.2f}** | Média LOSS: **{m.avg_loss:.2f}**\n")
 
     report.append("\n## Diagnóstico Quantitativo (por que a conta quebra)\n")
     worst_loss_pct = df["loss_pct_of_balance"].max()
@@ -213,17 +201,16 @@ def main() -> int:
     if not log_path.exists():
         raise SystemExit(f"Log não encontrado: {log_path}")
 
-    lines = read_log_lines(log_path)
-    initial_deposit = parse_initial_deposit(lines)
-    opens, closes = parse_trades(lines)
-    df = pair_trades(opens, closes)
+    # MT5 tester logs are often UTF-16LE with BOM (common on Windows/Wine) and
+    # can be several GB: LogSource detects the encoding once and streams them.
+    src = LogSource(log_path)
 
-    if initial_deposit is None:
-        # fallback razoável: usar o primeiro reset de saldo (se existir) ou 0
-        initial_deposit = 0.0
-        m = re.search(r"Saldo inicial:\s+([0-9.]+)", "\n".join(lines[:2000]))
-        if m:
-            initial_deposit = float(m.group(1))
+    # "initial deposit" vem nas primeiras linhas: o scan para no primeiro match
+    # sem decodificar o resto do log. Sem ele, vale o primeiro reset de saldo
+    # ("Saldo inicial:") ou 0.
+    initial_deposit = parse_initial_deposit(src.marked_lines(("initial deposit", "Saldo inicial:")))
+    opens, closes = parse_trades(src.lines())
+    df = pair_trades(opens, closes)
 
     if not df.empty:
         df = compute_equity_curve(df, float(initial_deposit))
@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-"""Advanced MT5 tester log analyzer (stdlib-only).
+"""Advanced MT5 tester log analyzer.
 
 Focuses on extracting the EA's own structured lines:
 - "[INFO] TRADE: BUY @ ... | Vol: ... | SL: ... | TP: ..."
@@ -12,21 +12,40 @@ It then produces:
 - max drawdown
 - PF, expectancy, winrate
 - loss streaks
-- breakdown by day / hour / strength
+- breakdown by day / hour / weekday / strength (hour and up: perf_cube roll-ups)
+- rolling 30-day and 50-trade windows (see rolling_metrics)
 
-No third-party dependencies are required.
+Events, trades and the equity curve are columnar `event_table.EventTable`s
+(numpy arrays, one per field); the dataclasses below are their row types.
 """
 
 from __future__ import annotations
 
 import argparse
 import csv
+import hashlib
+import json
+import os
 import re
-from dataclasses import dataclass
-from datetime import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 from pathlib import Path
-from statistics import mean, pstdev
-from typing import Iterable
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from event_cache import CACHE_DIR_NAME, HASH_SPAN, load_event_tables, read_tables, write_tables
+from asof_join import asof_indices, take_matched
+from event_table import EventTable, TableBuilder, concat
+from log_events import DEPOSIT_MARKER, parse_initial_deposit
+from log_source import LogSource
+from log_time import parse_ts, to_epoch
+from online_metrics import CLOSE_MARKERS, OnlineMetrics, online_metrics, online_metrics_parallel
+from perf_cube import trade_cube
+from rolling_metrics import DAY, rolling_by_time, rolling_by_trades
+from trade_metrics import equity_curve, group_stats, max_run, trade_metrics
 
 
 DEFAULT_LOG_PATH = Path(__file__).resolve().parent / "20251215.log"
@@ -78,26 +97,9 @@ class Trade:
     entry: int | None
 
 
-def _parse_lines(log_path: Path) -> list[str]:
-    data = log_path.read_bytes()
-    # MT5 tester logs are often UTF-16LE with BOM (especially on Wine/Windows).
-    if data.startswith(b"\xff\xfe") or data.startswith(b"\xfe\xff"):
-        text = data.decode("utf-16", errors="ignore")
-    else:
-        # Try UTF-8 first, then fall back.
-        try:
-            text = data.decode("utf-8")
-        except UnicodeDecodeError:
-            text = data.decode("latin-1", errors="ignore")
-    return text.splitlines()
-
-
-def parse_initial_deposit(lines: Iterable[str]) -> float | None:
-    for line in lines:
-        m = re.search(r"initial deposit\s+(\d+(?:\.\d+)?)", line, re.IGNORECASE)
-        if m:
-            return float(m.group(1))
-    return None
+# MT5 tester logs are often UTF-16LE with BOM (especially on Wine/Windows)
+# and can be several GB, so every read goes through one LogSource (encoding
+# sniffed once, lines streamed with constant memory).
 
 
 OPEN_RE = re.compile(
@@ -113,206 +115,338 @@ SIGNAL_RE = re.compile(
 )
 
 
-def parse_events(lines: Iterable[str]) -> tuple[list[SignalEvent], list[TradeOpen], list[TradeClose]]:
-    signals: list[SignalEvent] = []
-    opens: list[TradeOpen] = []
-    closes: list[TradeClose] = []
+# Every line parse_events() can match contains one of these literals; with
+# --scan only those lines are decoded (see LogSource.marked_lines).
+EVENT_MARKERS = ("Sinal detectado!", "TRADE:", "TRADE CLOSED:")
+
+
+def parse_events(lines: Iterable[str]) -> tuple[EventTable, EventTable, EventTable]:
+    """(signals, opens, closes) tables of the EA lines in `lines`."""
+    signals = TableBuilder(SignalEvent)
+    opens = TableBuilder(TradeOpen)
+    closes = TableBuilder(TradeClose)
 
     for line in lines:
         ms = SIGNAL_RE.search(line)
         if ms:
-            ts = datetime.strptime(ms.group("ts"), "%Y.%m.%d %H:%M:%S")
             signals.append(
-                SignalEvent(
-                    ts=ts,
-                    strength=int(ms.group("strength")),
-                    entry=int(ms.group("entry")),
-                    confluence_pct=float(ms.group("conf")),
-                )
+                parse_ts(ms.group("ts")),
+                int(ms.group("strength")),
+                int(ms.group("entry")),
+                float(ms.group("conf")),
             )
             continue
 
         mo = OPEN_RE.search(line)
         if mo:
-            ts = datetime.strptime(mo.group("ts"), "%Y.%m.%d %H:%M:%S")
             opens.append(
-                TradeOpen(
-                    ts=ts,
-                    side=mo.group("side"),
-                    price=float(mo.group("price")),
-                    volume=float(mo.group("vol")),
-                    sl=float(mo.group("sl")),
-                    tp=float(mo.group("tp")),
-                )
+                parse_ts(mo.group("ts")),
+                mo.group("side"),
+                float(mo.group("price")),
+                float(mo.group("vol")),
+                float(mo.group("sl")),
+                float(mo.group("tp")),
             )
             continue
 
         mc = CLOSE_RE.search(line)
         if mc:
-            ts = datetime.strptime(mc.group("ts"), "%Y.%m.%d %H:%M:%S")
             closes.append(
-                TradeClose(
-                    ts=ts,
-                    outcome=mc.group("outcome"),
-                    profit=float(mc.group("profit")),
-                    reason=mc.group("reason").strip(),
-                )
+                parse_ts(mc.group("ts")),
+                mc.group("outcome"),
+                float(mc.group("profit")),
+                mc.group("reason").strip(),
             )
             continue
 
-    return signals, opens, closes
+    return signals.build(), opens.build(), closes.build()
 
 
-def _nearest_prior_signal(signals_sorted: list[SignalEvent], t: datetime, max_delta_seconds: int = 60 * 60) -> SignalEvent | None:
-    """Pick the most recent signal at/before time t within a window."""
-    # Signals are relatively sparse; linear scan backwards from end is OK.
-    # (Log size is ~50k lines; events count is much smaller.)
-    for s in reversed(signals_sorted):
-        if s.ts <= t:
-            if (t - s.ts).total_seconds() <= max_delta_seconds:
-                return s
-            return None
-    return None
+def events_from_tables(tables: dict[str, EventTable]) -> tuple[EventTable, EventTable, EventTable]:
+    """parse_events() output built from the shared (cached) log event tables.
 
+    The projections share the cached columns; nothing is copied.
+    """
+    signals = tables["signals"].project(SignalEvent, confluence_pct="confluence")
+    opens = tables["opens"].project(TradeOpen)
+    closes = tables["closes"].project(TradeClose)
+    return signals, opens, closes
 
-def pair_trades(signals: list[SignalEvent], opens: list[TradeOpen], closes: list[TradeClose]) -> list[Trade]:
-    signals_sorted = sorted(signals, key=lambda x: x.ts)
-    opens_sorted = sorted(opens, key=lambda x: x.ts)
-    closes_sorted = sorted(closes, key=lambda x: x.ts)
 
-    trades: list[Trade] = []
+def _parse_range(job: tuple[LogSource, int, int]) -> tuple[EventTable, EventTable, EventTable]:
+    src, start, end = job
+    return parse_events(src.range_lines(start, end))
+
+
+def parse_events_parallel(src: LogSource, workers: int) -> tuple[EventTable, EventTable, EventTable]:
+    """parse_events() over byte ranges of the log in a process pool.
+
+    Ranges are contiguous and results are concatenated in range order, which
+    is file (= timestamp) order, so the output equals the serial parse.
+    """
+    # A compressed stream cannot be split at byte offsets: parse it serially.
+    if workers <= 1 or src.compressed:
+        return parse_events(src.lines())
+    # A few ranges per worker keeps the pool busy when ranges are uneven.
+    ranges = src.byte_ranges(workers * 4)
+    if len(ranges) <= 1:
+        return parse_events(src.lines())
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [(src, start, end) for start, end in ranges]
+        signals, opens, closes = zip(*pool.map(_parse_range, jobs))
+    return concat(signals), concat(opens), concat(closes)
+
+
+SIGNAL_WINDOW_SECONDS = 60 * 60
+
+
+def _make_trade(o: TradeOpen, c: TradeClose, s: SignalEvent | None) -> Trade:
+    return Trade(
+        open_ts=o.ts,
+        close_ts=c.ts,
+        side=o.side,
+        volume=o.volume,
+        open_price=o.price,
+        sl=o.sl,
+        tp=o.tp,
+        profit=c.profit,
+        outcome=c.outcome,
+        reason=c.reason,
+        duration_min=(c.ts - o.ts).total_seconds() / 60.0,
+        strength=(int(abs(s.strength)) if s else None),
+        confluence_pct=(s.confluence_pct if s else None),
+        entry=(s.entry if s else None),
+    )
 
-    i = 0
-    j = 0
-    while i < len(opens_sorted) and j < len(closes_sorted):
-        o = opens_sorted[i]
-        c = closes_sorted[j]
+
+def _drain_pairs(opens: deque[TradeOpen], closes: deque[TradeClose]) -> list[tuple[TradeOpen, TradeClose]]:
+    """Pair queued opens/closes in time order; unmatched events stay queued."""
+    pairs = []
+    while opens and closes:
+        o = opens[0]
+        c = closes[0]
 
         # Skip closes that occur before the next open (shouldn't happen, but be robust)
         if c.ts < o.ts:
-            j += 1
+            closes.popleft()
             continue
 
-        s = _nearest_prior_signal(signals_sorted, o.ts)
-
-        trades.append(
-            Trade(
-                open_ts=o.ts,
-                close_ts=c.ts,
-                side=o.side,
-                volume=o.volume,
-                open_price=o.price,
-                sl=o.sl,
-                tp=o.tp,
-                profit=c.profit,
-                outcome=c.outcome,
-                reason=c.reason,
-                duration_min=(c.ts - o.ts).total_seconds() / 60.0,
-                strength=(int(abs(s.strength)) if s else None),
-                confluence_pct=(s.confluence_pct if s else None),
-                entry=(s.entry if s else None),
-            )
-        )
-        i += 1
-        j += 1
+        pairs.append((o, c))
+        opens.popleft()
+        closes.popleft()
+    return pairs
 
-    return trades
 
+def _trades_with_signals(pairs: list[tuple[TradeOpen, TradeClose]], signals: EventTable) -> EventTable:
+    """Trades of the pairs, each with the last signal at/before its open (within the window)."""
+    open_ts = np.fromiter((to_epoch(o.ts) for o, _ in pairs), dtype=np.int64, count=len(pairs))
+    idx = asof_indices(open_ts, signals["ts"], max_delta_seconds=SIGNAL_WINDOW_SECONDS)
+    matched = take_matched(signals, idx)
+    return EventTable.from_rows(Trade, (_make_trade(o, c, s) for (o, c), s in zip(pairs, matched)))
 
-@dataclass(frozen=True)
-class EquityPoint:
-    close_ts: datetime
-    balance_before: float
-    profit: float
-    balance_after: float
-    peak: float
-    dd_abs: float
-    dd_pct: float
 
+def pair_trades(signals: EventTable, opens: EventTable, closes: EventTable) -> EventTable:
+    pairs = _drain_pairs(deque(opens.sort_by("ts")), deque(closes.sort_by("ts")))
+    return _trades_with_signals(pairs, signals)
+
+
+# Bump whenever parse_events() or the pairing changes: a checkpoint written
+# by another version is dropped and the log parsed again from the start.
+CHECKPOINT_VERSION = 3
+
+
+@dataclass
+class ParseCheckpoint:
+    """State of an incremental parse of a log that is still being written.
+
+    `offset` is the byte just past the last complete line parsed. Opens still
+    waiting for their TRADE CLOSED line (and vice versa) stay queued, and only
+    the signals recent enough to be matched to a future open are kept.
+    """
+
+    key: dict
+    offset: int
+    initial_deposit: float | None = None
+    signals: list[SignalEvent] = field(default_factory=list)
+    pending_opens: deque[TradeOpen] = field(default_factory=deque)
+    pending_closes: deque[TradeClose] = field(default_factory=deque)
+    trades: EventTable = field(default_factory=lambda: EventTable.empty(Trade))
+
+
+# The checkpoint is two files: a JSON sidecar (key, offset, deposit) and the
+# partial tables in the event_cache columnar format. No pickle: loading it
+# never runs code, and a changed row type just reads as a miss.
+_CHECKPOINT_TABLES = {
+    "signals": SignalEvent,
+    "pending_opens": TradeOpen,
+    "pending_closes": TradeClose,
+    "trades": Trade,
+}
+
+
+def checkpoint_path(log_path: Path) -> Path:
+    return log_path.parent / CACHE_DIR_NAME / f"{log_path.name}.ckpt"
+
+
+def _checkpoint_tables_path(log_path: Path) -> Path:
+    return log_path.parent / CACHE_DIR_NAME / f"{log_path.name}.ckpt.evc"
 
-def compute_equity(trades: list[Trade], initial_deposit: float) -> list[EquityPoint]:
-    balance = initial_deposit
-    peak = initial_deposit
-    curve: list[EquityPoint] = []
-
-    for t in sorted(trades, key=lambda x: x.close_ts):
-        balance_before = balance
-        balance_after = balance_before + t.profit
-        peak = max(peak, balance_after)
-        dd_abs = peak - balance_after
-        dd_pct = (dd_abs / peak * 100.0) if peak > 0 else 0.0
-        curve.append(
-            EquityPoint(
-                close_ts=t.close_ts,
-                balance_before=balance_before,
-                profit=t.profit,
-                balance_after=balance_after,
-                peak=peak,
-                dd_abs=dd_abs,
-                dd_pct=dd_pct,
-            )
-        )
-        balance = balance_after
 
-    return curve
+def _checkpoint_key(log_path: Path, offset: int) -> dict:
+    # The log only grows while the tester runs; a different head means it was
+    # rewritten by a new run.
+    with log_path.open("rb") as f:
+        head = f.read(min(offset, HASH_SPAN))
+    return {
+        "version": CHECKPOINT_VERSION,
+        "path": str(log_path.resolve()),
+        "head": hashlib.blake2b(head, digest_size=16).hexdigest(),
+    }
+
+
+def _load_checkpoint(log_path: Path) -> ParseCheckpoint | None:
+    try:
+        data = json.loads(checkpoint_path(log_path).read_text(encoding="utf-8"))
+        offset = int(data["offset"])
+        if offset > log_path.stat().st_size or data["key"] != _checkpoint_key(log_path, offset):
+            return None
+        deposit = data["initial_deposit"]
+        tables = read_tables(_checkpoint_tables_path(log_path), _CHECKPOINT_TABLES, {**data["key"], "offset": offset})
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if tables is None:
+        return None
+    return ParseCheckpoint(
+        key=data["key"],
+        offset=offset,
+        initial_deposit=None if deposit is None else float(deposit),
+        signals=tables["signals"].tolist(),
+        pending_opens=deque(tables["pending_opens"]),
+        pending_closes=deque(tables["pending_closes"]),
+        trades=tables["trades"],
+    )
+
 
+def _save_checkpoint(log_path: Path, cp: ParseCheckpoint) -> None:
+    # Tables first: the sidecar only ever points at tables written for it.
+    tables = {
+        "signals": EventTable.from_rows(SignalEvent, cp.signals),
+        "pending_opens": EventTable.from_rows(TradeOpen, cp.pending_opens),
+        "pending_closes": EventTable.from_rows(TradeClose, cp.pending_closes),
+        "trades": cp.trades,
+    }
+    write_tables(_checkpoint_tables_path(log_path), tables, {**cp.key, "offset": cp.offset})
+    target = checkpoint_path(log_path)
+    tmp = target.with_suffix(f".tmp{os.getpid()}")
+    data = {"key": cp.key, "offset": cp.offset, "initial_deposit": cp.initial_deposit}
+    tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, target)
 
-def _streaks(values: list[bool]) -> int:
-    best = 0
-    cur = 0
-    for v in values:
-        if v:
-            cur += 1
-            best = max(best, cur)
+
+def _watch_deposit(lines: Iterable[str], cp: ParseCheckpoint) -> Iterator[str]:
+    # Picks up the initial deposit during the event pass, so the new bytes
+    # are read only once.
+    for line in lines:
+        if cp.initial_deposit is None and DEPOSIT_MARKER in line:
+            cp.initial_deposit = parse_initial_deposit((line,))
+        yield line
+
+
+def parse_incremental(src: LogSource) -> tuple[float | None, EventTable]:
+    """(initial deposit, trades) of a log, parsing only bytes appended since the last call.
+
+    Gives the same trades as parse_events() + pair_trades() on the complete
+    lines of the log, as long as the log is in time order (tester logs are).
+    """
+    log_path = src.path
+    cp = _load_checkpoint(log_path)
+    if cp is None:
+        cp = ParseCheckpoint(key={}, offset=src.bom_len)
+
+    end = src.complete_lines_end()
+    if end > cp.offset:
+        signals, opens, closes = parse_events(_watch_deposit(src.range_lines(cp.offset, end), cp))
+
+        cp.signals.extend(signals)
+        cp.pending_opens.extend(opens)
+        cp.pending_closes.extend(closes)
+        pairs = _drain_pairs(cp.pending_opens, cp.pending_closes)
+        new_trades = _trades_with_signals(pairs, EventTable.from_rows(SignalEvent, cp.signals))
+        cp.trades = concat([cp.trades, new_trades])
+
+        # Opens still to be paired are no earlier than the first pending one
+        # (or than the last event seen), so older signals can never be
+        # matched again: drop them to keep the checkpoint small.
+        if cp.pending_opens:
+            horizon = cp.pending_opens[0].ts
         else:
-            cur = 0
-    return best
+            horizon = max((e[-1].ts for e in (signals, opens, closes) if e), default=None)
+        if horizon is not None:
+            cutoff = horizon - timedelta(seconds=SIGNAL_WINDOW_SECONDS)
+            cp.signals = [s for s in cp.signals if s.ts >= cutoff]
 
+        cp.offset = end
+        cp.key = _checkpoint_key(log_path, end)
+        _save_checkpoint(log_path, cp)
 
-def summarize(trades: list[Trade], equity: list[EquityPoint], initial_deposit: float) -> dict:
-    profits = [t.profit for t in trades]
-    wins = [p for p in profits if p > 0]
-    losses = [p for p in profits if p < 0]
+    return cp.initial_deposit, cp.trades
 
-    gross_profit = sum(wins)
-    gross_loss = -sum(losses)
-    profit_factor = (gross_profit / gross_loss) if gross_loss > 0 else float("inf")
 
-    win_rate = (len(wins) / len(profits) * 100.0) if profits else 0.0
-    expectancy = mean(profits) if profits else 0.0
+@dataclass(frozen=True)
+class EquityPoint:
+    close_ts: datetime
+    balance_before: float
+    profit: float
+    balance_after: float
+    peak: float
+    dd_abs: float
+    dd_pct: float
 
-    last_balance = equity[-1].balance_after if equity else initial_deposit
-    net = last_balance - initial_deposit
 
-    max_dd_abs = max((p.dd_abs for p in equity), default=0.0)
-    max_dd_pct = max((p.dd_pct for p in equity), default=0.0)
+def compute_equity(trades: EventTable, initial_deposit: float) -> EventTable:
+    """EquityPoint table of the closed-trade balance, in close time order."""
+    by_close = trades.sort_by("close_ts")
+    profit = by_close["profit"]
+    eq = equity_curve(profit, initial_deposit)
+    return EventTable.from_columns(
+        EquityPoint,
+        close_ts=by_close["close_ts"],
+        balance_before=eq.balance_before,
+        profit=profit,
+        balance_after=eq.balance_after,
+        peak=eq.peak,
+        dd_abs=eq.dd_abs,
+        dd_pct=eq.dd_pct,
+    )
 
-    max_consec_losses = _streaks([p < 0 for p in profits])
-    max_consec_wins = _streaks([p > 0 for p in profits])
-    max_consec_stoploss = _streaks([("Stop Loss" in t.reason and t.profit < 0) for t in trades])
 
-    avg_win = mean(wins) if wins else 0.0
-    avg_loss = mean(losses) if losses else 0.0
-    std_profit = pstdev(profits) if len(profits) >= 2 else 0.0
+def summarize(trades: EventTable, equity: EventTable, initial_deposit: float) -> dict:
+    profits = trades["profit"]
+    m = trade_metrics(profits, initial_deposit)
+
+    last_balance = float(equity["balance_after"][-1]) if equity else initial_deposit
+    reasons = trades.categorical("reason")
+    stop_loss = np.array(["Stop Loss" in r for r in reasons.categories] or [False])[reasons.codes]
 
     return {
-        "trades": len(trades),
-        "wins": len(wins),
-        "losses": len(losses),
-        "win_rate_pct": win_rate,
-        "net": net,
-        "gross_profit": gross_profit,
-        "gross_loss": gross_loss,
-        "profit_factor": profit_factor,
-        "expectancy": expectancy,
-        "avg_win": avg_win,
-        "avg_loss": avg_loss,
-        "std_profit": std_profit,
-        "max_dd_abs": max_dd_abs,
-        "max_dd_pct": max_dd_pct,
-        "max_consec_losses": max_consec_losses,
-        "max_consec_wins": max_consec_wins,
-        "max_consec_stoploss": max_consec_stoploss,
+        "trades": m.trades,
+        "wins": m.wins,
+        "losses": m.losses,
+        "win_rate_pct": m.win_rate_pct,
+        "net": last_balance - initial_deposit,
+        "gross_profit": m.gross_profit,
+        "gross_loss": m.gross_loss,
+        "profit_factor": m.profit_factor,
+        "expectancy": m.expectancy,
+        "avg_win": m.avg_win,
+        "avg_loss": m.avg_loss,
+        "std_profit": m.std_profit,
+        "max_dd_abs": float(equity["dd_abs"].max()) if equity else 0.0,
+        "max_dd_pct": float(equity["dd_pct"].max()) if equity else 0.0,
+        "max_consec_losses": m.max_consec_losses,
+        "max_consec_wins": m.max_consec_wins,
+        "max_consec_stoploss": max_run(stop_loss & (profits < 0)),
         "final_balance": last_balance,
     }
 
@@ -326,27 +460,24 @@ def _md_table(headers: list[str], rows: list[list[str]]) -> str:
     return "\n".join(out)
 
 
-def _group_sum(trades: list[Trade], key_fn):
-    agg: dict = {}
-    for t in trades:
-        k = key_fn(t)
-        if k not in agg:
-            agg[k] = {"trades": 0, "pnl": 0.0, "wins": 0, "losses": 0}
-        agg[k]["trades"] += 1
-        agg[k]["pnl"] += t.profit
-        if t.profit > 0:
-            agg[k]["wins"] += 1
-        elif t.profit < 0:
-            agg[k]["losses"] += 1
-    return agg
+def _group_rows(keys, profits) -> list[tuple]:
+    """(key, trades, pnl, win rate %) per key, sorted by key."""
+    g = group_stats(keys, profits)
+    rows = zip(g.keys.tolist(), g.trades.tolist(), g.pnl.tolist(), g.win_rate_pct().tolist())
+    return sorted(rows, key=lambda r: r[0])
+
+
+WEEKDAYS = ("Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom")
+ROLLING_DAYS = 30
+ROLLING_TRADES = 50
 
 
 def render_report(
     *,
     log_path: Path,
     initial_deposit: float | None,
-    trades: list[Trade],
-    equity: list[EquityPoint],
+    trades: EventTable,
+    equity: EventTable,
 ) -> str:
     lines: list[str] = []
     lines.append("# Relatório Financeiro — Análise Avançada do Log (MT5)\n")
@@ -380,55 +511,80 @@ def render_report(
         )
     )
 
+    profits = trades["profit"]
+
     # Breakdown: by day (close date)
-    by_day = _group_sum(trades, lambda t: t.close_ts.date().isoformat())
-    day_rows = []
-    for day, a in sorted(by_day.items(), key=lambda kv: kv[0]):
-        wr = (a["wins"] / a["trades"] * 100.0) if a["trades"] else 0.0
-        day_rows.append([
-            day,
-            str(a["trades"]),
-            f"{a['pnl']:.2f}",
-            f"{wr:.1f}%",
-        ])
+    day_rows = [
+        [str(np.datetime64(day, "D")), str(n), f"{pnl:.2f}", f"{wr:.1f}%"]
+        for day, n, pnl, wr in _group_rows(trades["close_ts"] // 86400, profits)
+    ]
 
     lines.append("\n## Por Dia (fechamento)\n")
     lines.append(_md_table(["Dia", "Trades", "PnL", "WinRate"], day_rows))
 
+    # The other breakdowns are roll-ups of one pre-aggregated cube.
+    cube = trade_cube(trades)
+
     # Breakdown: by hour (open hour)
-    by_hour = _group_sum(trades, lambda t: f"{t.open_ts.hour:02d}")
-    hour_rows = []
-    for hour, a in sorted(by_hour.items(), key=lambda kv: kv[0]):
-        hour_rows.append([hour, str(a["trades"]), f"{a['pnl']:.2f}"])
+    hour_rows = [[f"{hour:02d}", str(n), f"{pnl:.2f}"] for hour, n, pnl, *_ in cube.rollup("hour").rows()]
     lines.append("\n## Por Hora (abertura)\n")
     lines.append(_md_table(["Hora", "Trades", "PnL"], hour_rows))
 
-    # Breakdown: by strength (if available)
-    with_strength = [t for t in trades if t.strength is not None]
-    if with_strength:
-        by_strength = _group_sum(with_strength, lambda t: str(t.strength))
-        strength_rows = []
-        for st, a in sorted(by_strength.items(), key=lambda kv: int(kv[0])):
-            wr = (a["wins"] / a["trades"] * 100.0) if a["trades"] else 0.0
-            strength_rows.append([st, str(a["trades"]), f"{a['pnl']:.2f}", f"{wr:.1f}%"])
-        lines.append("\n## Por Força (F)\n")
+    # Breakdown: by weekday (open day)
+    weekday_rows = [
+        [WEEKDAYS[day], str(n), f"{pnl:.2f}", f"{wr:.1f}%"] for day, n, pnl, _, _, wr in cube.rollup("weekday").rows()
+    ]
+    lines.append("\n## Por Dia da Semana (abertura)\n")
+    lines.append(_md_table(["Dia", "Trades", "PnL", "WinRate"], weekday_rows))
+
+    # Breakdown: by strength (if available); -1 = no matched signal
+    strength_rows = [
+        [str(st), str(n), f"{pnl:.2f}", f"{wr:.1f}%"]
+        for st, n, pnl, _, _, wr in cube.rollup("strength").rows()
+        if st >= 0
+    ]
+    lines.append("\n## Por Força (F)\n")
+    if strength_rows:
         lines.append(_md_table(["Força", "Trades", "PnL", "WinRate"], strength_rows))
     else:
-        lines.append("\n## Por Força (F)\n")
         lines.append("Não foi possível inferir a força para os trades (linhas 'Sinal detectado' não foram associadas).")
 
+    # Rolling windows: regime changes show up as a drop in PF / win rate.
+    close_ts = trades["close_ts"]
+    monthly = rolling_by_time(profits, close_ts, ROLLING_DAYS * DAY, step_seconds=ROLLING_DAYS * DAY)
+    rolling_rows = [
+        [
+            f"{pt.ts:%Y.%m.%d}",
+            str(pt.trades),
+            f"{pt.win_rate_pct:.1f}%",
+            f"{pt.profit_factor:.2f}",
+            f"{pt.expectancy:.3f}",
+            f"{pt.dd_abs:.2f}",
+            f"{pt.trades_per_day:.2f}",
+        ]
+        for pt in monthly
+    ]
+    lines.append(f"\n## Janela Móvel ({ROLLING_DAYS} dias)\n")
+    lines.append(_md_table(["Fim", "Trades", "WinRate", "PF", "EV", "DD (janela)", "Trades/dia"], rolling_rows))
+    by_count = rolling_by_trades(profits, close_ts, ROLLING_TRADES)
+    if by_count:
+        worst = int(np.argmin(by_count["expectancy"]))
+        pt = by_count.take([worst]).tolist()[0]
+        lines.append(
+            f"\n- Pior janela de {ROLLING_TRADES} trades: até **{pt.ts:%Y.%m.%d}** — "
+            f"WinRate {pt.win_rate_pct:.1f}% | PF {pt.profit_factor:.2f} | EV {pt.expectancy:.3f} | Líquido {pt.net:.2f}"
+        )
+
     # Reasons
-    reason_counts: dict[str, int] = {}
-    for t in trades:
-        reason_counts[t.reason] = reason_counts.get(t.reason, 0) + 1
-    top_reasons = sorted(reason_counts.items(), key=lambda kv: (-kv[1], kv[0]))[:12]
+    reason_counts = [(r, n) for r, n, *_ in cube.rollup("reason").rows()]
+    top_reasons = sorted(reason_counts, key=lambda kv: (-kv[1], kv[0]))[:12]
     lines.append("\n## Razões de Saída (Top)\n")
     lines.append(_md_table(["Razão", "Contagem"], [[r, str(c)] for r, c in top_reasons]))
 
     return "\n".join(lines) + "\n"
 
 
-def write_trades_csv(trades: list[Trade], csv_path: Path) -> None:
+def write_trades_csv(trades: EventTable, csv_path: Path) -> None:
     csv_path.parent.mkdir(parents=True, exist_ok=True)
     with csv_path.open("w", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
@@ -471,21 +627,109 @@ def write_trades_csv(trades: list[Trade], csv_path: Path) -> None:
             )
 
 
+def follow_log(src: LogSource, poll_seconds: float, workers: int = 1) -> None:
+    """Print the running summary after each trade closed, while the tester writes the log.
+
+    The lines already written are summarized first by online_metrics_parallel()
+    in `workers` processes (the per-chunk accumulators merge exactly), then
+    the log is tailed from there.
+    """
+    initial_deposit = parse_initial_deposit(src.marked_lines((DEPOSIT_MARKER,)))
+    start = src.complete_lines_end()
+    m = online_metrics_parallel(src, workers, end=start)
+    if m.trades:
+        _print_running(m, initial_deposit)
+    for line in src.follow(start=start, poll_seconds=poll_seconds):
+        if initial_deposit is None and DEPOSIT_MARKER in line:
+            initial_deposit = parse_initial_deposit((line,))
+        if not any(marker in line for marker in CLOSE_MARKERS):
+            continue
+        before = m.trades
+        online_metrics((line,), into=m)
+        if m.trades != before:
+            _print_running(m, initial_deposit)
+
+
+def _print_running(m: OnlineMetrics, initial_deposit: float | None) -> None:
+    s = m.summary(float(initial_deposit or 0.0))
+    print(
+        f"#{s['trades']} saldo {s['final_balance']:.2f} | WR {s['win_rate_pct']:.1f}% | "
+        f"PF {s['profit_factor']:.2f} | DD {s['max_dd_abs']:.2f} ({s['dd_pct_at_max_abs']:.2f}%) | "
+        f"perdas seguidas {s['consec_losses']} (máx {s['max_consec_losses']})",
+        flush=True,
+    )
+
+
 def main() -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument("log", nargs="?", default=str(DEFAULT_LOG_PATH), help="Path to MT5 .log")
     ap.add_argument("--report", default=str(DEFAULT_REPORT_PATH), help="Markdown output path")
     ap.add_argument("--csv", default=str(DEFAULT_TRADES_CSV), help="CSV output path")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--scan",
+        action="store_true",
+        help="mmap the log and decode only lines with event markers (much faster on big logs)",
+    )
+    ap.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help=(
+            "parse byte ranges of the log in N processes (0 = one per CPU); "
+            "with --follow, summarize the lines already written that way"
+        ),
+    )
+    mode.add_argument(
+        "--incremental",
+        action="store_true",
+        help="parse only what was appended since the last --incremental run (for a log still being written)",
+    )
+    mode.add_argument(
+        "--follow",
+        action="store_true",
+        help="tail a log still being written and print the running summary after each closed trade",
+    )
+    mode.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="re-parse the log instead of using its .event_cache entry",
+    )
     args = ap.parse_args()
+    if args.jobs != 1 and (args.scan or args.incremental or args.no_cache):
+        ap.error("--jobs só combina com --follow")
+    workers = args.jobs or os.cpu_count() or 1
 
     log_path = Path(args.log)
     if not log_path.exists():
         raise SystemExit(f"Log não encontrado: {log_path}")
+    src = LogSource(log_path)
 
-    lines = _parse_lines(log_path)
-    initial_deposit = parse_initial_deposit(lines)
-    signals, opens, closes = parse_events(lines)
-    trades = pair_trades(signals, opens, closes)
+    if args.follow:
+        if src.compressed:
+            raise SystemExit(f"--follow não se aplica a log compactado: {log_path}")
+        try:
+            follow_log(src, poll_seconds=1.0, workers=workers)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.incremental:
+        if src.compressed:
+            raise SystemExit(f"--incremental não se aplica a log compactado: {log_path}")
+        initial_deposit, trades = parse_incremental(src)
+    else:
+        # The deposit line is near the top of the log, so this scan stops early.
+        initial_deposit = parse_initial_deposit(src.marked_lines((DEPOSIT_MARKER,)))
+        if args.scan:
+            signals, opens, closes = parse_events(src.marked_lines(EVENT_MARKERS))
+        elif args.jobs != 1:
+            signals, opens, closes = parse_events_parallel(src, workers)
+        elif args.no_cache:
+            signals, opens, closes = parse_events(src.lines())
+        else:
+            signals, opens, closes = events_from_tables(load_event_tables(log_path))
+        trades = pair_trades(signals, opens, closes)
 
     init = float(initial_deposit or 0.0)
     equity = compute_equity(trades, init)
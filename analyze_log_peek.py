@@ -2,24 +2,24 @@
 import pandas as pd
 import re
 import sys
+from pathlib import Path
 
-log_file_path = '/media/nexustecnologies/Documentos/EA_Projetos/Vertex_Logic_EA/Vertex_Logic_EA/20251217.log'
+from log_source import LogSource
+
+log_file_path = sys.argv[1] if len(sys.argv) > 1 else Path(__file__).resolve().parent / '20251217.log'
 
 try:
-    with open(log_file_path, 'r', encoding='utf-16') as f:
-        content = f.readlines()
-except UnicodeError:
-    try:
-        with open(log_file_path, 'r', encoding='utf-8') as f:
-            content = f.readlines()
-    except Exception as e:
-        print(f"Error reading file: {e}")
-        sys.exit(1)
+    src = LogSource(log_file_path)
+except OSError as e:
+    print(f"Error reading file: {e}")
+    sys.exit(1)
 
 # Basic parsing simulation (adjust regex based on actual log format)
 # Assuming typical MT5 log format: "Time   Message"
+# Streamed: only the first 20 parsed lines are kept, the rest are counted.
 data = []
-for line in content:
+count = 0
+for line in src.lines():
     line = line.strip()
     if not line: continue
     
@@ -30,9 +30,11 @@ for line in content:
         parts = line.split('   ') # Try 3 spaces
         
     if len(parts) >= 2:
-        data.append({'full_line': line})
+        count += 1
+        if len(data) < 20:
+            data.append({'full_line': line})
 
-print(f"Read {len(data)} lines.")
+print(f"Read {count} lines.")
 if len(data) > 0:
     for i in range(min(20, len(data))):
         print(data[i]['full_line'])
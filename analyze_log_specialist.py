@@ -1,93 +1,51 @@
-import re
 import pandas as pd
 import numpy as np
 import sys
-import datetime
+from pathlib import Path
 
-LOG_FILE = "/media/nexustecnologies/Documentos/EA_Projetos/Vertex_Logic_EA/Vertex_Logic_EA/20251215.log"
+from deal_matcher import Deal, SymbolSpec, match_deals, read_deals
+from event_table import EventTable
+from log_source import LogSource
+from trade_metrics import equity_curve, trade_metrics
+
+LOG_FILE = Path(__file__).resolve().parent / "20251215.log"
+
+# Contract specs for profit in account currency (USD account)
+SYMBOL_SPECS = {
+    "USDJPY": SymbolSpec(contract_size=100_000, tick_size=0.001),
+}
 
 def parse_log(file_path):
-    deals = []
-    
-    # Regex for deal execution
-    # Example: deal #2 buy 0.01 USDJPY at 130.885 done (based on order #2)
-    deal_pattern = re.compile(r"(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2})\s+deal #(\d+) (buy|sell) ([\d.]+) (\w+) at ([\d.]+)")
-    
     try:
-        with open(file_path, 'r', encoding='utf-16le') as f:
-            for line in f:
-                match = deal_pattern.search(line)
-                if match:
-                    timestamp_str, deal_id, direction, volume, symbol, price = match.groups()
-                    dt = datetime.datetime.strptime(timestamp_str, "%Y.%m.%d %H:%M:%S")
-                    deals.append({
-                        'time': dt,
-                        'deal_id': deal_id,
-                        'type': direction,
-                        'volume': float(volume),
-                        'symbol': symbol,
-                        'price': float(price)
-                    })
+        # Only "deal #" lines are decoded
+        return read_deals(LogSource(file_path).marked_lines(("deal #",)))
     except Exception as e:
         print(f"Error reading file: {e}")
-        return pd.DataFrame()
+        return EventTable.empty(Deal)
 
-    return pd.DataFrame(deals)
-
-def analyze_trades(deals_df):
-    if deals_df.empty:
+def analyze_trades(deals):
+    if not deals:
         print("No deals found.")
         return
 
-    trades = []
-    
-    # Simple FIFO matching for single-position strategy
-    # This assumes the EA doesn't hedge or grid significantly
-    # Logic: Buy opens, Sell closes (or vice versa)
-    
-    open_position = None
-    
-    for i, row in deals_df.iterrows():
-        if open_position is None:
-            open_position = row
-        else:
-            # Check if this closes the position
-            # If opposite type, it's a close
-            if row['type'] != open_position['type']:
-                entry_price = open_position['price']
-                exit_price = row['price']
-                volume = open_position['volume']
-                symbol = row['symbol']
-                
-                if open_position['type'] == 'buy':
-                    profit_price_diff = exit_price - entry_price
-                else: # sell
-                    profit_price_diff = entry_price - exit_price
-                
-                # Approximate profit (Symbol generic)
-                # Assuming USDJPY or similar where 0.01 is a pip? No, JPY pip is 0.01.
-                # Just report price diff for now.
-                
-                duration = row['time'] - open_position['time']
-                
-                trades.append({
-                    'entry_time': open_position['time'],
-                    'exit_time': row['time'],
-                    'type': open_position['type'],
-                    'entry_price': entry_price,
-                    'exit_price': exit_price,
-                    'price_diff': profit_price_diff,
-                    'duration': duration,
-                    'symbol': symbol
-                })
-                open_position = None
-            else:
-                # Same direction? Averaging? Not handled in simple model.
-                # Reset for now to avoid confusion or treat as new leg?
-                print(f"Warning: Consecutive {row['type']} at {row['time']}. Strategy might be averaging.")
-                open_position = row # Treat as new base?
-                
-    trades_df = pd.DataFrame(trades)
+    # FIFO netting per symbol: scale-ins, partial closes and reversals are
+    # split into lots (one row per opening deal x closing deal).
+    lots = match_deals(deals, SYMBOL_SPECS)
+
+    trades_df = pd.DataFrame({
+        'entry_time': lots.datetimes('entry_ts'),
+        'exit_time': lots.datetimes('exit_ts'),
+        'type': lots['side'],
+        'volume': lots['volume'],
+        'entry_price': lots['entry_price'],
+        'exit_price': lots['exit_price'],
+        'price_diff': lots['price_diff'],
+        'profit': lots['profit'],
+        'symbol': lots['symbol'],
+        'entry_deal': lots['entry_deal'],
+        'exit_deal': lots['exit_deal'],
+    })
+    trades_df['duration'] = trades_df['exit_time'] - trades_df['entry_time']
     return trades_df
 
 def print_stats(trades_df):
@@ -96,33 +54,24 @@ def print_stats(trades_df):
         return
 
     print("--- ANALYSIS REPORT ---")
-    total_trades = len(trades_df)
-    winning_trades = trades_df[trades_df['price_diff'] > 0]
-    losing_trades = trades_df[trades_df['price_diff'] <= 0]
-    
-    win_rate = len(winning_trades) / total_trades * 100
-    
-    avg_win = winning_trades['price_diff'].mean() if not winning_trades.empty else 0
-    avg_loss = losing_trades['price_diff'].mean() if not losing_trades.empty else 0
-    
-    gross_profit = winning_trades['price_diff'].sum()
-    gross_loss = abs(losing_trades['price_diff'].sum())
-    
-    profit_factor = gross_profit / gross_loss if gross_loss != 0 else float('inf')
+    winning_trades = trades_df[trades_df['profit'] > 0]
+    losing_trades = trades_df[trades_df['profit'] <= 0]
+    m = trade_metrics(trades_df['profit'].to_numpy())
     
-    print(f"Total Trades: {total_trades}")
-    print(f"Win Rate: {win_rate:.2f}%")
-    print(f"Profit Factor: {profit_factor:.2f}")
-    print(f"Avg Win (Price Diff): {avg_win:.5f}")
-    print(f"Avg Loss (Price Diff): {avg_loss:.5f}")
+    print(f"Total Trades: {m.trades}")
+    print(f"Win Rate: {m.win_rate_pct:.2f}%")
+    print(f"Profit Factor: {m.profit_factor:.2f}")
+    print(f"Net Profit: ${m.net:.2f}")
+    print(f"Avg Win: ${m.avg_win:.2f} (Price Diff: {winning_trades['price_diff'].mean() if not winning_trades.empty else 0:.5f})")
+    print(f"Avg Loss: ${m.avg_loss:.2f} (Price Diff: {losing_trades['price_diff'].mean() if not losing_trades.empty else 0:.5f})")
     
-    # Drawdown Analysis (Cumulative Price Diff)
-    trades_df['cum_profit'] = trades_df['price_diff'].cumsum()
-    trades_df['peak'] = trades_df['cum_profit'].cummax()
-    trades_df['drawdown'] = trades_df['peak'] - trades_df['cum_profit']
-    max_dd = trades_df['drawdown'].max()
+    # Drawdown Analysis (Cumulative Profit)
+    eq = equity_curve(trades_df['profit'].to_numpy())
+    trades_df['cum_profit'] = eq.balance_after
+    trades_df['peak'] = eq.peak
+    trades_df['drawdown'] = eq.dd_abs
     
-    print(f"Max Drawdown (Price Diff): {max_dd:.5f}")
+    print(f"Max Drawdown: ${m.max_dd_abs:.2f}")
     
     # Duration Analysis
     avg_duration = trades_df['duration'].mean()
@@ -134,10 +83,10 @@ def print_stats(trades_df):
 
 def main():
     print("Reading log file...")
-    deals_df = parse_log(LOG_FILE)
-    print(f"Parsed {len(deals_df)} deals.")
+    deals = parse_log(sys.argv[1] if len(sys.argv) > 1 else LOG_FILE)
+    print(f"Parsed {len(deals)} deals.")
     
-    trades_df = analyze_trades(deals_df)
+    trades_df = analyze_trades(deals)
     
     if trades_df is not None:
         print_stats(trades_df)
@@ -1,39 +1,35 @@
 import os
+import sys
+from collections import deque
+from pathlib import Path
+
+from log_source import LogSource
+
+LOG_FILE = Path(__file__).resolve().parent / "20251216.log"
 
 def analyze_log(file_path):
     if not os.path.exists(file_path):
         print(f"File not found: {file_path}")
         return
 
-    try:
-        # Try BOM if exists, or UTF-16LE
-        with open(file_path, 'r', encoding='utf-16') as f:
-            lines = f.readlines()
-    except UnicodeError:
-        try:
-             with open(file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-        except Exception as e:
-            print(f"Error reading file: {e}")
-            return
-    except Exception as e:
-        print(f"Error reading file: {e}")
-        return
-
-    print(f"Total lines: {len(lines)}")
-    
-    # Filter for relevant lines
+    # Filter for relevant lines (streaming: only the last 50 are kept)
     keywords = ["Profit", "Sl", "Tp", "Order", "Deal", "Position", "Sinal", "Strategy", "FILTER", "FGM", "1-2-3"]
+    keywords = [k.lower() for k in keywords]
     
-    relevant_lines = []
-    for i, line in enumerate(lines):
-        if any(k.lower() in line.lower() for k in keywords):
+    total = 0
+    relevant_lines = deque(maxlen=50)
+    for i, line in enumerate(LogSource(file_path).lines()):
+        total += 1
+        lower = line.lower()
+        if any(k in lower for k in keywords):
             relevant_lines.append(f"{i+1}: {line.strip()}")
+
+    print(f"Total lines: {total}")
             
     # Print last 50 relevant lines
     print("\n--- Last 50 Relevant Log Lines ---")
-    for line in relevant_lines[-50:]:
+    for line in relevant_lines:
         print(line)
 
 if __name__ == "__main__":
-    analyze_log("/media/nexustecnologies/Documentos/EA_Projetos/Vertex_Logic_EA/Vertex_Logic_EA/20251216.log")
+    analyze_log(sys.argv[1] if len(sys.argv) > 1 else LOG_FILE)
@@ -1,20 +1,27 @@
 import re
+import sys
 from collections import Counter
+from pathlib import Path
+
+from log_source import LogSource
+
+LOG_FILE = Path(__file__).resolve().parent / "20251216.log"
 
 def analyze_rejections(file_path):
     try:
-        with open(file_path, 'r', encoding='utf-16') as f:
-            content = f.read()
-    except:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except Exception as e:
-            print(f"Error: {e}")
-            return
+        src = LogSource(file_path)
+    except OSError as e:
+        print(f"Error: {e}")
+        return
 
-    # Count "FILTRO BLOQUEOU" messages
-    bloqueios = re.findall(r"FILTRO BLOQUEOU: (.*)", content)
+    # One pass, decoding only the lines with either marker
+    bloqueios = []
+    trades = 0
+    for line in src.marked_lines(("FILTRO BLOQUEOU: ", "ALINHAMENTO PERFEITO")):
+        # Count "FILTRO BLOQUEOU" messages
+        bloqueios.extend(re.findall(r"FILTRO BLOQUEOU: (.*)", line))
+        # Count "ALINHAMENTO PERFEITO" (Trades Executed)
+        trades += len(re.findall(r"ALINHAMENTO PERFEITO", line))
     
     print(f"Total de Sinais Bloqueados: {len(bloqueios)}")
     
@@ -23,8 +30,6 @@ def analyze_rejections(file_path):
     for reason, count in counter.most_common(10):
         print(f"{count}x : {reason}")
 
-    # Count "ALINHAMENTO PERFEITO" (Trades Executed)
-    trades = len(re.findall(r"ALINHAMENTO PERFEITO", content))
     print(f"\nTotal de Trades Executados: {trades}")
     
     if trades > 0:
@@ -32,4 +37,4 @@ def analyze_rejections(file_path):
         print(f"Ratio Bloqueio/Trade: {ratio:.1f} (Para cada 1 trade, {ratio:.0f} são bloqueados)")
 
 if __name__ == "__main__":
-    analyze_rejections("/media/nexustecnologies/Documentos/EA_Projetos/Vertex_Logic_EA/Vertex_Logic_EA/20251216.log")
+    analyze_rejections(sys.argv[1] if len(sys.argv) > 1 else LOG_FILE)
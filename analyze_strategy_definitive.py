@@ -8,13 +8,73 @@ e criar uma estratégia matematicamente lucrativa.
 Autor: Análise Python para desenvolvimento de EA
 """
 
-import re
+import sys
 import pandas as pd
 import numpy as np
 from collections import defaultdict
 from datetime import datetime, timedelta
+from pathlib import Path
 
-LOG_FILE = "20251217_utf8.log"
+from log_events import DEPOSIT_MARKER, dispatch, parse_initial_deposit
+from log_source import LogSource
+from log_time import parse_ts
+from position_sizing import EA_STRENGTH_MULTS, kelly_fraction, sweep
+from risk_of_ruin import r_multiples
+from trade_lifecycle import LIFECYCLE_PARSERS, LifecycleAssembler
+
+LOG_FILE = Path(__file__).resolve().parent / "20251217.log"
+
+def _signal_row(sig):
+    return {
+        'id': sig.id,
+        'date': sig.ts.strftime('%Y.%m.%d'),
+        'time': sig.ts.strftime('%H:%M:%S'),
+        'entry': sig.entry,  # 1=BUY, -1=SELL
+        'strength': sig.strength,
+        'confluence': sig.confluence,
+        'trend_ok': sig.trend_ok,
+        'trend_price': sig.trend_price,
+        'rsioma_ok': sig.rsioma_ok,
+        'rsioma_rsi': sig.rsioma_rsi,
+        'rsioma_ma': sig.rsioma_ma,
+        'obv_ok': sig.obv_ok,
+        'obv_hist': sig.obv_hist,
+        'obv_color': sig.obv_color,
+        'was_executed': sig.executed,
+        'was_conflict': sig.conflict,
+    }
+
+def _trade_row(lc):
+    trade = {
+        'open_date': lc.open_ts.strftime('%Y.%m.%d'),
+        'open_time': lc.open_ts.strftime('%H:%M:%S'),
+        'direction': lc.side,
+        'entry_price': lc.open_price,
+        'volume': lc.volume,
+        'sl': lc.sl,
+        'tp': lc.tp,
+        'be_activated': lc.be_ts is not None,
+        'trailing_used': lc.trailing_moves > 0,
+        'close_date': lc.close_ts.strftime('%Y.%m.%d'),
+        'close_time': lc.close_ts.strftime('%H:%M:%S'),
+        'result': lc.outcome,
+        'profit': lc.profit,
+        'close_reason': lc.reason,
+    }
+    sig = lc.signal
+    if sig:
+        # Estado do sinal no momento da abertura
+        trade['signal_id'] = sig.id
+        trade['signal_entry'] = sig.entry
+        trade['signal_strength'] = sig.strength
+        trade['signal_confluence'] = sig.confluence
+        trade['trend_ok'] = sig.trend_ok
+        trade['rsioma_ok'] = sig.rsioma_ok
+        trade['rsioma_rsi'] = sig.rsioma_rsi
+        trade['obv_ok'] = sig.obv_ok
+        trade['obv_hist'] = sig.obv_hist
+        trade['obv_color'] = sig.obv_color
+    return trade
 
 def parse_complete_log(log_file):
     """
@@ -23,151 +83,26 @@ def parse_complete_log(log_file):
     - Condições de filtros (RSIOMA, OBV, VWAP, EMA)
     - Trades executados
     - Resultados (WIN/LOSS com profit/loss)
+    
+    Uma única passada pela máquina de estados de trade_lifecycle: cada trade
+    (sinal, filtros, abertura, BE/TS, fechamento) é montado pelo seu ticket e
+    entregue assim que fecha, mesmo com posições sobrepostas.
     """
     
     all_signals = []
     all_trades = []
-    current_signal = None
-    current_trade = None
-    
-    # Padrões regex
-    patterns = {
-        'signal': re.compile(
-            r'(\d{4}\.\d{2}\.\d{2})\s+(\d{2}:\d{2}:\d{2}).*Sinal detectado.*Entry=(-?\d+).*Strength=(-?\d+).*Confluence=([\d.]+)%'
-        ),
-        'trend_ok': re.compile(r'PASSO 1:.*CONFIRMADA.*Close[=>< ]+([\d.]+)'),
-        'rsioma_approved': re.compile(r'RSIOMA ESTADO: APROVADO.*\(([\d.]+)\s*[><]\s*([\d.]+)\)'),
-        'rsioma_rejected': re.compile(r'RSIOMA STATUS: REPROVADO.*\[(BUY|SELL)\]'),
-        'obv_approved': re.compile(r'OBV MACD:.*APROVADO'),
-        'obv_rejected': re.compile(r'OBV MACD STATUS: REPROVADO'),
-        'obv_hist': re.compile(r'\[OBV MACD DEBUG\].*Hist=([\-\d.]+).*Color=(\d+)'),
-        'conflict': re.compile(r'SINAL REJEITADO: Conflito Entry/Strength'),
-        'trade_open': re.compile(
-            r'(\d{4}\.\d{2}\.\d{2})\s+(\d{2}:\d{2}:\d{2}).*TRADE: (BUY|SELL) @ ([\d.]+).*SL: ([\d.]+).*TP: ([\d.]+)'
-        ),
-        'trade_close': re.compile(
-            r'(\d{4}\.\d{2}\.\d{2})\s+(\d{2}:\d{2}:\d{2}).*TRADE CLOSED: (WIN|LOSS).*Profit: ([\-\d.]+).*Razão: (.*)'
-        ),
-        'be_activated': re.compile(r'Break Even ATIVADO'),
-        'trailing': re.compile(r'Trailing.*modificado'),
-    }
-    
-    signal_count = 0
-    
-    with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
-        for line in f:
-            # Novo sinal detectado
-            sig_match = patterns['signal'].search(line)
-            if sig_match:
-                signal_count += 1
-                current_signal = {
-                    'id': signal_count,
-                    'date': sig_match.group(1),
-                    'time': sig_match.group(2),
-                    'entry': int(sig_match.group(3)),  # 1=BUY, -1=SELL
-                    'strength': int(sig_match.group(4)),
-                    'confluence': float(sig_match.group(5)),
-                    'trend_ok': False,
-                    'trend_price': 0.0,
-                    'rsioma_ok': False,
-                    'rsioma_rsi': 0.0,
-                    'rsioma_ma': 0.0,
-                    'obv_ok': False,
-                    'obv_hist': 0.0,
-                    'obv_color': -1,
-                    'was_executed': False,
-                    'was_conflict': False,
-                }
-                all_signals.append(current_signal)
-            
-            if current_signal:
-                # Passo 1 - Tendência
-                trend_match = patterns['trend_ok'].search(line)
-                if trend_match:
-                    current_signal['trend_ok'] = True
-                    current_signal['trend_price'] = float(trend_match.group(1))
-                
-                # RSIOMA aprovado
-                rsioma_app = patterns['rsioma_approved'].search(line)
-                if rsioma_app:
-                    current_signal['rsioma_ok'] = True
-                    current_signal['rsioma_rsi'] = float(rsioma_app.group(1))
-                    current_signal['rsioma_ma'] = float(rsioma_app.group(2))
-                
-                # RSIOMA rejeitado
-                if patterns['rsioma_rejected'].search(line):
-                    current_signal['rsioma_ok'] = False
-                
-                # OBV dados
-                obv_data = patterns['obv_hist'].search(line)
-                if obv_data:
-                    current_signal['obv_hist'] = float(obv_data.group(1))
-                    current_signal['obv_color'] = int(obv_data.group(2))
-                
-                # OBV aprovado/rejeitado
-                if patterns['obv_approved'].search(line):
-                    current_signal['obv_ok'] = True
-                if patterns['obv_rejected'].search(line):
-                    current_signal['obv_ok'] = False
-                
-                # Conflito Entry/Strength
-                if patterns['conflict'].search(line):
-                    current_signal['was_conflict'] = True
-            
-            # Trade aberto
-            trade_match = patterns['trade_open'].search(line)
-            if trade_match:
-                current_trade = {
-                    'open_date': trade_match.group(1),
-                    'open_time': trade_match.group(2),
-                    'direction': trade_match.group(3),
-                    'entry_price': float(trade_match.group(4)),
-                    'sl': float(trade_match.group(5)),
-                    'tp': float(trade_match.group(6)),
-                    'be_activated': False,
-                    'trailing_used': False,
-                    'close_date': '',
-                    'close_time': '',
-                    'result': '',
-                    'profit': 0.0,
-                    'close_reason': '',
-                }
-                
-                # Vincular ao último sinal
-                if current_signal:
-                    current_signal['was_executed'] = True
-                    current_trade['signal_id'] = current_signal['id']
-                    current_trade['signal_entry'] = current_signal['entry']
-                    current_trade['signal_strength'] = current_signal['strength']
-                    current_trade['signal_confluence'] = current_signal['confluence']
-                    current_trade['trend_ok'] = current_signal['trend_ok']
-                    current_trade['rsioma_ok'] = current_signal['rsioma_ok']
-                    current_trade['rsioma_rsi'] = current_signal['rsioma_rsi']
-                    current_trade['obv_ok'] = current_signal['obv_ok']
-                    current_trade['obv_hist'] = current_signal['obv_hist']
-                    current_trade['obv_color'] = current_signal['obv_color']
-            
-            if current_trade:
-                # BE ativado
-                if patterns['be_activated'].search(line):
-                    current_trade['be_activated'] = True
-                
-                # Trailing usado
-                if patterns['trailing'].search(line):
-                    current_trade['trailing_used'] = True
-            
-            # Trade fechado
-            close_match = patterns['trade_close'].search(line)
-            if close_match and current_trade:
-                current_trade['close_date'] = close_match.group(1)
-                current_trade['close_time'] = close_match.group(2)
-                current_trade['result'] = close_match.group(3)
-                current_trade['profit'] = float(close_match.group(4))
-                current_trade['close_reason'] = close_match.group(5).strip()
-                all_trades.append(current_trade)
-                current_trade = None
-    
-    return all_signals, all_trades
+    asm = LifecycleAssembler()
+    
+    for rec, (kind, data) in dispatch(LogSource(log_file).lines(), LIFECYCLE_PARSERS):
+        for lc in asm.feed(parse_ts(rec.ts), kind, data):
+            # Fechamento sem abertura conhecida não entra na análise de trades
+            if lc.open_ts is not None and lc.closed:
+                all_trades.append(_trade_row(lc))
+        if kind == 'signal':
+            all_signals.append(asm.signal)
+    
+    # Sinais são atualizados pelos filtros até o fim; converter só agora
+    return [_signal_row(s) for s in all_signals], all_trades
 
 def analyze_winning_patterns(signals, trades):
     """
@@ -350,6 +285,56 @@ def calculate_optimal_parameters(trades):
             else:
                 print(f"   🟢 Kelly POSITIVO = Sistema pode ser operado")
 
+def sweep_position_sizing(trades, initial_deposit):
+    """
+    Reexecuta a sequência de trades sob uma grade de regras de lote
+    (lote fixo, risco %, Kelly fracionado, multiplicadores F3/F4/F5).
+    """
+    print("\n" + "=" * 100)
+    print("               💰 VARREDURA DE DIMENSIONAMENTO DE POSIÇÃO")
+    print("=" * 100)
+    
+    df = pd.DataFrame(trades)
+    if len(df) == 0 or 'volume' not in df.columns:
+        print("❌ Sem trades para análise")
+        return None
+    
+    # R-múltiplo de cada trade com o lote registrado (conversão de deal_matcher.SymbolSpec)
+    r = r_multiples(df.rename(columns={'entry_price': 'open_price'}))
+    strength = df['signal_strength'] if 'signal_strength' in df.columns else np.zeros(len(df))
+    kelly = kelly_fraction(r)
+    
+    grid = sweep(
+        df['profit'], df['volume'], r, strength, initial_deposit,
+        fixed_lots=[0.01, 0.05, 0.1, 0.5, 1.0],
+        risk_pcts=[0.25, 0.5, 1.0, 2.0, 3.0],
+        kelly_fractions=[0.25, 0.5, 1.0],
+        strength_mults=[EA_STRENGTH_MULTS, (1.0, 1.0, 1.0), (0.0, 1.0, 1.5), (0.0, 0.5, 1.0)],
+    )
+    
+    if kelly <= 0:
+        print("\n   🔴 Kelly dos R-múltiplos <= 0: sem vantagem, regras Kelly omitidas")
+    # Regras que não abrem nenhum trade terminam no saldo inicial sem DD: fora do ranking
+    active = np.flatnonzero(grid['trades'] > 0)
+    print(f"\n   Depósito: ${initial_deposit:.2f} | {len(grid)} regras | ruína = DD total de 10%")
+    print(f"\n   {'Regra':<34} {'F3/F4/F5':<14} {'Saldo':>10} {'Ret %':>8} {'DD %':>7} {'Ruína':>7}")
+    for i in active[np.argsort(-grid['final_balance'][active], kind='stable')][:15]:
+        row = grid.take([i]).tolist()[0]
+        if row.mode == 'fixed':
+            rule, mults = f"Lote fixo {row.lot:.2f}", "-"
+        elif row.mode == 'kelly':
+            rule = f"Kelly x{row.kelly_fraction:.2f} ({row.risk_pct:.2f}%)"
+            mults = f"{row.mult_f3:g}/{row.mult_f4:g}/{row.mult_f5:g}"
+        else:
+            rule = f"Risco {row.risk_pct:.2f}%"
+            mults = f"{row.mult_f3:g}/{row.mult_f4:g}/{row.mult_f5:g}"
+        ruin = f"#{row.ruin_trade + 1}" if row.ruined else "não"
+        print(f"   {rule:<34} {mults:<14} {row.final_balance:>10.2f} {row.return_pct:>8.1f} {row.max_dd_pct:>7.1f} {ruin:>7}")
+    
+    ruined = int(grid['ruined'].sum())
+    print(f"\n   {ruined} de {len(grid)} regras atingem o DD total de 10%")
+    return grid
+
 def generate_new_strategy():
     """
     Gera recomendações para nova estratégia baseada na análise.
@@ -454,8 +439,12 @@ def main():
     print("🔬 ANÁLISE ESTRATÉGICA DEFINITIVA - EA VERTEX_LOGIC")
     print("=" * 100)
     
+    log_file = sys.argv[1] if len(sys.argv) > 1 else LOG_FILE
     try:
-        signals, trades = parse_complete_log(LOG_FILE)
+        signals, trades = parse_complete_log(log_file)
+        # Depósito: 2º argumento, senão o "initial deposit" do log
+        initial_deposit = float(sys.argv[2]) if len(sys.argv) > 2 else None
+        initial_deposit = initial_deposit or parse_initial_deposit(LogSource(log_file).marked_lines((DEPOSIT_MARKER,)))
     except Exception as e:
         print(f"❌ Erro ao ler log: {e}")
         return
@@ -473,7 +462,14 @@ def main():
     # 3. Parâmetros ótimos
     calculate_optimal_parameters(trades)
     
-    # 4. Nova estratégia
+    # 4. Dimensionamento de posição
+    if initial_deposit:
+        sweep_position_sizing(trades, initial_deposit)
+    else:
+        print("\n❌ Depósito inicial não encontrado no log: varredura de lote ignorada")
+        print(f"   Informe o depósito: python {Path(__file__).name} <log> <depósito>")
+    
+    # 5. Nova estratégia
     generate_new_strategy()
     
     print("\n" + "=" * 100)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Sorted as-of joins: attach the nearest earlier (or later) event to each row.
+
+Matching a trade to "the last signal before it opened" used to be a backwards
+scan over every signal for every trade, O(trades x signals). Here the right
+side is sorted once and each left row finds its match with a binary search
+(`numpy.searchsorted`), O((n + m) log m) for the whole join.
+
+    idx = asof_indices(open_ts, signal_ts, direction="backward", max_delta_seconds=3600)
+    # idx[i] is the row of signal_ts matched to open_ts[i], or -1
+
+Options:
+
+- `direction`: "backward" (last right row at/before the left time, like the
+  old scans), "forward" (first one at/after) or "nearest" (the closer of the
+  two; a tie goes backward).
+- `max_delta_seconds`: a match further away than this becomes -1. The match
+  is not replaced by a farther candidate in the allowed range.
+- `left_by` / `right_by`: only rows with equal keys match (side, entry, ...).
+- `allow_exact_matches`: whether equal times match.
+
+Among right rows with equal times, "backward" takes the last and "forward"
+the first in their original order, which is what the scans did on logs in
+file order. Times are epoch seconds (or anything numpy orders the same way,
+e.g. datetime64); `asof_join()` takes them from `EventTable` columns.
+
+`signal_context()` uses this to attach the [OBV MACD DEBUG] reading and the
+RSIOMA check the EA logs right after each "Sinal detectado!" line.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Sequence
+
+import numpy as np
+
+from event_table import Categorical, EventTable
+
+
+DIRECTIONS = ("backward", "forward", "nearest")
+
+
+def _times(values: Any) -> np.ndarray:
+    arr = np.asarray(values)
+    if arr.dtype.kind == "M":
+        arr = arr.astype("datetime64[s]").view(np.int64)
+    return arr
+
+
+def _asof_sorted(
+    left: np.ndarray, right_sorted: np.ndarray, direction: str, tolerance, allow_exact: bool
+) -> np.ndarray:
+    """Positions into `right_sorted` (-1 for no match) for each left time."""
+    n = len(right_sorted)
+    if direction in ("backward", "nearest"):
+        back = np.searchsorted(right_sorted, left, side="right" if allow_exact else "left") - 1
+    if direction in ("forward", "nearest"):
+        fwd = np.searchsorted(right_sorted, left, side="left" if allow_exact else "right")
+        fwd[fwd >= n] = -1
+
+    if direction == "backward":
+        pos = back
+    elif direction == "forward":
+        pos = fwd
+    else:
+        back_gap = np.where(back >= 0, left - right_sorted[np.maximum(back, 0)], np.inf)
+        fwd_gap = np.where(fwd >= 0, right_sorted[np.maximum(fwd, 0)] - left, np.inf)
+        pos = np.where(fwd_gap < back_gap, fwd, back)
+
+    if tolerance is not None and n:
+        gap = np.abs(left - right_sorted[np.maximum(pos, 0)])
+        pos = np.where(gap <= tolerance, pos, -1)
+    return pos
+
+
+def asof_indices(
+    left_on: Any,
+    right_on: Any,
+    *,
+    direction: str = "backward",
+    max_delta_seconds: float | None = None,
+    left_by: Any = None,
+    right_by: Any = None,
+    allow_exact_matches: bool = True,
+) -> np.ndarray:
+    """Index into `right_on` of each left row's match, or -1 (see module docstring).
+
+    Neither side needs to be sorted.
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {DIRECTIONS}, not {direction!r}")
+    if (left_by is None) != (right_by is None):
+        raise ValueError("left_by and right_by go together")
+    left = _times(left_on)
+    right = _times(right_on)
+    out = np.full(len(left), -1, dtype=np.intp)
+    if not len(left) or not len(right):
+        return out
+
+    if left_by is None:
+        groups = [(slice(None), slice(None))]
+    else:
+        lkeys = np.asarray(left_by)
+        rkeys = np.asarray(right_by)
+        if len(lkeys) != len(left) or len(rkeys) != len(right):
+            raise ValueError("a by-key column has a different length than its times")
+        groups = [(np.flatnonzero(lkeys == k), np.flatnonzero(rkeys == k)) for k in np.unique(lkeys)]
+
+    for lsel, rsel in groups:
+        rows = np.arange(len(right))[rsel]
+        if not len(rows):
+            continue
+        # Stable sort: equal times keep their original order.
+        order = np.argsort(right[rows], kind="stable")
+        rows = rows[order]
+        pos = _asof_sorted(left[lsel], right[rows], direction, max_delta_seconds, allow_exact_matches)
+        out[lsel] = np.where(pos >= 0, rows[np.maximum(pos, 0)], -1)
+    return out
+
+
+def _key_column(table: EventTable, key: Any) -> Any:
+    return table[key] if isinstance(key, str) else key
+
+
+def asof_join(
+    left: EventTable,
+    right: EventTable,
+    *,
+    on: str = "ts",
+    right_on: str | None = None,
+    left_by: Any = None,
+    right_by: Any = None,
+    direction: str = "backward",
+    max_delta_seconds: float | None = None,
+    allow_exact_matches: bool = True,
+) -> np.ndarray:
+    """asof_indices() on table columns: index of each left row's match in `right`, or -1.
+
+    `left_by` / `right_by` are column names or arrays (e.g. a side derived
+    from a signal's entry sign).
+    """
+    return asof_indices(
+        left[on],
+        right[right_on or on],
+        direction=direction,
+        max_delta_seconds=max_delta_seconds,
+        left_by=None if left_by is None else _key_column(left, left_by),
+        right_by=None if right_by is None else _key_column(right, right_by),
+        allow_exact_matches=allow_exact_matches,
+    )
+
+
+def take_matched(values: Sequence | np.ndarray | EventTable, idx: np.ndarray, fill: Any = None) -> list:
+    """values[i] for each match index i, `fill` where i == -1 (rows for a table)."""
+    if isinstance(values, EventTable):
+        # One gather instead of a row lookup per match.
+        rows = list(values.take(np.maximum(idx, 0))) if len(values) else [fill] * len(idx)
+        return [fill if i < 0 else r for r, i in zip(rows, idx.tolist())]
+    return [fill if i < 0 else values[i] for i in idx.tolist()]
+
+
+@dataclass(frozen=True)
+class SignalContext:
+    ts: datetime
+    bar: int
+    entry: int  # 1=BUY, -1=SELL
+    strength: int
+    confluence: float
+    obv_hist1: float | None
+    obv_hist2: float | None
+    obv_color: int | None
+    obv_threshold: float | None
+    rsioma: str  # "approved", "rejected" or "" (no check logged)
+    rsioma_rsi: float | None
+    rsioma_ma: float | None
+
+
+def signal_context(tables: dict[str, EventTable], max_delta_seconds: float = 0) -> EventTable:
+    """Signals with the OBV MACD reading and RSIOMA check logged with them.
+
+    `tables` are log event tables (event_cache.load_event_tables()). The EA
+    logs both right after the signal, on the same bar, so by default only
+    readings with the signal's own timestamp match. The RSIOMA check must be
+    for the signal's side.
+    """
+    signals = tables["signals"]
+    obv = tables["obv_debug"]
+    rsioma = tables["rsioma"]
+    sides = np.where(signals["entry"] > 0, "BUY", "SELL")
+
+    # "nearest" with equal times picks the last reading at the signal's time,
+    # i.e. the one logged after it.
+    o = asof_join(signals, obv, direction="nearest", max_delta_seconds=max_delta_seconds)
+    r = asof_join(
+        signals,
+        rsioma,
+        left_by=sides,
+        right_by=rsioma["side"].astype(str),
+        direction="nearest",
+        max_delta_seconds=max_delta_seconds,
+    )
+
+    def matched(table: EventTable, idx: np.ndarray, name: str) -> np.ma.MaskedArray:
+        values = table[name]
+        taken = values[np.maximum(idx, 0)] if len(values) else np.zeros(len(idx), dtype=values.dtype)
+        return np.ma.masked_array(taken, mask=idx < 0)
+
+    approved = rsioma["approved"]
+    state = np.full(len(signals), "", dtype=object)
+    hit = r >= 0
+    state[hit] = np.where(approved[r[hit]], "approved", "rejected")
+    rsi = matched(rsioma, r, "rsi")
+    ma = matched(rsioma, r, "ma")
+    return EventTable.from_columns(
+        SignalContext,
+        ts=signals["ts"],
+        bar=signals["bar"],
+        entry=signals["entry"],
+        strength=signals["strength"],
+        confluence=signals["confluence"],
+        obv_hist1=matched(obv, o, "hist1"),
+        obv_hist2=matched(obv, o, "hist2"),
+        obv_color=matched(obv, o, "color"),
+        obv_threshold=matched(obv, o, "threshold"),
+        rsioma=Categorical.from_values(state.tolist()),
+        # A blocked check logs no MA: NaN there means "not logged".
+        rsioma_rsi=np.ma.masked_invalid(rsi),
+        rsioma_ma=np.ma.masked_invalid(ma),
+    )
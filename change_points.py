@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Online change-point detection on the per-trade PnL and win/loss stream.
+
+The collapse after 2023.01.26 was found by eye and then passed by hand to
+collapse_analysis_full. The detectors here find such breaks on their own,
+one trade at a time, so they can also run on the tail of a live log:
+
+- `CusumDetector`: two-sided CUSUM of the PnL, standardized by the mean and
+  standard deviation of the current segment (Welford, after `warmup`
+  trades). An alarm when either side exceeds `threshold` (in standard
+  deviations, with slack `drift`) puts the change where that side last left
+  zero. The new segment starts with the statistics of the trades since then,
+  which are kept as running sums, so nothing is replayed.
+- `BocpdDetector`: Bayesian online change-point detection (Adams & MacKay)
+  of the win/loss sequence with a Beta-Bernoulli model and a constant
+  hazard. The run-length posterior is truncated to `max_run` entries (the
+  last one means "at least that long"), so each update costs a fixed
+  O(max_run) numpy step. A change is reported once the run lengths that
+  start at least `min_segment` trades after the last change and have lasted
+  `confirm` trades hold `evidence` of the posterior; it goes at the start
+  of the most probable of them.
+
+Both report each change as a `ChangePoint` with the index of the first trade
+of the new segment and the index at which it was detected.
+`ChangePointDetector` runs both, merging reports closer than `min_segment`
+trades; `detect_change_points()` runs it over a whole sequence and
+`segments()` turns the changes into [start, end) trade ranges.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Iterable
+
+import numpy as np
+
+from log_time import from_epoch
+
+
+@dataclass(frozen=True)
+class ChangePoint:
+    index: int  # first trade of the new segment
+    detected_at: int  # trade whose update reported it
+    method: str  # "cusum" / "bocpd"
+    ts: datetime | None = None  # close time of trade `index`, when known
+
+
+@dataclass
+class _Moments:
+    """Count, mean and sum of squared deviations (Welford)."""
+
+    n: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def add(self, x: float) -> None:
+        self.n += 1
+        d = x - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (x - self.mean)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n >= 2 else 0.0
+
+
+@dataclass
+class CusumDetector:
+    """Two-sided standardized CUSUM of the PnL (see module docstring)."""
+
+    threshold: float = 8.0
+    drift: float = 0.5
+    warmup: int = 20
+    n: int = 0
+    ref: _Moments = field(default_factory=_Moments)
+    # Per side: statistic, index where it last left zero, moments since then.
+    up: float = 0.0
+    down: float = 0.0
+    up_start: int = 0
+    down_start: int = 0
+    up_since: _Moments = field(default_factory=_Moments)
+    down_since: _Moments = field(default_factory=_Moments)
+
+    def update(self, profit: float) -> ChangePoint | None:
+        i = self.n
+        self.n += 1
+        if self.ref.n < self.warmup:
+            self.ref.add(profit)
+            return None
+        sd = self.ref.std or 1.0
+        z = (profit - self.ref.mean) / sd
+        self.ref.add(profit)
+
+        if self.up == 0.0:
+            self.up_start, self.up_since = i, _Moments()
+        if self.down == 0.0:
+            self.down_start, self.down_since = i, _Moments()
+        self.up = max(0.0, self.up + z - self.drift)
+        self.down = max(0.0, self.down - z - self.drift)
+        self.up_since.add(profit)
+        self.down_since.add(profit)
+
+        if self.up > self.threshold or self.down > self.threshold:
+            start, since = (self.up_start, self.up_since) if self.up > self.threshold else (
+                self.down_start,
+                self.down_since,
+            )
+            self.ref = since
+            self.up = self.down = 0.0
+            return ChangePoint(start, i, "cusum")
+        return None
+
+
+@dataclass
+class BocpdDetector:
+    """Beta-Bernoulli BOCPD of the win/loss sequence (see module docstring)."""
+
+    hazard: float = 1 / 500
+    max_run: int = 500
+    prior_wins: float = 1.0
+    prior_losses: float = 1.0
+    min_segment: int = 20
+    confirm: int = 10
+    evidence: float = 0.9
+    n: int = 0
+    last_change: int = 0
+    prob: np.ndarray = field(default_factory=lambda: np.ones(1))
+    wins: np.ndarray = field(default_factory=lambda: np.zeros(1))  # per run length
+
+    def update(self, win: bool) -> ChangePoint | None:
+        i = self.n
+        self.n += 1
+        runs = np.arange(len(self.prob), dtype=np.float64)
+        a = self.prior_wins + self.wins
+        b = self.prior_losses + (runs - self.wins)
+        pred = (a if win else b) / (a + b)
+        joint = self.prob * pred
+        grown = joint * (1.0 - self.hazard)
+        prob = np.concatenate(([joint.sum() * self.hazard], grown))
+        wins = np.concatenate(([0.0], self.wins + win))
+        if len(prob) > self.max_run:
+            # Fold the longest run into the "at least max_run - 1" slot.
+            prob[-2] += prob[-1]
+            prob, wins = prob[:-1], wins[:-1]
+        self.prob = prob / prob.sum()
+        self.wins = wins
+
+        # Runs that would start a segment at least min_segment trades after
+        # the last change; the capped slot never does.
+        longest = min(i + 1 - self.last_change - self.min_segment, len(self.prob) - 2)
+        if longest < self.confirm or self.prob[: longest + 1].sum() < self.evidence:
+            return None
+        run = self.confirm + int(np.argmax(self.prob[self.confirm : longest + 1]))
+        self.last_change = i + 1 - run
+        return ChangePoint(self.last_change, i, "bocpd")
+
+
+@dataclass
+class ChangePointDetector:
+    """CUSUM on PnL plus BOCPD on win/loss, one trade at a time."""
+
+    cusum: CusumDetector = field(default_factory=CusumDetector)
+    bocpd: BocpdDetector = field(default_factory=BocpdDetector)
+    min_segment: int = 20
+    changes: list[ChangePoint] = field(default_factory=list)
+
+    def update(self, profit: float) -> list[ChangePoint]:
+        """Add the next trade; returns the changes it revealed (usually none)."""
+        found = []
+        for cp in (self.cusum.update(profit), self.bocpd.update(profit > 0)):
+            if cp is None:
+                continue
+            if self.changes and abs(cp.index - self.changes[-1].index) < self.min_segment:
+                continue
+            found.append(cp)
+            self.changes.append(cp)
+        return found
+
+
+def detect_change_points(profits: Any, close_ts: Any = None, **options: Any) -> list[ChangePoint]:
+    """Changes in a whole trade sequence, in detection order; `options` go to ChangePointDetector."""
+    det = ChangePointDetector(**options)
+    for p in np.asarray(profits, dtype=np.float64).tolist():
+        det.update(p)
+    if close_ts is None:
+        return det.changes
+    ts = np.asarray(close_ts, dtype=np.int64)
+    return [ChangePoint(c.index, c.detected_at, c.method, from_epoch(int(ts[c.index]))) for c in det.changes]
+
+
+def segments(changes: Iterable[ChangePoint], n: int) -> list[tuple[int, int]]:
+    """[start, end) trade ranges between the changes of a sequence of `n` trades."""
+    cuts = sorted({c.index for c in changes if 0 < c.index < n})
+    bounds = [0, *cuts, n]
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
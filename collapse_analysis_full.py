@@ -1,145 +1,159 @@
 #!/usr/bin/env python3
 """
 Análise Completa do Colapso do EA FGM_TrendRider
-Identifica problemas de estratégia e filtros fracos a partir do dia 26
+Identifica problemas de estratégia e filtros fracos a partir de uma data
+(--date) ou de cada mudança de regime detectada nos trades (change_points)
 """
 
+import argparse
 import re
-from datetime import datetime, timedelta
+from bisect import bisect_right
 from collections import defaultdict
+from pathlib import Path
 
-def analyze_collapse(log_path, collapse_date="2023.01.26"):
-    """Analisa o log para identificar o problema do colapso"""
-    
-    # Ler o log (tentar UTF-8 primeiro, já convertido)
-    try:
-        with open(log_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-    except:
-        with open(log_path, 'r', encoding='utf-16') as f:
-            lines = f.readlines()
-    
-    collapse_dt = datetime.strptime(collapse_date, "%Y.%m.%d")
-    
-    # Dados coletados
-    trades_before = []
-    trades_after = []
-    signals_before = []
-    signals_after = []
-    filters_blocked_before = defaultdict(int)
-    filters_blocked_after = defaultdict(int)
-    entries_by_direction = {'before': {'BUY': 0, 'SELL': 0}, 'after': {'BUY': 0, 'SELL': 0}}
-    
-    # Regex patterns
-    trade_regex = r"(\d{4}\.\d{2}\.\d{2})\s+\d{2}:\d{2}:\d{2}.*Posição fechada - Lucro:\s*([-\d.]+)\s*\|\s*Razão:\s*(.+)"
-    signal_regex = r"(\d{4}\.\d{2}\.\d{2})\s+\d{2}:\d{2}:\d{2}.*Sinal detectado.*Entry=([-\d]+).*Strength=([-\d]+).*Confluence=([\d.]+)%"
-    filter_regex = r"(\d{4}\.\d{2}\.\d{2})\s+\d{2}:\d{2}:\d{2}.*FILTRO BLOQUEOU:\s*(.+)"
-    rsioma_debug = r"(\d{4}\.\d{2}\.\d{2})\s+\d{2}:\d{2}:\d{2}.*RSIOMA FILTRO:\s*(BUY|SELL)\s*(APROVADO|BLOQUEADO)"
-    obvmacd_debug = r"(\d{4}\.\d{2}\.\d{2})\s+\d{2}:\d{2}:\d{2}.*OBV MACD:.*\((Verde|Vermelho|Neutro).*\).*-\s*(APROVADO|BLOQUEADO)"
-    
-    for line in lines:
-        # Parse timestamp
-        ts_match = re.search(r"(\d{4}\.\d{2}\.\d{2})", line)
-        if not ts_match:
-            continue
-        
-        try:
-            current_dt = datetime.strptime(ts_match.group(1), "%Y.%m.%d")
-        except:
-            continue
-        
-        is_after = current_dt >= collapse_dt
-        period = 'after' if is_after else 'before'
-        
-        # Parse trades
-        trade_match = re.search(trade_regex, line)
-        if trade_match:
-            profit = float(trade_match.group(2))
-            reason = trade_match.group(3).strip()
-            trade = {
-                'date': ts_match.group(1),
-                'profit': profit,
-                'reason': reason,
-                'is_win': profit > 0
-            }
-            if is_after:
-                trades_after.append(trade)
-            else:
-                trades_before.append(trade)
-        
-        # Parse signals
-        sig_match = re.search(signal_regex, line)
-        if sig_match:
-            entry = int(sig_match.group(2))
-            strength = int(sig_match.group(3))
-            confluence = float(sig_match.group(4))
+from change_points import ChangePointDetector, detect_change_points, segments
+from log_events import dispatch
+from log_index import lines_between
+from log_source import LogSource
+from log_time import day_epoch, from_epoch, ts_epoch
+
+TRADE_RE = re.compile(r"Posição fechada - Lucro:\s*([-\d.]+)\s*\|\s*Razão:\s*(.+)")
+SIGNAL_RE = re.compile(r"Sinal detectado.*Entry=([-\d]+).*Strength=([-\d]+).*Confluence=([\d.]+)%")
+FILTER_RE = re.compile(r"FILTRO BLOQUEOU:\s*(.+)")
+
+def _parse_position_closed(rec):
+    m = TRADE_RE.match(rec.msg)
+    return m and ('trade', (float(m.group(1)), m.group(2).strip()))
+
+def _parse_signal(rec):
+    m = SIGNAL_RE.match(rec.msg)
+    return m and ('signal', (int(m.group(1)), int(m.group(2)), float(m.group(3))))
+
+def _parse_filter_block(rec):
+    m = FILTER_RE.match(rec.msg)
+    return m and ('filter', m.group(1).strip())
+
+LOG_PARSERS = {
+    'Posição': _parse_position_closed,
+    'Sinal': _parse_signal,
+    'FILTRO': _parse_filter_block,
+}
+
+def _block_key(reason):
+    """Simplifica a razão do bloqueio para categorização."""
+    if 'Spread' in reason:
+        return 'Spread alto'
+    if 'OBV MACD' in reason:
+        return 'OBV MACD bloqueou'
+    if 'RSIOMA' in reason:
+        return 'RSIOMA bloqueou'
+    if 'Fase' in reason:
+        return 'Fase inadequada'
+    if 'Cooldown' in reason:
+        return 'Cooldown'
+    if 'ATR' in reason:
+        return 'ATR filtro'
+    return reason[:30]
+
+
+def collect_events(lines):
+    """(trades, sinais, bloqueios) do log, em ordem, com o epoch de cada um."""
+    trades, signals, blocks = [], [], []
+    for rec, (kind, data) in dispatch(lines, LOG_PARSERS):
+        date = rec.ts[:10]
+        epoch = ts_epoch(rec.ts)
+        if kind == 'trade':
+            profit, reason = data
+            trades.append({'date': date, 'epoch': epoch, 'profit': profit, 'reason': reason, 'is_win': profit > 0})
+        elif kind == 'signal':
+            entry, strength, confluence = data
             direction = 'BUY' if entry == 1 else 'SELL' if entry == -1 else 'NONE'
-            signal = {
-                'date': ts_match.group(1),
-                'direction': direction,
-                'strength': strength,
-                'confluence': confluence
-            }
-            if is_after:
-                signals_after.append(signal)
-                entries_by_direction['after'][direction] = entries_by_direction['after'].get(direction, 0) + 1
-            else:
-                signals_before.append(signal)
-                entries_by_direction['before'][direction] = entries_by_direction['before'].get(direction, 0) + 1
-        
-        # Parse filter blocks
-        filter_match = re.search(filter_regex, line)
-        if filter_match:
-            reason = filter_match.group(2).strip()
-            # Simplificar razão para categorização
-            if 'Spread' in reason:
-                reason_key = 'Spread alto'
-            elif 'OBV MACD' in reason:
-                reason_key = 'OBV MACD bloqueou'
-            elif 'RSIOMA' in reason:
-                reason_key = 'RSIOMA bloqueou'
-            elif 'Fase' in reason:
-                reason_key = 'Fase inadequada'
-            elif 'Cooldown' in reason:
-                reason_key = 'Cooldown'
-            elif 'ATR' in reason:
-                reason_key = 'ATR filtro'
-            else:
-                reason_key = reason[:30]
-            
-            if is_after:
-                filters_blocked_after[reason_key] += 1
-            else:
-                filters_blocked_before[reason_key] += 1
-    
+            signals.append(
+                {'date': date, 'epoch': epoch, 'direction': direction, 'strength': strength, 'confluence': confluence}
+            )
+        else:
+            blocks.append({'date': date, 'epoch': epoch, 'reason': _block_key(data)})
+    return trades, signals, blocks
+
+
+def _split(events, boundaries):
+    """Eventos por segmento; o segmento k começa no epoch boundaries[k-1]."""
+    parts = [[] for _ in range(len(boundaries) + 1)]
+    for e in events:
+        parts[bisect_right(boundaries, e['epoch'])].append(e)
+    return parts
+
+
+def analyze_collapse(log_path, collapse_date=None):
+    """Analisa o log para identificar o problema do colapso.
+
+    Sem `collapse_date`, os pontos de mudança são detectados na sequência de
+    PnL / win-loss dos trades (change_points) e cada segmento encontrado é
+    comparado; o diagnóstico compara os dois últimos.
+    """
+
+    # Uma passada: o prefixo MT5 é separado uma vez e o literal inicial da
+    # mensagem escolhe o parser (log_events.dispatch). Com o índice de dias
+    # (log_index) só são lidos os dias que têm sinal, fechamento ou bloqueio.
+    lines = lines_between(LogSource(log_path), kinds=("signal", "close", "filter_block"))
+    trades, signals, blocks = collect_events(lines)
+
+    detected = collapse_date is None
+    if not detected:
+        boundaries = [day_epoch(collapse_date)]
+        labels = ["ANTES do Colapso", "DEPOIS do Colapso"]
+    else:
+        changes = detect_change_points([t['profit'] for t in trades])
+        spans = segments(changes, len(trades))
+        boundaries = [trades[a]['epoch'] for a, _ in spans[1:]]
+        labels = [f"Segmento {k} ({trades[a]['date']} → {trades[b - 1]['date']})" for k, (a, b) in enumerate(spans, 1)]
+        if not spans:
+            # Sem trades fechados: um único segmento com o log inteiro, para
+            # que sinais e bloqueios ainda sejam reportados.
+            labels = ["Log completo"]
+        if spans[1:]:
+            collapse_date = trades[spans[-1][0]]['date']
+
+    trade_parts = _split(trades, boundaries)
+    signal_parts = _split(signals, boundaries)
+    block_parts = [defaultdict(int) for _ in trade_parts]
+    for part, counts in zip(_split(blocks, boundaries), block_parts):
+        for b in part:
+            counts[b['reason']] += 1
+
     # Calcular estatísticas
     print("=" * 80)
     print("ANÁLISE DO COLAPSO DO EA FGM_TrendRider")
-    print(f"Data do Colapso: {collapse_date}")
+    if not detected:
+        print(f"Data do Colapso: {collapse_date}")
+    elif collapse_date is None:
+        print("Nenhuma mudança de regime detectada")
+    else:
+        print(f"Mudanças de regime detectadas: {', '.join(trades[a]['date'] for a, _ in spans[1:])}")
     print("=" * 80)
-    
+
     # Estatísticas de Trades
     print("\n" + "=" * 40)
     print("📊 ESTATÍSTICAS DE TRADES")
     print("=" * 40)
-    
+
     def calc_stats(trades, label):
         if not trades:
             print(f"\n{label}: Sem trades")
             return
-        
+
         wins = [t for t in trades if t['is_win']]
         losses = [t for t in trades if not t['is_win']]
         total_profit = sum(t['profit'] for t in trades)
         avg_profit = total_profit / len(trades)
         win_rate = len(wins) / len(trades) * 100
-        
+
         avg_win = sum(t['profit'] for t in wins) / len(wins) if wins else 0
         avg_loss = sum(t['profit'] for t in losses) / len(losses) if losses else 0
-        
+
         # Contar SL cheios (perda de ~-18)
         full_sl_losses = [t for t in losses if t['profit'] < -15]
-        
+
         print(f"\n{label}:")
         print(f"  Total de trades: {len(trades)}")
         print(f"  Wins: {len(wins)} | Losses: {len(losses)}")
@@ -148,48 +162,53 @@ def analyze_collapse(log_path, collapse_date="2023.01.26"):
         print(f"  Média por trade: ${avg_profit:.2f}")
         print(f"  Média WIN: ${avg_win:.2f} | Média LOSS: ${avg_loss:.2f}")
         print(f"  ⚠️  Stop Loss CHEIO (-18): {len(full_sl_losses)} trades ({len(full_sl_losses)/len(trades)*100:.1f}%)")
-        
+
         # Listar trades
         print(f"\n  Trades detalhados:")
         for t in trades:
             status = "✅" if t['is_win'] else "❌"
             print(f"    {status} {t['date']}: ${t['profit']:>7.2f} | {t['reason']}")
-    
-    calc_stats(trades_before, "ANTES do Colapso")
-    calc_stats(trades_after, "DEPOIS do Colapso")
-    
+
+    for part, label in zip(trade_parts, labels):
+        calc_stats(part, label)
+
     # Comparação de Sinais
     print("\n" + "=" * 40)
     print("📊 ANÁLISE DE SINAIS")
     print("=" * 40)
-    
-    print(f"\nSinais ANTES do colapso: {len(signals_before)}")
-    print(f"  BUY: {entries_by_direction['before'].get('BUY', 0)} | SELL: {entries_by_direction['before'].get('SELL', 0)}")
-    if signals_before:
-        avg_str_before = sum(abs(s['strength']) for s in signals_before) / len(signals_before)
-        avg_conf_before = sum(s['confluence'] for s in signals_before) / len(signals_before)
-        print(f"  Média Strength: {avg_str_before:.1f} | Média Confluence: {avg_conf_before:.1f}%")
-    
-    print(f"\nSinais DEPOIS do colapso: {len(signals_after)}")
-    print(f"  BUY: {entries_by_direction['after'].get('BUY', 0)} | SELL: {entries_by_direction['after'].get('SELL', 0)}")
-    if signals_after:
-        avg_str_after = sum(abs(s['strength']) for s in signals_after) / len(signals_after)
-        avg_conf_after = sum(s['confluence'] for s in signals_after) / len(signals_after)
-        print(f"  Média Strength: {avg_str_after:.1f} | Média Confluence: {avg_conf_after:.1f}%")
-    
+
+    for part, label in zip(signal_parts, labels):
+        print(f"\nSinais — {label}: {len(part)}")
+        buys = sum(1 for s in part if s['direction'] == 'BUY')
+        sells = sum(1 for s in part if s['direction'] == 'SELL')
+        print(f"  BUY: {buys} | SELL: {sells}")
+        if part:
+            avg_str = sum(abs(s['strength']) for s in part) / len(part)
+            avg_conf = sum(s['confluence'] for s in part) / len(part)
+            print(f"  Média Strength: {avg_str:.1f} | Média Confluence: {avg_conf:.1f}%")
+
     # Análise de Filtros
     print("\n" + "=" * 40)
     print("🚫 ANÁLISE DE FILTROS (BLOQUEIOS)")
     print("=" * 40)
-    
-    print(f"\nBloqueios ANTES do colapso:")
-    for reason, count in sorted(filters_blocked_before.items(), key=lambda x: -x[1]):
-        print(f"  {reason}: {count}")
-    
-    print(f"\nBloqueios DEPOIS do colapso:")
-    for reason, count in sorted(filters_blocked_after.items(), key=lambda x: -x[1]):
-        print(f"  {reason}: {count}")
-    
+
+    for counts, label in zip(block_parts, labels):
+        print(f"\nBloqueios — {label}:")
+        for reason, count in sorted(counts.items(), key=lambda x: -x[1]):
+            print(f"  {reason}: {count}")
+
+    # O diagnóstico compara os dois últimos segmentos.
+    trades_before = trade_parts[-2] if len(trade_parts) > 1 else []
+    trades_after = trade_parts[-1]
+    signals_after = signal_parts[-1]
+    filters_blocked_after = block_parts[-1]
+    entries_by_direction = {
+        'after': {
+            'BUY': sum(1 for s in signals_after if s['direction'] == 'BUY'),
+            'SELL': sum(1 for s in signals_after if s['direction'] == 'SELL'),
+        }
+    }
+
     # DIAGNÓSTICO
     print("\n" + "=" * 80)
     print("🔍 DIAGNÓSTICO DO PROBLEMA")
@@ -259,6 +278,10 @@ def analyze_collapse(log_path, collapse_date="2023.01.26"):
     print("💡 RECOMENDAÇÕES PARA CORREÇÃO")
     print("=" * 80)
     
+    if boundaries:
+        regime_change = "após " + ", ".join(f"{from_epoch(b):%Y.%m.%d}" for b in boundaries)
+    else:
+        regime_change = "em algum ponto do período analisado"
     recommendations = [
         "1. VERIFICAR TRAILING STOP E BREAK EVEN:",
         "   - Os valores de SL cheio indicam que o trailing nunca move o stop",
@@ -274,7 +297,7 @@ def analyze_collapse(log_path, collapse_date="2023.01.26"):
         "   - Exigir Strength mínimo de ±5 para entradas",
         "",
         "4. VERIFICAR REGIME DE MERCADO:",
-        "   - Se mercado mudou de TREND para RANGE após dia 26",
+        f"   - Se mercado mudou de TREND para RANGE {regime_change}",
         "   - O EA pode estar entrando em tendência quando não há",
         "",
         "5. REVISAR LÓGICA DE ENTRADA:",
@@ -291,7 +314,31 @@ def analyze_collapse(log_path, collapse_date="2023.01.26"):
         'problems': problems_found
     }
 
+def follow_collapse(log_path):
+    """Acompanha um log ainda em escrita e avisa cada mudança de regime detectada."""
+    detector = ChangePointDetector()
+    dates = []
+    lines = LogSource(log_path).follow()
+    for rec, (kind, data) in dispatch(lines, {'Posição': _parse_position_closed}):
+        dates.append(rec.ts[:10])
+        for cp in detector.update(data[0]):
+            print(
+                f"⚠️  {rec.ts}: mudança de regime ({cp.method}) a partir do trade #{cp.index + 1} "
+                f"({dates[cp.index]})",
+                flush=True,
+            )
+
+
 if __name__ == "__main__":
-    import sys
-    log_file = sys.argv[1] if len(sys.argv) > 1 else "20251215_utf8.log"
-    analyze_collapse(log_file)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("log", nargs="?", default=str(Path(__file__).resolve().parent / "20251215.log"))
+    ap.add_argument("--date", help="data do colapso (YYYY.MM.DD); sem ela os pontos de mudança são detectados")
+    ap.add_argument("--follow", action="store_true", help="acompanha o log em escrita e avisa as mudanças de regime")
+    args = ap.parse_args()
+    if args.follow:
+        try:
+            follow_collapse(args.log)
+        except KeyboardInterrupt:
+            pass
+    else:
+        analyze_collapse(args.log, args.date)
@@ -6,12 +6,24 @@ Este script realiza análise matemática e financeira detalhada do log do EA
 para identificar por que ele não é lucrativo e quebra a conta.
 """
 
+import argparse
 import re
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from statistics import mean, stdev
-from collections import defaultdict
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from asof_join import asof_indices, take_matched
+from event_cache import load_events
+from event_table import EventTable
+from excursions import Bars, excursions, load_bars
+from log_events import LogEvents
+from log_source import LogSource
+from log_time import parse_ts, to_epoch
+from trade_metrics import group_stats, max_run, trade_metrics
 
 # Configuração
 LOG_PATH = Path(__file__).parent / "20251215.log"
@@ -33,20 +45,12 @@ class Trade:
     sl_distance_pips: float = 0.0
     tp_distance_pips: float = 0.0
 
-def read_log(path: Path) -> str:
-    """Lê o log em UTF-16LE ou UTF-8"""
-    data = path.read_bytes()
-    if data.startswith(b'\xff\xfe'):
-        return data.decode('utf-16-le')
-    try:
-        return data.decode('utf-8')
-    except:
-        return data.decode('latin-1')
+def read_log(path: Path) -> Iterator[str]:
+    """Lê o log (UTF-16LE ou UTF-8) linha a linha, com memória constante"""
+    return LogSource(path).lines()
 
-def parse_trades(lines: list[str]) -> list[Trade]:
+def parse_trades(lines: Iterable[str]) -> list[Trade]:
     """Extrai trades do log"""
-    trades = []
-    
     # Padrões de regex
     open_pattern = re.compile(
         r'(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*\[INFO\]\s+TRADE:\s+(BUY|SELL)\s+@\s+([0-9.]+)\s+\|\s+Vol:\s+([0-9.]+)\s+\|\s+SL:\s+([0-9.]+)\s+\|\s+TP:\s+([0-9.]+)'
@@ -69,7 +73,7 @@ def parse_trades(lines: list[str]) -> list[Trade]:
         m = open_pattern.search(line)
         if m:
             opens.append({
-                'time': datetime.strptime(m.group(1), '%Y.%m.%d %H:%M:%S'),
+                'time': parse_ts(m.group(1)),
                 'direction': m.group(2),
                 'price': float(m.group(3)),
                 'volume': float(m.group(4)),
@@ -82,7 +86,7 @@ def parse_trades(lines: list[str]) -> list[Trade]:
         m = close_pattern.search(line)
         if m:
             closes.append({
-                'time': datetime.strptime(m.group(1), '%Y.%m.%d %H:%M:%S'),
+                'time': parse_ts(m.group(1)),
                 'outcome': m.group(2),
                 'profit': float(m.group(3)),
                 'reason': m.group(4).strip(),
@@ -93,20 +97,42 @@ def parse_trades(lines: list[str]) -> list[Trade]:
         m = signal_pattern.search(line)
         if m:
             signals.append({
-                'time': datetime.strptime(m.group(1), '%Y.%m.%d %H:%M:%S'),
+                'time': parse_ts(m.group(1)),
                 'strength': int(m.group(2)),
                 'confluence': float(m.group(3)),
             })
     
+    return pair_trades(opens, closes, signals)
+
+def trades_from_events(ev: LogEvents) -> list[Trade]:
+    """Mesmo resultado de parse_trades(), a partir dos eventos (em cache) do log"""
+    opens = [
+        {'time': o.ts, 'direction': o.side, 'price': o.price, 'volume': o.volume, 'sl': o.sl, 'tp': o.tp}
+        for o in ev.opens
+    ]
+    closes = [
+        {'time': c.ts, 'outcome': c.outcome, 'profit': c.profit, 'reason': c.reason}
+        for c in ev.closes
+    ]
+    signals = [
+        {'time': s.ts, 'strength': s.strength, 'confluence': s.confluence}
+        for s in ev.signals
+    ]
+    return pair_trades(opens, closes, signals)
+
+def pair_trades(opens: list[dict], closes: list[dict], signals: list[dict]) -> list[Trade]:
+    """Pareia aberturas e fechamentos (1 posição por vez) com o sinal anterior"""
+    trades = []
+    
+    # Sinal mais recente até cada abertura (as-of join, O(log n) por trade)
+    n = min(len(opens), len(closes))
+    nearest = asof_indices(
+        [to_epoch(o['time']) for o in opens[:n]],
+        [to_epoch(s['time']) for s in signals],
+    )
+    
     # Pair opens with closes
-    for i, (o, c) in enumerate(zip(opens, closes)):
-        # Find nearest signal before open
-        signal = None
-        for s in reversed(signals):
-            if s['time'] <= o['time']:
-                signal = s
-                break
-        
+    for o, c, signal in zip(opens, closes, take_matched(signals, nearest)):
         # Calculate SL/TP distances in pips (for USDJPY, 1 pip = 0.01)
         point = 0.001  # USDJPY point
         sl_dist = abs(o['price'] - o['sl']) / point
@@ -135,68 +161,16 @@ def analyze_trades(trades: list[Trade], initial_deposit: float = 100.0) -> dict:
     if not trades:
         return {}
     
-    profits = [t.profit for t in trades]
-    wins = [p for p in profits if p > 0]
-    losses = [p for p in profits if p < 0]
-    
-    # Métricas básicas
-    total_trades = len(trades)
-    win_count = len(wins)
-    loss_count = len(losses)
-    win_rate = (win_count / total_trades) * 100 if total_trades else 0
-    
-    # Lucro/Perda
-    gross_profit = sum(wins)
-    gross_loss = abs(sum(losses))
-    net_profit = sum(profits)
-    
-    # Profit Factor
-    profit_factor = gross_profit / gross_loss if gross_loss > 0 else float('inf')
-    
-    # Expectancy (Esperança Matemática)
-    expectancy = mean(profits) if profits else 0
+    profits = np.array([t.profit for t in trades])
+    m = trade_metrics(profits, initial_deposit)
     
     # Risk/Reward
-    avg_win = mean(wins) if wins else 0
-    avg_loss = abs(mean(losses)) if losses else 0
-    risk_reward = avg_win / avg_loss if avg_loss > 0 else float('inf')
-    
-    # Drawdown
-    balance = initial_deposit
-    peak = initial_deposit
-    max_dd = 0
-    max_dd_pct = 0
-    
-    for p in profits:
-        balance += p
-        if balance > peak:
-            peak = balance
-        dd = peak - balance
-        dd_pct = (dd / peak) * 100
-        if dd > max_dd:
-            max_dd = dd
-            max_dd_pct = dd_pct
-    
-    # Sequências
-    max_consec_losses = 0
-    max_consec_wins = 0
-    current_losses = 0
-    current_wins = 0
-    
-    for p in profits:
-        if p < 0:
-            current_losses += 1
-            current_wins = 0
-            max_consec_losses = max(max_consec_losses, current_losses)
-        else:
-            current_wins += 1
-            current_losses = 0
-            max_consec_wins = max(max_consec_wins, current_wins)
+    avg_loss = abs(m.avg_loss)
+    risk_reward = m.avg_win / avg_loss if avg_loss > 0 else float('inf')
     
     # Razões de fechamento
-    close_reasons = defaultdict(int)
-    for t in trades:
-        close_reasons[t.close_reason] += 1
+    by_reason = group_stats([t.close_reason for t in trades], profits)
+    close_reasons = dict(zip(by_reason.keys.tolist(), by_reason.trades.tolist()))
     
     # Análise de SL/TP
     sl_distances = [t.sl_distance_pips for t in trades]
@@ -207,25 +181,27 @@ def analyze_trades(trades: list[Trade], initial_deposit: float = 100.0) -> dict:
     loss_durations = [(t.close_time - t.open_time).total_seconds() / 3600 for t in trades if t.profit < 0]
     
     return {
-        'total_trades': total_trades,
-        'win_count': win_count,
-        'loss_count': loss_count,
-        'win_rate': win_rate,
-        'gross_profit': gross_profit,
-        'gross_loss': gross_loss,
-        'net_profit': net_profit,
-        'profit_factor': profit_factor,
-        'expectancy': expectancy,
-        'avg_win': avg_win,
+        'total_trades': m.trades,
+        'win_count': m.wins,
+        'loss_count': m.losses,
+        'win_rate': m.win_rate_pct,
+        'gross_profit': m.gross_profit,
+        'gross_loss': m.gross_loss,
+        'net_profit': m.net,
+        'profit_factor': m.profit_factor,
+        'expectancy': m.expectancy,
+        'avg_win': m.avg_win,
         'avg_loss': avg_loss,
         'risk_reward': risk_reward,
-        'max_drawdown': max_dd,
-        'max_drawdown_pct': max_dd_pct,
-        'final_balance': initial_deposit + net_profit,
-        'return_pct': (net_profit / initial_deposit) * 100,
-        'max_consec_losses': max_consec_losses,
-        'max_consec_wins': max_consec_wins,
-        'close_reasons': dict(close_reasons),
+        'max_drawdown': m.max_dd_abs,
+        # % do DD no ponto do maior DD absoluto
+        'max_drawdown_pct': m.dd_pct_at_max_abs,
+        'final_balance': m.final_balance,
+        'return_pct': (m.net / initial_deposit) * 100,
+        'max_consec_losses': m.max_consec_losses,
+        # Sequência de ganhos conta trades com lucro >= 0
+        'max_consec_wins': max_run(profits >= 0),
+        'close_reasons': close_reasons,
         'avg_sl_distance': mean(sl_distances) if sl_distances else 0,
         'avg_tp_distance': mean(tp_distances) if tp_distances else 0,
         'avg_win_duration_hrs': mean(win_durations) if win_durations else 0,
@@ -293,8 +269,24 @@ def identify_problems(stats: dict) -> list[dict]:
     
     return problems
 
-def calculate_optimal_params(stats: dict) -> dict:
-    """Calcula parâmetros ótimos baseados na análise"""
+def trade_excursions(trades: list[Trade], bars: Bars) -> EventTable:
+    """MAE/MFE de cada trade nas barras exportadas do MT5 (ver excursions)"""
+    return excursions(
+        bars,
+        [to_epoch(t.open_time) for t in trades],
+        [to_epoch(t.close_time) for t in trades],
+        [t.direction for t in trades],
+        [t.entry_price for t in trades],
+        [t.volume for t in trades],
+        symbol="USDJPY",
+    )
+
+def calculate_optimal_params(stats: dict, exc: EventTable | None = None) -> dict:
+    """Calcula parâmetros ótimos baseados na análise
+
+    Com `exc` (MAE/MFE por trade, de trade_excursions) as distâncias de TP,
+    SL e trailing vêm do caminho real dos trades em vez da média WIN/LOSS.
+    """
     
     # Para ter expectância positiva:
     # EV = (WinRate * AvgWin) - (LossRate * AvgLoss) > 0
@@ -332,6 +324,27 @@ def calculate_optimal_params(stats: dict) -> dict:
     
     # Para win = $4.65 (PF=1.5):
     profitable_tp_points = min_win_profitable / dollar_per_point if dollar_per_point > 0 else 450
+    suggested_sl_points = 300  # Manter SL atual
+    
+    excursion_stats = {}
+    if exc is not None and np.isfinite(exc['mfe_points']).any():
+        # TP: excursão favorável que metade dos trades atingiu.
+        # SL: excursão adversa que 90% dos trades vencedores não passaram.
+        mfe = exc['mfe_points']
+        mae = exc['mae_points']
+        winners = np.array([t.profit > 0 for t in stats.get('trades', [])], dtype=bool)
+        mae_winners = mae[winners] if len(winners) == len(mae) else mae
+        mae_winners = mae_winners[np.isfinite(mae_winners)]
+        excursion_stats = {
+            'mfe_p50_points': float(np.nanmedian(mfe)),
+            'mfe_p75_points': float(np.nanpercentile(mfe, 75)),
+            'mae_p50_points': float(np.nanmedian(mae)),
+            'mae_p90_winners_points': float(np.percentile(mae_winners, 90)) if len(mae_winners) else float('nan'),
+            'trades_with_bars': int(np.count_nonzero(np.isfinite(mfe))),
+        }
+        profitable_tp_points = excursion_stats['mfe_p50_points']
+        if len(mae_winners):
+            suggested_sl_points = round(excursion_stats['mae_p90_winners_points'])
     
     return {
         'current_avg_win': stats['avg_win'],
@@ -343,7 +356,8 @@ def calculate_optimal_params(stats: dict) -> dict:
         'suggested_trailing_trigger': int(profitable_tp_points * 0.6),  # 60% do TP
         'suggested_trailing_distance': int(profitable_tp_points * 0.4),  # 40% do TP
         'suggested_tp_points': int(profitable_tp_points),
-        'suggested_sl_points': 300,  # Manter SL atual
+        'suggested_sl_points': suggested_sl_points,
+        **excursion_stats,
         'reasoning': f"""
 Para breakeven com WinRate de {stats['win_rate']:.1f}%:
 - Avg Win mínimo: ${min_win_breakeven:.2f}
@@ -439,10 +453,18 @@ def generate_report(stats: dict, problems: list, optimal: dict) -> str:
     
     report.append("\n### Parâmetros Sugeridos")
     report.append(f"- **TP Target:** {optimal['suggested_tp_points']} pontos (lucro alvo: ${optimal['min_win_profitable']:.2f})")
-    report.append(f"- **SL:** {optimal['suggested_sl_points']} pontos (manter)")
+    if 'mfe_p50_points' in optimal:
+        report.append(f"- **SL:** {optimal['suggested_sl_points']} pontos (MAE P90 dos wins)")
+    else:
+        report.append(f"- **SL:** {optimal['suggested_sl_points']} pontos (manter)")
     report.append(f"- **Trailing Trigger:** {optimal['suggested_trailing_trigger']} pontos")
     report.append(f"- **Trailing Distance:** {optimal['suggested_trailing_distance']} pontos")
     
+    if 'mfe_p50_points' in optimal:
+        report.append(f"\n### Excursões (MAE/MFE) — {optimal['trades_with_bars']} trades com barras")
+        report.append(f"- MFE mediana: {optimal['mfe_p50_points']:.0f} pontos | P75: {optimal['mfe_p75_points']:.0f} pontos")
+        report.append(f"- MAE mediana: {optimal['mae_p50_points']:.0f} pontos | P90 dos wins: {optimal['mae_p90_winners_points']:.0f} pontos")
+    
     report.append("\n### Opções de Correção")
     report.append("1. **Opção A - Aumentar Trailing:** Deixar lucro correr mais antes de proteger")
     report.append("2. **Opção B - TP Fixo:** Desativar trailing, usar TP fixo mais agressivo")
@@ -464,19 +486,22 @@ def main():
     print("ANÁLISE COMPLETA DO EA FGM TrendRider")
     print("=" * 60)
     
-    # Ler log
-    if not LOG_PATH.exists():
-        print(f"❌ Erro: Log não encontrado em {LOG_PATH}")
+    # Ler log (e, opcional, as barras exportadas do MT5 para MAE/MFE)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("log", nargs="?", default=str(LOG_PATH))
+    ap.add_argument("--bars", help="CSV de barras exportado do MT5 (MAE/MFE de cada trade)")
+    args = ap.parse_args()
+    log_path = Path(args.log)
+    if not log_path.exists():
+        print(f"❌ Erro: Log não encontrado em {log_path}")
         return 1
     
-    print(f"\n📂 Lendo log: {LOG_PATH.name}")
-    content = read_log(LOG_PATH)
-    lines = content.splitlines()
-    print(f"   {len(lines):,} linhas no log")
+    print(f"\n📂 Lendo log: {log_path.name}")
+    events = load_events(log_path)  # cache em .event_cache/, re-parse só se o log mudou
     
     # Parsear trades
     print("\n🔍 Analisando trades...")
-    trades = parse_trades(lines)
+    trades = trades_from_events(events)
     print(f"   {len(trades)} trades encontrados")
     
     if not trades:
@@ -494,14 +519,17 @@ def main():
     
     # Calcular parâmetros ótimos
     print("\n🧮 Calculando parâmetros ótimos...")
-    optimal = calculate_optimal_params(stats)
+    exc = None
+    if args.bars:
+        exc = trade_excursions(trades, load_bars(args.bars))
+    optimal = calculate_optimal_params(stats, exc)
     
     # Gerar relatório
     print("\n📝 Gerando relatório...")
     report = generate_report(stats, problems, optimal)
     
     # Salvar relatório
-    report_path = LOG_PATH.parent / "problema_identificado_relatorio.md"
+    report_path = log_path.parent / "problema_identificado_relatorio.md"
     report_path.write_text(report, encoding='utf-8')
     print(f"   Relatório salvo em: {report_path.name}")
     
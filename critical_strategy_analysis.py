@@ -5,14 +5,21 @@ ANÁLISE CRÍTICA DA ESTRATÉGIA - Não apenas parâmetros!
 Este script investiga se a estratégia FGM TrendRider é fundamentalmente viável.
 """
 
-import re
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from collections import defaultdict
 from statistics import mean, stdev, median
+from typing import Iterable, Iterator
 import sys
 
+import numpy as np
+
+from event_cache import load_events
+from log_events import LogEvents
+from log_source import LogSource
+from trade_lifecycle import TradeLifecycle, iter_lifecycles, lifecycles_from_events
+from trade_metrics import group_stats, trade_metrics
+
 @dataclass
 class TradeRecord:
     time: datetime
@@ -33,87 +40,52 @@ class TradeRecord:
     rsi_ma: float = 0.0
     obv: int = 0
 
-def read_log(path: Path) -> str:
-    data = path.read_bytes()
-    if data.startswith(b'\xff\xfe'):
-        return data.decode('utf-16-le')
-    try:
-        return data.decode('utf-8')
-    except:
-        return data.decode('latin-1')
+def read_log(path: Path) -> Iterator[str]:
+    """Lê o log linha a linha (streaming, memória constante)"""
+    return LogSource(path).lines()
 
-def parse_all_trades(content: str) -> list[TradeRecord]:
-    """Parse TODOS os trades (WIN e LOSS) com contexto completo"""
-    lines = content.splitlines()
-    trades = []
-    
-    # Pattern para BAD ENTRY (losses com contexto completo)
-    bad_pattern = re.compile(
-        r'(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*BAD ENTRY.*Profit=(-?[0-9.]+).*Close=([^|]+)\|.*Dir=(\w+).*Regime=([^|]+)\|.*F=(\d+).*Conf=([0-9.]+)%.*SLpts=([0-9.]+).*Risk=([0-9.]+)%.*Spread=([0-9.]+).*Slope=(-?[0-9.]+).*Vol=(\d+)/.*Phase=(-?\d+).*RSI=([0-9.]+)/MA([0-9.]+).*OBV=(\d+)'
-    )
-    
-    # Pattern para TRADE CLOSED (ambos WIN e LOSS)
-    close_pattern = re.compile(
-        r'(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*TRADE CLOSED:\s+(WIN|LOSS).*Profit:\s+(-?[0-9.]+).*Razão:\s+(.+)'
+def parse_all_trades(lines: Iterable[str]) -> list[TradeRecord]:
+    """Parse TODOS os trades (WIN e LOSS) com contexto completo.
+
+    Cada trade é montado por trade_lifecycle numa única passada: o BAD ENTRY
+    vale para o TRADE CLOSED do mesmo tick (logado logo antes dele), não para
+    qualquer fechamento com o mesmo lucro.
+    """
+    return [_trade_record(lc) for lc in iter_lifecycles(lines)]
+
+def _trade_record(lc: TradeLifecycle) -> TradeRecord:
+    b = lc.bad_entry
+    if b is None:
+        return TradeRecord(
+            time=lc.close_ts,
+            direction=lc.side or 'UNKNOWN',
+            profit=lc.profit,
+            reason=lc.reason,
+            outcome=lc.outcome,
+        )
+    return TradeRecord(
+        time=lc.close_ts,
+        direction=b.direction,
+        profit=lc.profit,
+        reason=lc.reason,
+        outcome=lc.outcome,
+        regime=b.regime,
+        strength=b.strength,
+        confluence=b.confluence,
+        sl_pts=b.sl_pts,
+        risk_pct=b.risk_pct,
+        spread=b.spread,
+        slope=b.slope,
+        volume=b.volume,
+        phase=b.phase,
+        rsi=b.rsi,
+        rsi_ma=b.rsi_ma,
+        obv=b.obv
     )
-    
-    bad_entries = {}  # Armazenar bad entries por profit para match
-    
-    for line in lines:
-        # Primeiro, armazena BAD ENTRY com contexto
-        m = bad_pattern.search(line)
-        if m:
-            profit = float(m.group(2))
-            bad_entries[profit] = {
-                'time': datetime.strptime(m.group(1), '%Y.%m.%d %H:%M:%S'),
-                'direction': m.group(4),
-                'regime': m.group(5).strip(),
-                'strength': int(m.group(6)),
-                'confluence': float(m.group(7)),
-                'sl_pts': float(m.group(8)),
-                'risk_pct': float(m.group(9)),
-                'spread': float(m.group(10)),
-                'slope': float(m.group(11)),
-                'volume': int(m.group(12)),
-                'phase': int(m.group(13)),
-                'rsi': float(m.group(14)),
-                'rsi_ma': float(m.group(15)),
-                'obv': int(m.group(16))
-            }
-            continue
-        
-        # Depois, captura TODOS os fechamentos
-        m = close_pattern.search(line)
-        if m:
-            time = datetime.strptime(m.group(1), '%Y.%m.%d %H:%M:%S')
-            outcome = m.group(2)
-            profit = float(m.group(3))
-            reason = m.group(4).strip()
-            
-            # Tentar encontrar contexto do BAD ENTRY
-            context = bad_entries.get(profit, {})
-            
-            trades.append(TradeRecord(
-                time=time,
-                direction=context.get('direction', 'UNKNOWN'),
-                profit=profit,
-                reason=reason,
-                outcome=outcome,
-                regime=context.get('regime', ''),
-                strength=context.get('strength', 0),
-                confluence=context.get('confluence', 0.0),
-                sl_pts=context.get('sl_pts', 0.0),
-                risk_pct=context.get('risk_pct', 0.0),
-                spread=context.get('spread', 0.0),
-                slope=context.get('slope', 0.0),
-                volume=context.get('volume', 0),
-                phase=context.get('phase', 0),
-                rsi=context.get('rsi', 0.0),
-                rsi_ma=context.get('rsi_ma', 0.0),
-                obv=context.get('obv', 0)
-            ))
-    
-    return trades
+
+def trades_from_events(ev: LogEvents) -> list[TradeRecord]:
+    """Mesmo resultado de parse_all_trades(), a partir dos eventos (em cache) do log"""
+    return [_trade_record(lc) for lc in lifecycles_from_events(ev)]
 
 def analyze_strategy_fundamentals(trades: list[TradeRecord]) -> dict:
     """Análise fundamental da viabilidade da estratégia"""
@@ -127,18 +99,22 @@ def analyze_strategy_fundamentals(trades: list[TradeRecord]) -> dict:
     win_profits = [t.profit for t in wins]
     loss_profits = [abs(t.profit) for t in losses]
     
-    # Métricas básicas
-    total = len(trades)
-    win_count = len(wins)
-    loss_count = len(losses)
-    win_rate = (win_count / total) * 100 if total > 0 else 0
+    # Vitória/derrota pelo rótulo do EA; o que não é WIN conta como derrota nos grupos
+    profits = np.array([t.profit for t in trades])
+    is_win = np.array([t.outcome == 'WIN' for t in trades])
+    m = trade_metrics(profits, win=is_win, loss=np.array([t.outcome == 'LOSS' for t in trades]))
     
-    avg_win = mean(win_profits) if win_profits else 0
-    avg_loss = mean(loss_profits) if loss_profits else 0
+    total = m.trades
+    win_count = m.wins
+    loss_count = m.losses
+    win_rate = m.win_rate_pct
+    
+    avg_win = m.avg_win
+    avg_loss = abs(m.avg_loss)
     
     # Profit Factor
-    gross_profit = sum(win_profits)
-    gross_loss = sum(loss_profits)
+    gross_profit = m.gross_profit
+    gross_loss = m.gross_loss
     pf = gross_profit / gross_loss if gross_loss > 0 else 0
     
     # Expectancy
@@ -152,34 +128,17 @@ def analyze_strategy_fundamentals(trades: list[TradeRecord]) -> dict:
     avg_risk = mean(risks) if risks else 0
     max_risk = max(risks) if risks else 0
     
-    # Análise por regime
-    by_regime = defaultdict(lambda: {'wins': 0, 'losses': 0, 'profit': 0})
-    for t in trades:
-        regime = t.regime or 'UNKNOWN'
-        if t.outcome == 'WIN':
-            by_regime[regime]['wins'] += 1
-        else:
-            by_regime[regime]['losses'] += 1
-        by_regime[regime]['profit'] += t.profit
-    
-    # Análise por direção
-    by_direction = defaultdict(lambda: {'wins': 0, 'losses': 0, 'profit': 0})
-    for t in trades:
-        direction = t.direction or 'UNKNOWN'
-        if t.outcome == 'WIN':
-            by_direction[direction]['wins'] += 1
-        else:
-            by_direction[direction]['losses'] += 1
-        by_direction[direction]['profit'] += t.profit
-    
-    # Análise por razão de fechamento
-    by_reason = defaultdict(lambda: {'wins': 0, 'losses': 0, 'profit': 0})
-    for t in trades:
-        if t.outcome == 'WIN':
-            by_reason[t.reason]['wins'] += 1
-        else:
-            by_reason[t.reason]['losses'] += 1
-        by_reason[t.reason]['profit'] += t.profit
+    # Análise por regime, direção e razão de fechamento
+    def breakdown(keys: list[str]) -> dict:
+        g = group_stats(keys, profits, win=is_win, loss=~is_win)
+        return {
+            k: {'wins': w, 'losses': l, 'profit': p}
+            for k, w, l, p in zip(g.keys.tolist(), g.wins.tolist(), g.losses.tolist(), g.pnl.tolist())
+        }
+    
+    by_regime = breakdown([t.regime or 'UNKNOWN' for t in trades])
+    by_direction = breakdown([t.direction or 'UNKNOWN' for t in trades])
+    by_reason = breakdown([t.reason for t in trades])
     
     # OBV sempre zero?
     obv_zero = sum(1 for t in trades if t.obv == 0)
@@ -200,9 +159,9 @@ def analyze_strategy_fundamentals(trades: list[TradeRecord]) -> dict:
         'rr_ratio': rr,
         'avg_risk_pct': avg_risk,
         'max_risk_pct': max_risk,
-        'by_regime': dict(by_regime),
-        'by_direction': dict(by_direction),
-        'by_reason': dict(by_reason),
+        'by_regime': by_regime,
+        'by_direction': by_direction,
+        'by_reason': by_reason,
         'obv_zero_pct': obv_zero_pct,
         'win_profits': win_profits,
         'loss_profits': loss_profits,
@@ -444,7 +403,7 @@ def generate_critical_report(stats: dict, issues: list, required: dict, trades:
     return "\n".join(lines)
 
 def main():
-    log_path = Path(__file__).parent / "20251216.log"
+    log_path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent / "20251216.log"
     
     if not log_path.exists():
         print(f"❌ Log não encontrado: {log_path}")
@@ -455,10 +414,10 @@ def main():
     print("=" * 70)
     
     print(f"\n📂 Lendo: {log_path.name}")
-    content = read_log(log_path)
+    events = load_events(log_path)  # cache em .event_cache/, re-parse só se o log mudou
     
     print("\n🔍 Analisando trades...")
-    trades = parse_all_trades(content)
+    trades = trades_from_events(events)
     print(f"   {len(trades)} trades encontrados")
     
     if not trades:
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Vectorized FIFO matching of tester deals into closed lots, with money profit.
+
+The tester logs every execution as a deal line:
+
+    deal #2 buy 0.01 USDJPY at 130.885 done (based on order #2)
+
+`match_deals()` nets these per symbol, like a netting account does. A deal
+against the open position closes it first-in first-out. Any volume left
+over opens a position on the deal's side, so scale-ins, partial closes and
+reversals all come out right. Each result row is one *lot*: a piece of
+volume opened by one deal and closed by another.
+
+Nothing loops over deals in Python. Volumes become integer units
+(VOLUME_SCALE per lot), so sums are exact. Per symbol, the cumulative
+signed volume splits each deal into a closing part and an opening part.
+Per position side, the opening parts and the closing parts then lie on
+one cumulative-volume axis. The lots are the overlaps of the two interval
+sets, found with `numpy.searchsorted` on their breakpoints. That is
+O(n log n) for the whole log.
+
+Profit is converted to the account currency with `SymbolSpec`:
+
+- With a `tick_value` (account currency per tick per lot, as MT5 reports
+  it), profit = price_diff / tick_size * tick_value * volume.
+- Otherwise profit = price_diff * volume * contract_size, taken from the
+  symbol name. It is already in account currency when the account currency
+  is the quote currency (EURUSD on a USD account). It is divided by the
+  exit price when the account currency is the base (USDJPY on a USD
+  account), as MT5 converts at the closing rate.
+- Any other pair would need a cross rate and gets NaN.
+
+Swaps and commissions are not in the deal lines and are not included.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Mapping
+
+import numpy as np
+
+from event_table import Categorical, EventTable, TableBuilder
+from log_events import split_line
+from log_time import parse_ts
+
+
+# Integer volume units per lot (volume steps are 0.01 or coarser in practice).
+VOLUME_SCALE = 10**8
+
+DEAL_LINE_RE = re.compile(r"deal #(?P<deal>\d+) (?P<side>buy|sell) (?P<volume>[\d.]+) (?P<symbol>\S+) at (?P<price>[\d.]+)")
+
+
+@dataclass(frozen=True)
+class Deal:
+    ts: datetime
+    deal: int
+    side: str  # "buy" or "sell"
+    volume: float
+    symbol: str
+    price: float
+
+
+@dataclass(frozen=True)
+class SymbolSpec:
+    contract_size: float = 100_000.0
+    tick_size: float = 0.001
+    tick_value: float | None = None  # account currency per tick per lot; None = from the prices
+
+
+@dataclass(frozen=True)
+class MatchedLot:
+    symbol: str
+    side: str  # side of the position: "buy" or "sell"
+    volume: float
+    entry_deal: int
+    exit_deal: int
+    entry_ts: datetime
+    exit_ts: datetime
+    entry_price: float
+    exit_price: float
+    price_diff: float  # in the position's favour
+    profit: float  # account currency, NaN if it cannot be converted
+
+
+def read_deals(lines: Iterable[str]) -> EventTable:
+    """Deal table of the "deal #" lines among `lines`, in log order."""
+    b = TableBuilder(Deal)
+    for line in lines:
+        rec = split_line(line)
+        if rec is None:
+            continue
+        m = DEAL_LINE_RE.match(rec.msg)
+        if m:
+            b.append(parse_ts(rec.ts), int(m["deal"]), m["side"], float(m["volume"]), m["symbol"], float(m["price"]))
+    return b.build()
+
+
+def _fifo_pieces(opened: np.ndarray, closed: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """FIFO overlap of per-deal opened and closed units of one position side.
+
+    Returns (open row, close row, units) for each matched piece, in order of
+    closing.
+    """
+    O = np.cumsum(opened)
+    C = np.cumsum(closed)
+    total = C[-1] if len(C) else 0
+    if not total:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty, np.empty(0, dtype=np.int64)
+    # Every boundary between two opens or two closes starts a new piece.
+    ends = np.union1d(O[opened > 0], C[closed > 0])
+    ends = ends[ends <= total]
+    starts = np.concatenate(([0], ends[:-1]))
+    # The row whose interval [cum - amount, cum) holds `start` (zero amounts skipped).
+    return np.searchsorted(O, starts, side="right"), np.searchsorted(C, starts, side="right"), ends - starts
+
+
+def conversion_factor(symbol: str, spec: SymbolSpec, account_currency: str, price: np.ndarray) -> np.ndarray:
+    """Account currency per unit of price difference per lot, converted at `price`.
+
+    Profits are converted at the exit price (when the account currency is the
+    symbol's base currency); NaN when neither side is the account currency
+    and the spec has no tick value.
+    """
+    price = np.asarray(price, dtype=np.float64)
+    account_currency = account_currency.upper()
+    if spec.tick_value is not None:
+        return np.full(len(price), spec.tick_value / spec.tick_size)
+    base, quote = symbol[:3].upper(), symbol[3:6].upper()
+    if quote == account_currency:
+        return np.full(len(price), spec.contract_size)
+    if base == account_currency:
+        return spec.contract_size / price
+    return np.full(len(price), np.nan)
+
+
+def match_deals(
+    deals: EventTable,
+    specs: Mapping[str, SymbolSpec] | None = None,
+    *,
+    default_spec: SymbolSpec = SymbolSpec(),
+    account_currency: str = "USD",
+) -> EventTable:
+    """FIFO-net `deals` (a Deal table, in execution order) into MatchedLot rows.
+
+    `specs` maps a symbol to its SymbolSpec; other symbols use
+    `default_spec`. Lots come out in the order they were closed (by closing
+    deal, then by opening deal). Volume still open at the end is not
+    reported.
+    """
+    specs = specs or {}
+    account_currency = account_currency.upper()
+    units = np.rint(deals["volume"] * VOLUME_SCALE).astype(np.int64)
+    sign = np.where(deals.categorical("side").values() == "buy", 1, -1)
+    signed = sign * units
+    symbols = deals.categorical("symbol")
+
+    entry_rows, exit_rows, lot_units, lot_side, lot_symbol = [], [], [], [], []
+    for code, symbol in enumerate(symbols.categories):
+        rows = np.flatnonzero(symbols.codes == code)
+        if not len(rows):
+            continue
+        s = signed[rows]
+        before = np.cumsum(s) - s  # net position before each deal
+        reduces = (before != 0) & (np.sign(s) != np.sign(before))
+        closing = np.where(reduces, np.minimum(np.abs(s), np.abs(before)), 0)
+        opening = np.abs(s) - closing
+        for side in (1, -1):
+            o, c, u = _fifo_pieces(np.where(np.sign(s) == side, opening, 0), np.where(np.sign(before) == side, closing, 0))
+            entry_rows.append(rows[o])
+            exit_rows.append(rows[c])
+            lot_units.append(u)
+            lot_side.append(np.full(len(u), side, dtype=np.int8))
+            lot_symbol.append(np.full(len(u), code, dtype=np.int32))
+
+    entry = np.concatenate(entry_rows) if entry_rows else np.empty(0, dtype=np.intp)
+    exit_ = np.concatenate(exit_rows) if exit_rows else np.empty(0, dtype=np.intp)
+    order = np.lexsort((entry, exit_))
+    entry, exit_ = entry[order], exit_[order]
+    volume = (np.concatenate(lot_units)[order] / VOLUME_SCALE) if lot_units else np.empty(0)
+    side = np.concatenate(lot_side)[order] if lot_side else np.empty(0, dtype=np.int8)
+    codes = np.concatenate(lot_symbol)[order] if lot_symbol else np.empty(0, dtype=np.int32)
+
+    price = deals["price"]
+    entry_price, exit_price = price[entry], price[exit_]
+    price_diff = (exit_price - entry_price) * side
+    profit = np.empty(len(entry))
+    for code, symbol in enumerate(symbols.categories):
+        sel = codes == code
+        if sel.any():
+            spec = specs.get(symbol, default_spec)
+            profit[sel] = price_diff[sel] * volume[sel] * conversion_factor(symbol, spec, account_currency, exit_price[sel])
+
+    ts, deal_ids = deals["ts"], deals["deal"]
+    return EventTable.from_columns(
+        MatchedLot,
+        symbol=Categorical(codes, symbols.categories),
+        side=Categorical((side < 0).astype(np.int32), ["buy", "sell"]),
+        volume=volume,
+        entry_deal=deal_ids[entry],
+        exit_deal=deal_ids[exit_],
+        entry_ts=ts[entry],
+        exit_ts=ts[exit_],
+        entry_price=entry_price,
+        exit_price=exit_price,
+        price_diff=price_diff,
+        profit=profit,
+    )
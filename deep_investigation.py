@@ -15,7 +15,18 @@ from datetime import datetime
 from pathlib import Path
 from collections import defaultdict
 from statistics import mean, stdev
+from typing import Iterable, Iterator
 import json
+import sys
+
+import numpy as np
+
+from asof_join import asof_indices
+from event_cache import load_event_tables
+from event_table import EventTable, TableBuilder
+from log_source import LogSource
+from log_time import parse_ts
+from perf_cube import build_cube
 
 LOG_PATH = Path(__file__).parent / "20251216.log"
 
@@ -82,135 +93,184 @@ class BadEntry:
     rsi_ma: float
     obv: int
 
-def read_log(path: Path) -> str:
-    data = path.read_bytes()
-    if data.startswith(b'\xff\xfe'):
-        return data.decode('utf-16-le')
-    try:
-        return data.decode('utf-8')
-    except:
-        return data.decode('latin-1')
+def read_log(path: Path) -> Iterator[str]:
+    """Lê o log linha a linha (streaming, memória constante)"""
+    return LogSource(path).lines()
 
-def parse_signals(lines: list[str]) -> list[Signal]:
-    """Extrai todos os sinais detectados"""
-    pattern = re.compile(
-        r'(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*Sinal detectado!.*Bar=(\d+),\s+Entry=(-?\d+),\s+Strength=(-?\d+),\s+Confluence=([0-9.]+)%'
+SIGNAL_PATTERN = re.compile(
+    r'(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*Sinal detectado!.*Bar=(\d+),\s+Entry=(-?\d+),\s+Strength=(-?\d+),\s+Confluence=([0-9.]+)%'
+)
+FILTER_BLOCK_PATTERN = re.compile(
+    r'(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*FILTRO BLOQUEOU:\s+(.+)'
+)
+OBV_DEBUG_PATTERN = re.compile(
+    r'(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*\[OBV MACD DEBUG\].*Bar1:\s+Hist=([0-9.-]+).*Bar2:\s+Hist=([0-9.-]+).*Color=(\d+).*Threshold=([0-9.-]+)'
+)
+BAD_ENTRY_PATTERN = re.compile(
+    r'(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*BAD ENTRY.*Profit=(-?[0-9.]+).*Close=([^|]+)\|.*Dir=(\w+).*Regime=([^|]+)\|.*F=(\d+).*Conf=([0-9.]+)%.*SLpts=([0-9.]+).*Risk=([0-9.]+)%.*Spread=([0-9.]+).*Slope=(-?[0-9.]+).*Vol=(\d+)/.*Phase=(-?\d+).*EMA200=(\w+).*RSI=([0-9.]+)/MA([0-9.]+).*OBV=(\d+)'
+)
+OPEN_PATTERN = re.compile(
+    r'(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*\[INFO\]\s+TRADE:\s+(BUY|SELL)\s+@\s+([0-9.]+).*Vol:\s+([0-9.]+).*SL:\s+([0-9.]+).*TP:\s+([0-9.]+)'
+)
+CLOSE_PATTERN = re.compile(
+    r'(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*TRADE CLOSED:\s+(WIN|LOSS).*Profit:\s+(-?[0-9.]+).*Raz[aã]o:\s+(.+)'
+)
+
+def _signal(m: re.Match) -> Signal:
+    return Signal(
+        time=parse_ts(m.group(1)),
+        bar=int(m.group(2)),
+        entry=int(m.group(3)),
+        strength=int(m.group(4)),
+        confluence=float(m.group(5))
     )
-    signals = []
-    for line in lines:
-        m = pattern.search(line)
-        if m:
-            signals.append(Signal(
-                time=datetime.strptime(m.group(1), '%Y.%m.%d %H:%M:%S'),
-                bar=int(m.group(2)),
-                entry=int(m.group(3)),
-                strength=int(m.group(4)),
-                confluence=float(m.group(5))
-            ))
-    return signals
-
-def parse_filter_blocks(lines: list[str]) -> list[FilterCheck]:
+
+def _filter_block(m: re.Match) -> FilterCheck:
+    return FilterCheck(
+        time=parse_ts(m.group(1)),
+        filter_name=m.group(2).split(':')[0].strip(),
+        passed=False,
+        details=m.group(2)
+    )
+
+def _obv_debug(m: re.Match) -> dict:
+    return {
+        'time': parse_ts(m.group(1)),
+        'hist1': float(m.group(2)),
+        'hist2': float(m.group(3)),
+        'color': int(m.group(4)),
+        'threshold': float(m.group(5))
+    }
+
+def _bad_entry(m: re.Match) -> BadEntry:
+    return BadEntry(
+        time=parse_ts(m.group(1)),
+        profit=float(m.group(2)),
+        close_reason=m.group(3).strip(),
+        direction=m.group(4),
+        regime=m.group(5).strip(),
+        strength=int(m.group(6)),
+        confluence=float(m.group(7)),
+        sl_pts=float(m.group(8)),
+        risk_pct=float(m.group(9)),
+        spread=float(m.group(10)),
+        slope=float(m.group(11)),
+        volume=int(m.group(12)),
+        phase=int(m.group(13)),
+        ema200_ok=(m.group(14) == 'OK'),
+        rsi=float(m.group(15)),
+        rsi_ma=float(m.group(16)),
+        obv=int(m.group(17))
+    )
+
+def _trade_entry(m: re.Match) -> TradeEntry:
+    return TradeEntry(
+        time=parse_ts(m.group(1)),
+        direction=m.group(2),
+        entry_price=float(m.group(3)),
+        volume=float(m.group(4)),
+        sl=float(m.group(5)),
+        tp=float(m.group(6))
+    )
+
+def _trade_close(m: re.Match) -> TradeClose:
+    return TradeClose(
+        time=parse_ts(m.group(1)),
+        outcome=m.group(2),
+        profit=float(m.group(3)),
+        reason=m.group(4).strip()
+    )
+
+def parse_signals(lines: Iterable[str]) -> EventTable:
+    """Extrai todos os sinais detectados"""
+    return EventTable.from_rows(Signal, (_signal(m) for line in lines if (m := SIGNAL_PATTERN.search(line))))
+
+def parse_filter_blocks(lines: Iterable[str]) -> EventTable:
     """Extrai bloqueios de filtros"""
-    pattern = re.compile(
-        r'(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*FILTRO BLOQUEOU:\s+(.+)'
+    return EventTable.from_rows(
+        FilterCheck, (_filter_block(m) for line in lines if (m := FILTER_BLOCK_PATTERN.search(line)))
     )
-    blocks = []
-    for line in lines:
-        m = pattern.search(line)
-        if m:
-            blocks.append(FilterCheck(
-                time=datetime.strptime(m.group(1), '%Y.%m.%d %H:%M:%S'),
-                filter_name=m.group(2).split(':')[0].strip(),
-                passed=False,
-                details=m.group(2)
-            ))
-    return blocks
-
-def parse_obv_macd_debug(lines: list[str]) -> list[dict]:
+
+def parse_obv_macd_debug(lines: Iterable[str]) -> list[dict]:
     """Extrai dados de debug do OBV MACD"""
-    pattern = re.compile(
-        r'(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*\[OBV MACD DEBUG\].*Bar1:\s+Hist=([0-9.-]+).*Bar2:\s+Hist=([0-9.-]+).*Color=(\d+).*Threshold=([0-9.-]+)'
-    )
-    data = []
-    for line in lines:
-        m = pattern.search(line)
-        if m:
-            data.append({
-                'time': datetime.strptime(m.group(1), '%Y.%m.%d %H:%M:%S'),
-                'hist1': float(m.group(2)),
-                'hist2': float(m.group(3)),
-                'color': int(m.group(4)),
-                'threshold': float(m.group(5))
-            })
-    return data
+    return [_obv_debug(m) for line in lines if (m := OBV_DEBUG_PATTERN.search(line))]
 
-def parse_bad_entries(lines: list[str]) -> list[BadEntry]:
+def parse_bad_entries(lines: Iterable[str]) -> EventTable:
     """Extrai entradas ruins com diagnóstico completo"""
-    pattern = re.compile(
-        r'(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*BAD ENTRY.*Profit=(-?[0-9.]+).*Close=([^|]+)\|.*Dir=(\w+).*Regime=([^|]+)\|.*F=(\d+).*Conf=([0-9.]+)%.*SLpts=([0-9.]+).*Risk=([0-9.]+)%.*Spread=([0-9.]+).*Slope=(-?[0-9.]+).*Vol=(\d+)/.*Phase=(-?\d+).*EMA200=(\w+).*RSI=([0-9.]+)/MA([0-9.]+).*OBV=(\d+)'
+    return EventTable.from_rows(
+        BadEntry, (_bad_entry(m) for line in lines if (m := BAD_ENTRY_PATTERN.search(line)))
     )
-    entries = []
-    for line in lines:
-        m = pattern.search(line)
-        if m:
-            entries.append(BadEntry(
-                time=datetime.strptime(m.group(1), '%Y.%m.%d %H:%M:%S'),
-                profit=float(m.group(2)),
-                close_reason=m.group(3).strip(),
-                direction=m.group(4),
-                regime=m.group(5).strip(),
-                strength=int(m.group(6)),
-                confluence=float(m.group(7)),
-                sl_pts=float(m.group(8)),
-                risk_pct=float(m.group(9)),
-                spread=float(m.group(10)),
-                slope=float(m.group(11)),
-                volume=int(m.group(12)),
-                phase=int(m.group(13)),
-                ema200_ok=(m.group(14) == 'OK'),
-                rsi=float(m.group(15)),
-                rsi_ma=float(m.group(16)),
-                obv=int(m.group(17))
-            ))
-    return entries
-
-def parse_trades(lines: list[str]) -> tuple[list[TradeEntry], list[TradeClose]]:
+
+def parse_trades(lines: Iterable[str]) -> tuple[EventTable, EventTable]:
     """Extrai trades abertos e fechados"""
-    open_pattern = re.compile(
-        r'(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*\[INFO\]\s+TRADE:\s+(BUY|SELL)\s+@\s+([0-9.]+).*Vol:\s+([0-9.]+).*SL:\s+([0-9.]+).*TP:\s+([0-9.]+)'
-    )
-    close_pattern = re.compile(
-        r'(\d{4}\.\d{2}\.\d{2} \d{2}:\d{2}:\d{2}).*TRADE CLOSED:\s+(WIN|LOSS).*Profit:\s+(-?[0-9.]+).*Raz[aã]o:\s+(.+)'
-    )
-    
-    entries = []
-    closes = []
+    entries = TableBuilder(TradeEntry)
+    closes = TableBuilder(TradeClose)
     
     for line in lines:
-        m = open_pattern.search(line)
+        m = OPEN_PATTERN.search(line)
         if m:
-            entries.append(TradeEntry(
-                time=datetime.strptime(m.group(1), '%Y.%m.%d %H:%M:%S'),
-                direction=m.group(2),
-                entry_price=float(m.group(3)),
-                volume=float(m.group(4)),
-                sl=float(m.group(5)),
-                tp=float(m.group(6))
-            ))
+            entries.append_row(_trade_entry(m))
             continue
         
-        m = close_pattern.search(line)
+        m = CLOSE_PATTERN.search(line)
         if m:
-            closes.append(TradeClose(
-                time=datetime.strptime(m.group(1), '%Y.%m.%d %H:%M:%S'),
-                outcome=m.group(2),
-                profit=float(m.group(3)),
-                reason=m.group(4).strip()
-            ))
+            closes.append_row(_trade_close(m))
+    
+    return entries.build(), closes.build()
+
+def parse_log(lines: Iterable[str]) -> tuple[EventTable, EventTable, list, EventTable, EventTable, EventTable]:
+    """Extrai sinais, bloqueios, OBV debug, trades e bad entries em UMA passada.
+
+    Equivale a chamar cada parse_* acima, mas percorre as linhas uma única vez,
+    então funciona com o iterador em streaming de read_log().
+    """
+    signals, blocks = TableBuilder(Signal), TableBuilder(FilterCheck)
+    entries, closes, bad_entries = TableBuilder(TradeEntry), TableBuilder(TradeClose), TableBuilder(BadEntry)
+    obv_data = []
     
-    return entries, closes
+    for line in lines:
+        if (m := SIGNAL_PATTERN.search(line)):
+            signals.append_row(_signal(m))
+        if (m := FILTER_BLOCK_PATTERN.search(line)):
+            blocks.append_row(_filter_block(m))
+        if (m := OBV_DEBUG_PATTERN.search(line)):
+            obv_data.append(_obv_debug(m))
+        if (m := BAD_ENTRY_PATTERN.search(line)):
+            bad_entries.append_row(_bad_entry(m))
+        if (m := OPEN_PATTERN.search(line)):
+            entries.append_row(_trade_entry(m))
+        elif (m := CLOSE_PATTERN.search(line)):
+            closes.append_row(_trade_close(m))
+    
+    return signals.build(), blocks.build(), obv_data, entries.build(), closes.build(), bad_entries.build()
+
+def _filter_name(details: str) -> str:
+    return details.split(':')[0].strip()
 
-def analyze_indicator_health(obv_data: list[dict], bad_entries: list[BadEntry]) -> dict:
+def from_tables(tables: dict[str, EventTable]) -> tuple[EventTable, EventTable, list, EventTable, EventTable, EventTable]:
+    """Mesma saída de parse_log(), montada a partir das tabelas de eventos (em cache) do log.
+
+    As tabelas compartilham as colunas do cache (nada é copiado); o nome do
+    filtro é extraído uma vez por texto distinto, não por linha.
+    """
+    signals = tables['signals'].project(Signal, time='ts')
+    blocks = tables['filter_blocks'].project(
+        FilterCheck,
+        time='ts',
+        filter_name=lambda t: t.categorical('details').map(_filter_name),
+        passed=lambda t: np.zeros(len(t), dtype=bool),
+    )
+    obv = tables['obv_debug']
+    obv_data = [
+        {'time': d.ts, 'hist1': d.hist1, 'hist2': d.hist2, 'color': d.color, 'threshold': d.threshold}
+        for d in obv
+    ]
+    entries = tables['opens'].project(TradeEntry, time='ts', direction='side', entry_price='price')
+    closes = tables['closes'].project(TradeClose, time='ts')
+    bad_entries = tables['bad_entries'].project(BadEntry, time='ts')
+    return signals, blocks, obv_data, entries, closes, bad_entries
+
+def analyze_indicator_health(obv_data: list[dict], bad_entries: EventTable) -> dict:
     """Analisa se os indicadores estão funcionando corretamente"""
     
     issues = []
@@ -257,10 +317,11 @@ def analyze_indicator_health(obv_data: list[dict], bad_entries: list[BadEntry])
         'issues': issues
     }
 
-def analyze_signal_quality(signals: list[Signal], entries: list[TradeEntry], 
-                          closes: list[TradeClose], bad_entries: list[BadEntry]) -> dict:
+def analyze_signal_quality(signals: EventTable, entries: EventTable,
+                          closes: EventTable, bad_entries: EventTable) -> dict:
     """Analisa qualidade dos sinais vs resultados"""
     
+    
     # Contar sinais por força
     by_strength = defaultdict(lambda: {'count': 0, 'traded': 0, 'wins': 0, 'losses': 0})
     
@@ -268,18 +329,19 @@ def analyze_signal_quality(signals: list[Signal], entries: list[TradeEntry],
         strength = abs(s.strength)
         by_strength[strength]['count'] += 1
     
-    # Match trades com sinais (aproximado)
-    for i, (entry, close) in enumerate(zip(entries, closes)):
-        # Find nearest signal before entry
-        for s in reversed(signals):
-            if s.time <= entry.time:
-                strength = abs(s.strength)
-                by_strength[strength]['traded'] += 1
-                if close.outcome == 'WIN':
-                    by_strength[strength]['wins'] += 1
-                else:
-                    by_strength[strength]['losses'] += 1
-                break
+    # Match trades com sinais (aproximado): último sinal até a entrada (as-of join)
+    n = min(len(entries), len(closes))
+    nearest = asof_indices(entries['time'][:n], signals['time'])
+    strengths = signals['strength'].tolist()
+    for i, outcome in zip(nearest.tolist(), closes.column_values('outcome')[:n]):
+        if i < 0:
+            continue
+        strength = abs(strengths[i])
+        by_strength[strength]['traded'] += 1
+        if outcome == 'WIN':
+            by_strength[strength]['wins'] += 1
+        else:
+            by_strength[strength]['losses'] += 1
     
     # Calcular win rate por força
     result = {}
@@ -297,9 +359,9 @@ def analyze_signal_quality(signals: list[Signal], entries: list[TradeEntry],
     
     return result
 
-def analyze_filter_effectiveness(blocks: list[FilterCheck], 
-                                 entries: list[TradeEntry],
-                                 closes: list[TradeClose]) -> dict:
+def analyze_filter_effectiveness(blocks: EventTable,
+                                 entries: EventTable,
+                                 closes: EventTable) -> dict:
     """Analisa se filtros estão bloqueando trades bons ou ruins"""
     
     # Contar bloqueios por tipo
@@ -324,59 +386,49 @@ def analyze_filter_effectiveness(blocks: list[FilterCheck],
         'pass_rate': (total_trades / (total_trades + total_blocks) * 100) if (total_trades + total_blocks) > 0 else 0
     }
 
-def analyze_trade_patterns(bad_entries: list[BadEntry]) -> dict:
+def analyze_trade_patterns(bad_entries: EventTable) -> dict:
     """Analisa padrões em trades perdedores"""
     
     if not bad_entries:
         return {}
     
+    # Um cubo regime x direção x fase x força; cada quebra é uma soma de eixos.
+    profits = bad_entries['profit']
+    cube = build_cube(profits, {
+        'regime': bad_entries.categorical('regime'),
+        'direction': bad_entries.categorical('direction'),
+        'phase': bad_entries['phase'],
+        'strength': bad_entries['strength'],
+    })
+    
+    def by(dim, label=lambda k: k):
+        c = cube.rollup(dim)
+        # Perda total = soma de |profit| = lucro bruto + perda bruta.
+        total = c.gross_profit + c.gross_loss
+        return {
+            label(k): {'count': n, 'total_loss': t}
+            for k, n, t in zip(c.labels[0].tolist(), c.trades.tolist(), total.tolist())
+            if n
+        }
+    
+    slopes = bad_entries['slope']
+    positive = int(np.count_nonzero(slopes > 0))
     patterns = {
-        'by_regime': defaultdict(lambda: {'count': 0, 'total_loss': 0}),
-        'by_direction': defaultdict(lambda: {'count': 0, 'total_loss': 0}),
-        'by_phase': defaultdict(lambda: {'count': 0, 'total_loss': 0}),
-        'by_strength': defaultdict(lambda: {'count': 0, 'total_loss': 0}),
-        'slope_stats': {'positive': 0, 'negative': 0, 'total': 0},
+        'by_regime': by('regime'),
+        'by_direction': by('direction'),
+        'by_phase': by('phase'),
+        'by_strength': by('strength', lambda k: f'F{k}'),
+        'slope_stats': {'positive': positive, 'negative': len(slopes) - positive, 'total': len(slopes)},
+        'avg_slope': float(slopes.mean()),
+        'avg_risk_pct': float(bad_entries['risk_pct'].mean()),
+        'total_bad_entries': len(bad_entries),
     }
     
-    slopes = []
-    risk_pcts = []
-    
-    for e in bad_entries:
-        patterns['by_regime'][e.regime]['count'] += 1
-        patterns['by_regime'][e.regime]['total_loss'] += abs(e.profit)
-        
-        patterns['by_direction'][e.direction]['count'] += 1
-        patterns['by_direction'][e.direction]['total_loss'] += abs(e.profit)
-        
-        patterns['by_phase'][e.phase]['count'] += 1
-        patterns['by_phase'][e.phase]['total_loss'] += abs(e.profit)
-        
-        patterns['by_strength'][f'F{e.strength}']['count'] += 1
-        patterns['by_strength'][f'F{e.strength}']['total_loss'] += abs(e.profit)
-        
-        if e.slope > 0:
-            patterns['slope_stats']['positive'] += 1
-        else:
-            patterns['slope_stats']['negative'] += 1
-        patterns['slope_stats']['total'] += 1
-        
-        slopes.append(e.slope)
-        risk_pcts.append(e.risk_pct)
-    
-    # Converter defaultdicts para dicts
-    for key in patterns:
-        if isinstance(patterns[key], defaultdict):
-            patterns[key] = dict(patterns[key])
-    
-    patterns['avg_slope'] = mean(slopes) if slopes else 0
-    patterns['avg_risk_pct'] = mean(risk_pcts) if risk_pcts else 0
-    patterns['total_bad_entries'] = len(bad_entries)
-    
     return patterns
 
 def generate_investigation_report(
-    signals: list, blocks: list, obv_data: list,
-    entries: list, closes: list, bad_entries: list
+    signals: EventTable, blocks: EventTable, obv_data: list,
+    entries: EventTable, closes: EventTable, bad_entries: EventTable
 ) -> str:
     """Gera relatório de investigação profunda"""
     
@@ -479,6 +531,8 @@ def generate_investigation_report(
 
 def main():
     global LOG_PATH
+    if len(sys.argv) > 1:
+        LOG_PATH = Path(sys.argv[1])
     print("=" * 70)
     print("INVESTIGAÇÃO PROFUNDA DO EA FGM TrendRider")
     print("=" * 70)
@@ -494,25 +548,14 @@ def main():
             return 1
     
     print(f"\n📂 Lendo: {LOG_PATH.name}")
-    content = read_log(LOG_PATH)
-    lines = content.splitlines()
-    print(f"   {len(lines):,} linhas")
     
-    # Parse tudo
+    # Eventos do cache (.event_cache/); o log só é re-parseado se mudou
     print("\n🔍 Analisando...")
-    signals = parse_signals(lines)
+    signals, blocks, obv_data, entries, closes, bad_entries = from_tables(load_event_tables(LOG_PATH))
     print(f"   {len(signals)} sinais detectados")
-    
-    blocks = parse_filter_blocks(lines)
     print(f"   {len(blocks)} bloqueios de filtro")
-    
-    obv_data = parse_obv_macd_debug(lines)
     print(f"   {len(obv_data)} leituras OBV MACD")
-    
-    entries, closes = parse_trades(lines)
     print(f"   {len(entries)} trades abertos, {len(closes)} fechados")
-    
-    bad_entries = parse_bad_entries(lines)
     print(f"   {len(bad_entries)} bad entries")
     
     # Gerar relatório
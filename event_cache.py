@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""On-disk cache of parsed log events (stdlib-only, see below).
+
+Parsing a multi-GB tester log takes minutes; every analyzer run on the same
+log used to pay that again. `load_events()` parses a log once (through the
+mmap prefilter) and stores the resulting `log_events.LogEvents` next to it,
+in `.event_cache/<log name>.evc`. Later runs load that file instead.
+
+The cache is keyed by the log's resolved path, size, mtime and a fast hash
+of its first and last 64 KiB, plus `log_events.PARSER_VERSION` and a digest
+of the parser's source. Any mismatch (or an unreadable/corrupt file) just
+means a re-parse, so the cache can always be deleted safely.
+
+File layout (columnar, one column per event field):
+
+    MAGIC | u32 header length | JSON header | column blobs ...
+
+Each column is a raw `array` dump: datetimes as int64 epoch seconds, ints as
+int64, floats as float64, bools as int8 and strings as uint32 indices into a
+string pool shared by the whole file (lengths + UTF-8 blob).
+
+`load_event_tables()` hands those columns to `event_table.EventTable` as
+numpy views, without building an object per event (it needs numpy, which is
+imported only there). String columns are the exception: their pool indices
+are re-coded to 0..k-1 over the strings the column actually uses, so each
+categorical lists only its own labels, not the whole file's pool (which
+grows with every distinct "FILTRO BLOQUEOU" detail).
+
+`write_tables()` / `read_tables()` store EventTables of any row type in the
+same layout (e.g. analyze_log_advanced's incremental-parse checkpoint). An
+optional (`int | None`) field gets a second, int8 column "<name>?" with its
+validity mask. Tables whose stored fields no longer match the row type read
+as a miss.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import struct
+import sys
+from array import array
+from dataclasses import fields
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Mapping
+
+import log_events
+from log_events import EVENT_MARKERS, EVENT_TABLES, LogEvents, parse_log_events
+from log_source import LogSource
+from log_time import from_epoch, to_epoch
+
+if TYPE_CHECKING:
+    from event_table import EventTable
+
+
+MAGIC = b"FGMEVC\x00\x01"
+CACHE_DIR_NAME = ".event_cache"
+HASH_SPAN = 64 * 1024
+
+_HEADER_LEN = struct.Struct("<I")
+
+# field annotation -> array typecode (strings are pool indices)
+_TYPECODES = {"datetime": "q", "int": "q", "float": "d", "bool": "b", "str": "I"}
+# event_table column kind -> array typecode
+_KIND_TYPECODES = {"datetime": "q", "int": "q", "float": "d", "bool": "b", "cat": "I", "int?": "q", "float?": "d"}
+
+
+def cache_path(log_path: Path) -> Path:
+    log_path = Path(log_path)
+    return log_path.parent / CACHE_DIR_NAME / f"{log_path.name}.evc"
+
+
+def _parser_digest() -> str:
+    return hashlib.blake2b(Path(log_events.__file__).read_bytes(), digest_size=8).hexdigest()
+
+
+def log_key(log_path: Path) -> dict:
+    """Identity of a log file: path, size, mtime and a hash of its head and tail."""
+    path = Path(log_path).resolve()
+    st = path.stat()
+    h = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as f:
+        h.update(f.read(HASH_SPAN))
+        if st.st_size > HASH_SPAN:
+            f.seek(max(HASH_SPAN, st.st_size - HASH_SPAN))
+            h.update(f.read(HASH_SPAN))
+    return {
+        "path": str(path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "hash": h.hexdigest(),
+    }
+
+
+def cache_key(log_path: Path) -> dict:
+    """Identity of a log (and of the parser) as stored in the cache header."""
+    return {
+        **log_key(log_path),
+        "parser_version": log_events.PARSER_VERSION,
+        "parser_digest": _parser_digest(),
+    }
+
+
+def _encode(events: LogEvents, key: dict) -> bytes:
+    pool: dict[str, int] = {}
+    blobs: list[bytes] = []
+    tables = {}
+
+    for name, cls in EVENT_TABLES:
+        rows = getattr(events, name)
+        columns = []
+        for f in fields(cls):
+            code = _TYPECODES[f.type]
+            values = [getattr(r, f.name) for r in rows]
+            if f.type == "datetime":
+                values = [to_epoch(v) for v in values]
+            elif f.type == "str":
+                values = [pool.setdefault(v, len(pool)) for v in values]
+            blob = array(code, values).tobytes()
+            blobs.append(blob)
+            columns.append([f.name, code, len(blob)])
+        tables[name] = {"rows": len(rows), "columns": columns}
+
+    return _pack(key, tables, pool, blobs)
+
+
+def _pack(key: dict, tables: dict, pool: dict[str, int], blobs: list[bytes]) -> bytes:
+    strings = [s.encode("utf-8") for s in pool]
+    lengths = array("I", map(len, strings)).tobytes()
+    header = {
+        "key": key,
+        "byteorder": sys.byteorder,
+        "tables": tables,
+        "pool": [len(pool), len(lengths)],
+    }
+    head = json.dumps(header).encode("utf-8")
+    return b"".join([MAGIC, _HEADER_LEN.pack(len(head)), head, lengths, *strings, *blobs])
+
+
+def _encode_tables(tables: Mapping[str, EventTable], key: dict) -> bytes:
+    import numpy as np
+
+    from event_table import schema_of
+
+    dtypes = {"q": np.int64, "d": np.float64, "b": np.int8, "I": np.uint32}
+    pool: dict[str, int] = {}
+    blobs: list[bytes] = []
+    header = {}
+
+    for name, table in tables.items():
+        columns = []
+
+        def put(fname: str, code: str, values) -> None:
+            blob = np.ascontiguousarray(values, dtype=dtypes[code]).tobytes()
+            blobs.append(blob)
+            columns.append([fname, code, len(blob)])
+
+        for fname, kind in schema_of(table.row_type):
+            if kind == "cat":
+                cat = table.categorical(fname)
+                remap = np.fromiter((pool.setdefault(c, len(pool)) for c in cat.categories), dtype=np.uint32)
+                put(fname, "I", remap[cat.codes] if len(remap) else cat.codes)
+            elif kind.endswith("?"):
+                valid = table.valid(fname)
+                put(fname, _KIND_TYPECODES[kind], np.where(valid, table[fname], 0))
+                put(fname + "?", "b", valid)
+            else:
+                put(fname, _KIND_TYPECODES[kind], table[fname])
+        header[name] = {"rows": len(table), "columns": columns}
+
+    return _pack(key, header, pool, blobs)
+
+
+def _read_columns(
+    data: bytes, key: dict, names: Iterable[str] = tuple(name for name, _ in EVENT_TABLES)
+) -> tuple[list[str], dict[str, list]] | None:
+    """String pool and {table: [(field, typecode, raw bytes), ...]} of a cache file.
+
+    The raw bytes are memoryview slices of `data` in native byte order
+    (byte-swapped copies if the file was written on the other endianness).
+    """
+    if not data.startswith(MAGIC):
+        return None
+    pos = len(MAGIC)
+    (head_len,) = _HEADER_LEN.unpack_from(data, pos)
+    pos += _HEADER_LEN.size
+    header = json.loads(data[pos : pos + head_len])
+    pos += head_len
+    if header["key"] != key:
+        return None
+    swap = header["byteorder"] != sys.byteorder
+    view = memoryview(data)
+
+    def raw(code: str, nbytes: int) -> memoryview:
+        nonlocal pos
+        blob = view[pos : pos + nbytes]
+        pos += nbytes
+        if swap:
+            col = array(code)
+            col.frombytes(blob)
+            col.byteswap()
+            blob = memoryview(col.tobytes())
+        return blob
+
+    n_strings, lengths_len = header["pool"]
+    lengths = array("I")
+    lengths.frombytes(raw("I", lengths_len))
+    pool = []
+    for n in lengths:
+        pool.append(str(view[pos : pos + n], "utf-8"))
+        pos += n
+    if len(pool) != n_strings:
+        return None
+
+    tables = {}
+    for name in names:
+        tables[name] = [(fname, code, raw(code, nbytes)) for fname, code, nbytes in header["tables"][name]["columns"]]
+    return pool, tables
+
+
+def _decode(data: bytes, key: dict) -> LogEvents | None:
+    decoded = _read_columns(data, key)
+    if decoded is None:
+        return None
+    pool, tables = decoded
+
+    events = LogEvents()
+    for name, cls in EVENT_TABLES:
+        types = {f.name: f.type for f in fields(cls)}
+        cols = []
+        for fname, code, blob in tables[name]:
+            col = array(code)
+            col.frombytes(blob)
+            ftype = types[fname]
+            if ftype == "datetime":
+                col = [from_epoch(s) for s in col]
+            elif ftype == "str":
+                col = [pool[i] for i in col]
+            elif ftype == "bool":
+                col = [bool(v) for v in col]
+            cols.append(col)
+        names = [c[0] for c in tables[name]]
+        getattr(events, name).extend(cls(**dict(zip(names, row))) for row in zip(*cols))
+    return events
+
+
+def _decode_tables(
+    data: bytes, key: dict, row_types: Mapping[str, type] = dict(EVENT_TABLES)
+) -> dict[str, EventTable] | None:
+    import numpy as np
+
+    from event_table import Categorical, EventTable, schema_of
+
+    decoded = _read_columns(data, key, row_types)
+    if decoded is None:
+        return None
+    pool, tables = decoded
+    pool = [sys.intern(s) for s in pool]
+
+    def categorical(col: np.ndarray) -> Categorical:
+        used, codes = np.unique(col, return_inverse=True)
+        return Categorical(codes.astype(np.int32).ravel(), [pool[i] for i in used.tolist()])
+
+    # The file's columns already are the tables' columns: wrap them as they
+    # are, except string columns, which get their own categories.
+    dtypes = {"q": np.int64, "d": np.float64, "b": np.bool_, "I": np.int32}
+    out = {}
+    for name, cls in row_types.items():
+        cols, masks = {}, {}
+        for fname, code, blob in tables[name]:
+            col = np.frombuffer(blob, dtype=dtypes[code])
+            if fname.endswith("?"):
+                masks[fname[:-1]] = col
+            else:
+                cols[fname] = categorical(col) if code == "I" else col
+        schema = schema_of(cls)
+        if list(cols) != [f for f, _ in schema] or set(masks) != {f for f, kind in schema if kind.endswith("?")}:
+            return None
+        out[name] = EventTable(cls, cols, masks)
+    return out
+
+
+def save_events(log_path: Path, events: LogEvents, key: dict | None = None) -> Path:
+    """Write `events` to the cache of `log_path` (atomically) and return its path."""
+    return _write_cache(log_path, _encode(events, key or cache_key(log_path)))
+
+
+def _write_cache(log_path: Path, data: bytes) -> Path:
+    return _write_atomic(cache_path(log_path), data)
+
+
+def _write_atomic(target: Path, data: bytes) -> Path:
+    target.parent.mkdir(exist_ok=True)
+    tmp = target.with_suffix(f".tmp{os.getpid()}")
+    tmp.write_bytes(data)
+    os.replace(tmp, target)
+    return target
+
+
+def write_tables(path: Path, tables: Mapping[str, EventTable], key: dict) -> Path:
+    """Write EventTables of any row type (by name) to `path`, atomically."""
+    return _write_atomic(Path(path), _encode_tables(tables, key))
+
+
+def read_tables(path: Path, row_types: Mapping[str, type], key: dict) -> dict[str, EventTable] | None:
+    """Tables written by write_tables() with the same `key` and row types, or None."""
+    try:
+        return _decode_tables(Path(path).read_bytes(), key, row_types)
+    except (OSError, ValueError, KeyError, TypeError, struct.error):
+        return None
+
+
+def load_cached_events(log_path: Path, key: dict | None = None) -> LogEvents | None:
+    """Events from the cache of `log_path`, or None if missing or stale."""
+    try:
+        data = cache_path(log_path).read_bytes()
+    except OSError:
+        return None
+    try:
+        return _decode(data, key or cache_key(log_path))
+    except (ValueError, KeyError, TypeError, struct.error):
+        return None
+
+
+def load_events(log_path: Path, use_cache: bool = True) -> LogEvents:
+    """Parsed events of a log, from the cache when it is still valid.
+
+    On a miss the log is parsed (decoding only lines with event markers) and
+    the cache is rewritten; a read-only log directory just skips the write.
+    """
+    if not use_cache:
+        return parse_log_events(LogSource(log_path).marked_lines(EVENT_MARKERS))
+
+    key = cache_key(log_path)
+    events = load_cached_events(log_path, key)
+    if events is None:
+        events = parse_log_events(LogSource(log_path).marked_lines(EVENT_MARKERS))
+        try:
+            save_events(log_path, events, key)
+        except OSError:
+            pass
+    return events
+
+
+def load_event_tables(log_path: Path, use_cache: bool = True) -> dict[str, EventTable]:
+    """Like load_events(), as columnar tables keyed by `EVENT_TABLES` name.
+
+    A valid cache file is used as it is (numpy views of its column blobs, no
+    object per event); on a miss the log is parsed and the cache rewritten.
+    """
+    key = cache_key(log_path)
+    if use_cache:
+        try:
+            tables = _decode_tables(cache_path(log_path).read_bytes(), key)
+        except (OSError, ValueError, KeyError, TypeError, struct.error):
+            tables = None
+        if tables is not None:
+            return tables
+
+    data = _encode(parse_log_events(LogSource(log_path).marked_lines(EVENT_MARKERS)), key)
+    if use_cache:
+        try:
+            _write_cache(log_path, data)
+        except OSError:
+            pass
+    return _decode_tables(data, key)
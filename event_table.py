@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""Columnar (struct-of-arrays) event tables backed by numpy.
+
+The analyzers used to keep their events in lists of dataclass instances.
+On a multi-year log that is millions of Python objects, each with boxed
+floats and its own datetime, and it costs hundreds of MB. An `EventTable`
+keeps one numpy array per field instead. It is still described by the same
+dataclass (the *row type*), and the column kinds come from the field
+annotations, as in the event cache:
+
+    datetime        int64 epoch seconds (see log_time.to_epoch)
+    int / float     int64 / float64
+    bool            bool
+    str             categorical: int32 codes into a list of interned strings
+    int | None      int64 / float64 plus a validity mask (False = None)
+    float | None
+
+Side, outcome, reason, regime, filter name and the like have only a few
+distinct values, so a categorical column costs 4 bytes per row and every
+string is stored once.
+
+Tables are immutable. `where()`, `take()`, `sort_by()` and slicing return
+*views*: they share the parent's arrays and only record which rows they
+select, so nothing is copied until a column is read (slices stay true numpy
+views even then). `concat()` joins tables of one row type and re-codes
+categoricals through a small lookup array per table.
+
+Reading a column gives a numpy array (`table["profit"]`). Iterating gives
+rows as instances of the row type, built on the fly, so report code written
+against lists of dataclasses keeps working unchanged:
+
+    for t in trades:
+        print(t.close_ts.date(), t.side, t.profit)
+
+`TableBuilder` appends rows field by field into compact `array`s while a log
+is parsed, without building a row object per event.
+"""
+
+from __future__ import annotations
+
+import sys
+from array import array
+from dataclasses import MISSING, fields
+from typing import Any, Iterable, Iterator, Sequence
+
+import numpy as np
+
+from log_time import from_epoch, to_epoch
+
+
+# annotation -> (column kind, numpy dtype, array typecode)
+_KINDS = {
+    "datetime": ("datetime", np.int64, "q"),
+    "int": ("int", np.int64, "q"),
+    "float": ("float", np.float64, "d"),
+    "bool": ("bool", np.bool_, "b"),
+    "str": ("cat", np.int32, "i"),
+    "int | None": ("int?", np.int64, "q"),
+    "float | None": ("float?", np.float64, "d"),
+}
+
+
+def _annotation(tp: Any) -> str:
+    # Works with and without `from __future__ import annotations`.
+    if isinstance(tp, str):
+        return tp
+    return getattr(tp, "__name__", None) if isinstance(tp, type) else str(tp)
+
+
+_SCHEMAS: dict[type, tuple[tuple[str, str], ...]] = {}
+
+
+def schema_of(row_type: type) -> tuple[tuple[str, str], ...]:
+    """((field name, column kind), ...) of a dataclass row type."""
+    schema = _SCHEMAS.get(row_type)
+    if schema is None:
+        items = []
+        for f in fields(row_type):
+            ann = _annotation(f.type)
+            if ann not in _KINDS:
+                raise TypeError(f"{row_type.__name__}.{f.name}: unsupported column type {ann!r}")
+            items.append((f.name, _KINDS[ann][0]))
+        schema = _SCHEMAS[row_type] = tuple(items)
+    return schema
+
+
+def _dtype(kind: str):
+    for k, dtype, _ in _KINDS.values():
+        if k == kind:
+            return dtype
+    raise KeyError(kind)
+
+
+def _typecode(kind: str) -> str:
+    for k, _, code in _KINDS.values():
+        if k == kind:
+            return code
+    raise KeyError(kind)
+
+
+class Categorical:
+    """Dictionary-encoded strings: int32 codes into `categories`."""
+
+    __slots__ = ("codes", "categories")
+
+    def __init__(self, codes: np.ndarray, categories: Sequence[str]):
+        self.codes = codes
+        self.categories = categories
+
+    @classmethod
+    def from_values(cls, values: Iterable[str]) -> Categorical:
+        lookup: dict[str, int] = {}
+        codes = np.fromiter(
+            (lookup.setdefault(v, len(lookup)) for v in values), dtype=np.int32
+        )
+        return cls(codes, [sys.intern(v) for v in lookup])
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def take(self, sel) -> Categorical:
+        return Categorical(self.codes[sel], self.categories)
+
+    def values(self) -> np.ndarray:
+        """Object array of the strings (shares the category objects)."""
+        return np.asarray(self.categories, dtype=object)[self.codes] if len(self.categories) else np.empty(
+            len(self.codes), dtype=object
+        )
+
+    def tolist(self) -> list[str]:
+        cats = self.categories
+        return [cats[c] for c in self.codes.tolist()]
+
+    def code_of(self, value: str) -> int:
+        """Code of `value`, or -1 if it never occurs (matches no row)."""
+        try:
+            return list(self.categories).index(value)
+        except ValueError:
+            return -1
+
+    def map(self, fn) -> Categorical:
+        """Apply `fn` to each distinct string (not to each row)."""
+        return Categorical.from_codes_values(self.codes, [fn(c) for c in self.categories])
+
+    @classmethod
+    def from_codes_values(cls, codes: np.ndarray, values: Sequence[str]) -> Categorical:
+        # `values` may repeat after a map(): merge equal categories.
+        lookup: dict[str, int] = {}
+        remap = np.fromiter((lookup.setdefault(v, len(lookup)) for v in values), dtype=np.int32, count=len(values))
+        return cls(remap[codes] if len(values) else codes, [sys.intern(v) for v in lookup])
+
+
+def _concat_categoricals(parts: Sequence[Categorical]) -> Categorical:
+    lookup: dict[str, int] = {}
+    out = []
+    for p in parts:
+        remap = np.fromiter(
+            (lookup.setdefault(c, len(lookup)) for c in p.categories), dtype=np.int32, count=len(p.categories)
+        )
+        out.append(remap[p.codes] if len(p.categories) else p.codes.astype(np.int32))
+    codes = np.concatenate(out) if out else np.empty(0, dtype=np.int32)
+    return Categorical(codes, [sys.intern(v) for v in lookup])
+
+
+def _compose(outer, n: int, inner):
+    """Row selection equal to applying `outer`, then `inner`, to n rows."""
+    if outer is None:
+        return inner
+    if isinstance(outer, slice) and isinstance(inner, slice):
+        r = range(n)[outer][inner]
+        stop = None if r.step < 0 and r.stop < 0 else r.stop
+        return slice(r.start, stop, r.step)
+    return np.arange(n)[outer][inner]
+
+
+class EventTable:
+    """Immutable struct-of-arrays table of `row_type` rows (see module docstring)."""
+
+    __slots__ = ("row_type", "_columns", "_masks", "_sel", "_n", "_base_n")
+
+    def __init__(
+        self,
+        row_type: type,
+        columns: dict[str, Any],
+        masks: dict[str, np.ndarray] | None = None,
+        _sel=None,
+    ):
+        self.row_type = row_type
+        self._columns = columns
+        self._masks = masks or {}
+        first = next(iter(columns.values()), None)
+        self._base_n = 0 if first is None else len(first)
+        self._sel = _sel
+        if _sel is None:
+            self._n = self._base_n
+        elif isinstance(_sel, slice):
+            self._n = len(range(self._base_n)[_sel])
+        else:
+            self._n = len(_sel)
+
+    # -- construction --------------------------------------------------
+
+    @classmethod
+    def empty(cls, row_type: type) -> EventTable:
+        return TableBuilder(row_type).build()
+
+    @classmethod
+    def from_rows(cls, row_type: type, rows: Iterable[Any]) -> EventTable:
+        """Table from row-type instances (or anything with the same attributes)."""
+        b = TableBuilder(row_type)
+        names = b.names
+        for r in rows:
+            b.append(*[getattr(r, n) for n in names])
+        return b.build()
+
+    @classmethod
+    def from_columns(cls, row_type: type, **columns: Any) -> EventTable:
+        """Table from whole columns.
+
+        Datetime columns are epoch seconds, categoricals a `Categorical` or
+        a sequence of strings, optional columns may hold None (or be a
+        numpy masked array). Every field must be given.
+        """
+        cols: dict[str, Any] = {}
+        masks: dict[str, np.ndarray] = {}
+        for name, kind in schema_of(row_type):
+            if name not in columns:
+                raise TypeError(f"missing column {name!r} for {row_type.__name__}")
+            v = columns[name]
+            if kind == "cat":
+                cols[name] = v if isinstance(v, Categorical) else Categorical.from_values(v)
+            elif kind.endswith("?"):
+                if isinstance(v, np.ma.MaskedArray):
+                    masks[name] = ~np.ma.getmaskarray(v)
+                    cols[name] = v.filled(0).astype(_dtype(kind))
+                else:
+                    v = list(v) if not isinstance(v, np.ndarray) else v
+                    if isinstance(v, list):
+                        masks[name] = np.fromiter((x is not None for x in v), dtype=bool, count=len(v))
+                        v = [0 if x is None else x for x in v]
+                    else:
+                        masks[name] = np.ones(len(v), dtype=bool)
+                    cols[name] = np.asarray(v, dtype=_dtype(kind))
+            else:
+                cols[name] = np.asarray(v, dtype=_dtype(kind))
+        return cls(row_type, cols, masks)
+
+    def project(self, row_type: type, **sources: Any) -> EventTable:
+        """This table's rows as another row type, sharing the columns.
+
+        Each field of `row_type` comes from the column of the same name,
+        from the column named by `sources[field]` (a string), or from a
+        callable taking this table and returning a column. Fields with a
+        default and no source become constant (broadcast, not copied).
+        """
+        src = self._materialize()
+        cols: dict[str, Any] = {}
+        masks: dict[str, np.ndarray] = {}
+        defaults = {f.name: f.default for f in fields(row_type)}
+        for name, kind in schema_of(row_type):
+            how = sources.get(name, name)
+            if callable(how):
+                col = how(self)
+                if kind == "cat" and not isinstance(col, Categorical):
+                    col = Categorical.from_values(col)
+            elif how in src._columns:
+                col = src._columns[how]
+                if how in src._masks:
+                    masks[name] = src._masks[how]
+            elif defaults.get(name, MISSING) is not MISSING:
+                default = defaults[name]
+                if kind == "cat":
+                    col = Categorical(np.broadcast_to(np.int32(0), (self._n,)), [sys.intern(default)])
+                else:
+                    col = np.broadcast_to(np.asarray(default, dtype=_dtype(kind)), (self._n,))
+            else:
+                raise TypeError(f"no source column for {row_type.__name__}.{name}")
+            if kind.endswith("?") and name not in masks:
+                masks[name] = np.ones(self._n, dtype=bool)
+            cols[name] = col if kind == "cat" else np.asarray(col, dtype=_dtype(kind))
+        return EventTable(row_type, cols, masks)
+
+    # -- views -----------------------------------------------------------
+
+    def _view(self, sel) -> EventTable:
+        return EventTable(self.row_type, self._columns, self._masks, _compose(self._sel, self._base_n, sel))
+
+    def where(self, mask) -> EventTable:
+        """View of the rows where the boolean `mask` is True."""
+        mask = np.asarray(mask, dtype=bool)
+        if len(mask) != self._n:
+            raise ValueError(f"mask has {len(mask)} rows, table has {self._n}")
+        return self._view(np.flatnonzero(mask))
+
+    def take(self, indices) -> EventTable:
+        """View of the rows at `indices` (in that order)."""
+        return self._view(np.asarray(indices, dtype=np.intp))
+
+    def sort_by(self, name: str) -> EventTable:
+        """View sorted by a column (stable, like sorted())."""
+        return self.take(np.argsort(self[name], kind="stable"))
+
+    def _materialize(self) -> EventTable:
+        if self._sel is None:
+            return self
+        cols = {n: self._raw(n) for n in self._columns}
+        masks = {n: m[self._sel] for n, m in self._masks.items()}
+        return EventTable(self.row_type, cols, masks)
+
+    def copy(self) -> EventTable:
+        """Table owning compact copies of the selected rows."""
+        t = self._materialize()
+        cols = {
+            n: Categorical(c.codes.copy(), c.categories) if isinstance(c, Categorical) else np.array(c)
+            for n, c in t._columns.items()
+        }
+        return EventTable(self.row_type, cols, {n: m.copy() for n, m in t._masks.items()})
+
+    # -- columns -------------------------------------------------------------
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        return tuple(self._columns)
+
+    def _raw(self, name: str):
+        col = self._columns[name]
+        if self._sel is None:
+            return col
+        return col.take(self._sel) if isinstance(col, Categorical) else col[self._sel]
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            col = self._raw(key)
+            if isinstance(col, Categorical):
+                return col.values()
+            if key in self._masks:
+                out = col.astype(np.float64)
+                out[~self.valid(key)] = np.nan
+                return out
+            return col
+        if isinstance(key, slice):
+            return self._view(key)
+        if isinstance(key, (int, np.integer)):
+            n = self._n
+            if not -n <= key < n:
+                raise IndexError("row index out of range")
+            return self._row_at(int(key) % n)
+        key = np.asarray(key)
+        return self.where(key) if key.dtype == bool else self.take(key)
+
+    def categorical(self, name: str) -> Categorical:
+        """Codes and categories of a str column."""
+        col = self._raw(name)
+        if not isinstance(col, Categorical):
+            raise TypeError(f"{name!r} is not a categorical column")
+        return col
+
+    def valid(self, name: str) -> np.ndarray:
+        """False where an optional column is None."""
+        m = self._masks.get(name)
+        if m is None:
+            return np.ones(self._n, dtype=bool)
+        return m if self._sel is None else m[self._sel]
+
+    def datetimes(self, name: str) -> np.ndarray:
+        """A datetime column as numpy datetime64[s]."""
+        return self._raw(name).view("datetime64[s]")
+
+    # -- rows ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __bool__(self) -> bool:
+        return self._n > 0
+
+    def column_values(self, name: str) -> list:
+        """A column as Python values, exactly as the row attributes hold them."""
+        kind = dict(schema_of(self.row_type))[name]
+        col = self._raw(name)
+        if kind == "cat":
+            return col.tolist()
+        values = col.tolist()
+        if kind == "datetime":
+            return [from_epoch(s) for s in values]
+        if kind.endswith("?"):
+            return [v if ok else None for v, ok in zip(values, self.valid(name).tolist())]
+        return values
+
+    def __iter__(self) -> Iterator[Any]:
+        row_type = self.row_type
+        cols = [self.column_values(n) for n, _ in schema_of(row_type)]
+        for values in zip(*cols):
+            yield row_type(*values)
+
+    def __reversed__(self) -> Iterator[Any]:
+        return iter(self[::-1])
+
+    def _row_at(self, i: int) -> Any:
+        return next(iter(self[i : i + 1]))
+
+    def tolist(self) -> list[Any]:
+        return list(self)
+
+    def __repr__(self) -> str:
+        return f"<EventTable {self.row_type.__name__} rows={self._n}>"
+
+    def __reduce__(self):
+        # Pickle only the selected rows.
+        t = self.copy()
+        return (EventTable, (t.row_type, t._columns, t._masks))
+
+
+def concat(tables: Sequence[EventTable], row_type: type | None = None) -> EventTable:
+    """One table with the rows of `tables` in order (all of one row type)."""
+    if not tables:
+        if row_type is None:
+            raise ValueError("concat() of no tables needs a row_type")
+        return EventTable.empty(row_type)
+    row_type = row_type or tables[0].row_type
+    if any(t.row_type is not row_type for t in tables):
+        raise TypeError("concat() needs tables of one row type")
+    if len(tables) == 1:
+        return tables[0]
+    cols: dict[str, Any] = {}
+    masks: dict[str, np.ndarray] = {}
+    for name, kind in schema_of(row_type):
+        if kind == "cat":
+            cols[name] = _concat_categoricals([t._raw(name) for t in tables])
+        else:
+            cols[name] = np.concatenate([t._raw(name) for t in tables])
+        if kind.endswith("?"):
+            masks[name] = np.concatenate([t.valid(name) for t in tables])
+    return EventTable(row_type, cols, masks)
+
+
+class TableBuilder:
+    """Appends rows field by field; `build()` turns them into an EventTable."""
+
+    def __init__(self, row_type: type):
+        self.row_type = row_type
+        self._schema = schema_of(row_type)
+        self.names = tuple(n for n, _ in self._schema)
+        self._data = [array(_typecode(kind)) for _, kind in self._schema]
+        self._masks = {i: array("b") for i, (_, kind) in enumerate(self._schema) if kind.endswith("?")}
+        self._lookups = {i: {} for i, (_, kind) in enumerate(self._schema) if kind == "cat"}
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def append(self, *values: Any) -> None:
+        """Add one row; values in field order, as the row type holds them."""
+        for i, ((_, kind), v) in enumerate(zip(self._schema, values, strict=True)):
+            if kind == "cat":
+                lookup = self._lookups[i]
+                v = lookup.setdefault(v, len(lookup))
+            elif kind == "datetime":
+                v = to_epoch(v)
+            elif kind.endswith("?"):
+                self._masks[i].append(v is not None)
+                if v is None:
+                    v = 0
+            self._data[i].append(v)
+        self._n += 1
+
+    def append_row(self, row: Any) -> None:
+        self.append(*[getattr(row, n) for n in self.names])
+
+    def build(self) -> EventTable:
+        cols: dict[str, Any] = {}
+        masks: dict[str, np.ndarray] = {}
+        for i, (name, kind) in enumerate(self._schema):
+            # Copy out of the array: a buffer export would pin it.
+            data = np.frombuffer(self._data[i], dtype=_dtype(kind)).copy() if self._n else np.empty(0, dtype=_dtype(kind))
+            if kind == "cat":
+                cols[name] = Categorical(data, [sys.intern(v) for v in self._lookups[i]])
+            else:
+                cols[name] = data
+            if kind.endswith("?"):
+                m = self._masks[i]
+                masks[name] = np.frombuffer(m, dtype=np.int8).astype(bool) if self._n else np.empty(0, dtype=bool)
+        return EventTable(self.row_type, cols, masks)
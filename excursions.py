@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Maximum adverse / favorable excursion (MAE / MFE) of trades from MT5 bar exports.
+
+The log only gives the closed result of each trade, so trailing-stop and TP
+distances had to be guessed from the average win and loss. With the bar
+history of the symbol (MT5: View > Symbols > Bars > Export, or the
+History Center export) each trade's path can be bounded:
+
+    bars = load_bars("USDJPY_M1.csv")
+    exc = trade_excursions(bars, trades, "USDJPY")      # pair_trades() table
+    exc["mfe_points"], exc["mae_money"], ...
+
+For every trade, the bars from the one holding the open to the one holding
+the close are located with `searchsorted`. The highest high and lowest low
+over each bar range come from one `maximum.reduceat` / `minimum.reduceat`
+over the interleaved (start, end) indices, so all trades are done in a few C
+passes whatever their count (ten years of M1 bars and 100k trades take about
+a second once the bars are loaded). For a BUY the favorable
+excursion is the highest high minus the entry and the adverse one the entry
+minus the lowest low, the other way round for a SELL. Both are >= 0.
+
+The open and close bars are taken whole, so prices just before the entry or
+just after the exit count too: on M1 bars that is at most a minute of extra
+range. Bars are bid prices; the spread is not added. Trades outside the
+bar history get NaN.
+
+Points are price distances over the symbol's point (`SymbolSpec.tick_size`),
+money is the price distance times volume converted to the account currency
+as in deal_matcher (at the entry price when the account currency is the
+base currency).
+"""
+
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from deal_matcher import SymbolSpec, conversion_factor
+from event_table import Categorical, EventTable
+from log_source import sniff_encoding
+from log_time import day_epoch
+
+
+@dataclass(frozen=True)
+class Bars:
+    ts: np.ndarray  # int64 epoch seconds of each bar's open, ascending
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray | None = None  # tick volume, when the export has it
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+
+@dataclass(frozen=True)
+class Excursion:
+    open_ts: datetime
+    side: str
+    bars: int  # bars spanned, 0 if outside the history
+    mae_price: float
+    mfe_price: float
+    mae_points: float
+    mfe_points: float
+    mae_money: float
+    mfe_money: float
+
+
+def _clock_seconds(times: np.ndarray) -> np.ndarray:
+    """Seconds since midnight of "HH:MM" / "HH:MM:SS" strings (one parse per distinct value)."""
+    uniq, inverse = np.unique(times, return_inverse=True)
+    secs = np.array([int(t[0:2]) * 3600 + int(t[3:5]) * 60 + (int(t[6:8]) if len(t) >= 8 else 0) for t in uniq])
+    return secs[inverse] if len(uniq) else np.empty(0, dtype=np.int64)
+
+
+def load_bars(path: Path | str) -> Bars:
+    """Bars of an MT5 CSV export, sorted by time.
+
+    Accepts the tab-separated export with a "<DATE> <TIME> <OPEN> ..." header
+    and the comma-separated "2023.01.02,00:00,open,high,low,close,..." one,
+    with the date and time in one field or two, in UTF-8 or UTF-16. The
+    column after CLOSE (<TICKVOL>) becomes `volume` when present.
+    """
+    raw = Path(path).read_bytes()
+    encoding, bom = sniff_encoding(raw[:512])
+    lines = raw[bom:].decode(encoding, "ignore").splitlines()
+    lines = [ln for ln in lines if ln.strip()]
+    if lines and not lines[0][:1].isdigit():
+        lines = lines[1:]  # header
+    if not lines:
+        return Bars(*(np.empty(0, dtype=t) for t in (np.int64, float, float, float, float)))
+    delimiter = "\t" if "\t" in lines[0] else ","
+    fields = lines[0].split(delimiter)
+    # "2023.01.02 00:00" in one field, or date and time in two.
+    joined = " " in fields[0].strip()
+    first_price = 1 if joined else 2
+    text = io.StringIO("\n".join(lines))
+    stamps = np.loadtxt(text, delimiter=delimiter, usecols=(0,) if joined else (0, 1), dtype=str, ndmin=2)
+    text.seek(0)
+    with_volume = len(fields) > first_price + 4
+    ncols = 5 if with_volume else 4
+    ohlc = np.loadtxt(
+        text, delimiter=delimiter, usecols=range(first_price, first_price + ncols), dtype=np.float64, ndmin=2
+    )
+
+    if joined:
+        dates, times = np.char.partition(np.char.strip(stamps[:, 0]), " ")[:, [0, 2]].T
+    else:
+        dates, times = stamps[:, 0], stamps[:, 1]
+    days, inverse = np.unique(dates, return_inverse=True)
+    day_secs = np.array([day_epoch(d.replace("-", ".")) for d in days], dtype=np.int64)
+    ts = day_secs[inverse] + _clock_seconds(times)
+
+    order = np.argsort(ts, kind="stable")
+    if (order == np.arange(len(order))).all():
+        order = slice(None)
+    return Bars(ts[order], *(np.ascontiguousarray(ohlc[order, i]) for i in range(ncols)))
+
+
+def _range_extremes(bars: Bars, lo: np.ndarray, hi: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Highest high and lowest low over bars [lo, hi) per trade (hi > lo)."""
+    # reduceat over [s0, e0, s1, e1, ...]: the even slots reduce x[s:e]. A
+    # sentinel bar keeps e == len(bars) a valid index.
+    idx = np.column_stack((lo, hi)).ravel()
+    high = np.append(bars.high, -np.inf)
+    low = np.append(bars.low, np.inf)
+    return np.maximum.reduceat(high, idx)[::2], np.minimum.reduceat(low, idx)[::2]
+
+
+def excursions(
+    bars: Bars,
+    open_ts: Any,
+    close_ts: Any,
+    side: Any,
+    open_price: Any,
+    volume: Any = None,
+    symbol: str = "USDJPY",
+    spec: SymbolSpec = SymbolSpec(),
+    account_currency: str = "USD",
+) -> EventTable:
+    """Excursion table of trades given as columns (epoch seconds, "BUY"/"SELL", price, lots)."""
+    t0 = np.asarray(open_ts, dtype=np.int64)
+    t1 = np.asarray(close_ts, dtype=np.int64)
+    entry = np.asarray(open_price, dtype=np.float64)
+    sides = np.asarray(side).astype(str)
+    buy = np.char.upper(sides) == "BUY"
+    lots = np.ones(len(t0)) if volume is None else np.asarray(volume, dtype=np.float64)
+
+    # Bar holding the open .. bar holding the close, inclusive. A trade is
+    # covered when both ends fall inside the history (the last bar lasts one
+    # bar period).
+    lo = np.searchsorted(bars.ts, t0, side="right") - 1
+    hi = np.searchsorted(bars.ts, np.maximum(t1, t0), side="right")
+    if len(bars):
+        period = int(np.median(np.diff(bars.ts))) if len(bars) > 1 else 60
+        covered = (lo >= 0) & (t1 < bars.ts[-1] + period)
+    else:
+        covered = np.zeros(len(t0), dtype=bool)
+    lo_c, hi_c = np.where(covered, lo, 0), np.where(covered, hi, 1)
+
+    if len(bars) and len(t0):
+        high, low = _range_extremes(bars, lo_c, hi_c)
+    else:
+        high = low = np.full(len(t0), np.nan)
+    mfe = np.where(buy, high - entry, entry - low)
+    mae = np.where(buy, entry - low, high - entry)
+    mfe = np.where(covered, np.maximum(mfe, 0.0), np.nan)
+    mae = np.where(covered, np.maximum(mae, 0.0), np.nan)
+
+    per_price = lots * conversion_factor(symbol, spec, account_currency, entry)
+    return EventTable.from_columns(
+        Excursion,
+        open_ts=t0,
+        side=Categorical((~buy).astype(np.int32), ["BUY", "SELL"]),
+        bars=np.where(covered, hi - lo, 0),
+        mae_price=mae,
+        mfe_price=mfe,
+        mae_points=mae / spec.tick_size,
+        mfe_points=mfe / spec.tick_size,
+        mae_money=mae * per_price,
+        mfe_money=mfe * per_price,
+    )
+
+
+def trade_excursions(bars: Bars, trades: EventTable, symbol: str = "USDJPY", **options: Any) -> EventTable:
+    """excursions() of an analyze_log_advanced.pair_trades() table."""
+    return excursions(
+        bars,
+        trades["open_ts"],
+        trades["close_ts"],
+        trades.categorical("side").values(),
+        trades["open_price"],
+        trades["volume"],
+        symbol,
+        **options,
+    )
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""NumPy port of Indicators/FGM_TrendRider_EA/FGM_Indicator.mq5 over a whole bar history.
+
+FGM signals used to come only from running MT5 and reading "Sinal
+detectado! Bar=.., Entry=.., Strength=.., Confluence=..%" back out of the
+log. `fgm()` computes the indicator's buffers for every bar of a `Bars`
+history at once:
+
+    bars = load_bars("USDJPY_M1.csv")
+    out = fgm(bars, EA_PARAMS)
+    sig = fgm_signals(bars, out)                      # one row per Entry != 0
+    check = match_log_signals(bars, out, tables["signals"])
+
+Every rule of OnCalculate() / GenerateTradeSignals() is an elementwise
+expression over arrays shifted by one to three bars, so a history is a fixed
+number of numpy passes (the EMAs and the RSI are the only recursions, see
+indicator_math). Ten years of M1 bars take a few seconds.
+
+Buffers, as in the .mq5:
+
+- `ema[0..4]`: EMAs of the applied price (InpPeriod1..5);
+- `strength`: EMA pairs in bullish order (EMA i > EMA i+1) plus close >
+  EMA5, or minus the bearish count when that is larger (-5..5);
+- `phase`: +-2 for a perfect alignment on the right side of EMA5, +-1 for
+  3+ pairs in order, else 0;
+- `confluence`: |EMA1 - EMA5| as % of the close, bucketed by
+  InpConfRangeMax/High/Med/Low into 100/75/50/25/10;
+- `signal`: +-strength when strength >= InpMinStrength (with the sign of the
+  phase) and the confluence filter passes;
+- `entry`: +1/-1 from the primary crossover (cross on this bar or one of
+  the two before, closed beyond the fast EMA, slow EMA not sloping against
+  it, not already signalled), else from the pullback rules (touch of the
+  fast / EMA3 / slow EMA on the trend side of EMA5, volume below
+  InpPullbackVolFact x its average, RSI(14) zones, candle in the trend's
+  direction). `kind` says which (1 cross, 2 pullback).
+
+The quirks of the .mq5 are kept, since the EA trades on them: a SELL cross
+only checks |strength|, the pullback "EMA8 / EMA50" touches are the
+crossover pair's EMAs, and the volume average only exists from bar
+InpVolMaPeriod on. InpSecondaryCross is an input the .mq5 never uses; its
+crosses are returned (`secondary_cross`) next to the primary ones for
+reference only.
+
+Bars before InpPeriod5 + 10 are not computed (zeros), as in MT5. The live
+indicator never signals on the forming bar; here every bar is taken as
+closed. The EMAs are seeded with the first bar of the history, so the
+first few hundred bars may differ from a terminal that has older history.
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from event_table import EventTable
+from excursions import Bars, load_bars
+from indicator_math import ema, sma, wilder_rsi
+
+
+# CROSSOVER_TYPE -> (fast, slow) EMA index; CROSS_CUSTOM uses custom_cross.
+CROSS_EMA1_EMA2, CROSS_EMA2_EMA3, CROSS_EMA3_EMA4, CROSS_CUSTOM = range(4)
+_CROSS_PAIRS = {CROSS_EMA1_EMA2: (0, 1), CROSS_EMA2_EMA3: (1, 2), CROSS_EMA3_EMA4: (2, 3)}
+
+# SIGNAL_MODE
+MODE_CONSERVATIVE, MODE_MODERATE, MODE_AGGRESSIVE = range(3)
+
+# ENUM_APPLIED_PRICE
+APPLIED_PRICES = {
+    "close": lambda b: b.close,
+    "open": lambda b: b.open,
+    "high": lambda b: b.high,
+    "low": lambda b: b.low,
+    "median": lambda b: (b.high + b.low) / 2.0,
+    "typical": lambda b: (b.high + b.low + b.close) / 3.0,
+    "weighted": lambda b: (b.high + b.low + 2.0 * b.close) / 4.0,
+}
+
+KIND_CROSS, KIND_PULLBACK = 1, 2
+
+
+@dataclass(frozen=True)
+class FgmParams:
+    """Inputs of FGM_Indicator.mq5 (defaults of the .mq5)."""
+
+    periods: tuple[int, int, int, int, int] = (5, 8, 21, 50, 200)
+    applied_price: str = "close"
+    primary_cross: int = CROSS_EMA1_EMA2
+    secondary_cross: int = CROSS_EMA2_EMA3
+    custom_cross: tuple[int, int] = (1, 2)  # 1-based EMA indices
+    signal_mode: int = MODE_MODERATE
+    min_strength: int = 3
+    confluence_threshold: float = 50.0
+    require_confluence: bool = False
+    enable_pullbacks: bool = True
+    conf_range_max: float = 0.05
+    conf_range_high: float = 0.10
+    conf_range_med: float = 0.20
+    conf_range_low: float = 0.30
+    pullback_use_vol: bool = True
+    pullback_vol_fact: float = 0.7
+    pullback_use_rsi: bool = True
+    pullback_rsi_low: float = 30.0
+    pullback_rsi_high: float = 70.0
+    vol_ma_period: int = 20
+    point: float = 0.001  # _Point of the symbol (USDJPY)
+
+
+# What FGM_TrendRider.mq5 passes to iCustom() with its default inputs.
+EA_PARAMS = replace(FgmParams(), min_strength=4, confluence_threshold=60.0, require_confluence=True)
+
+
+@dataclass(frozen=True)
+class FgmResult:
+    ema: np.ndarray  # (5, bars)
+    strength: np.ndarray  # int64
+    phase: np.ndarray
+    confluence: np.ndarray
+    signal: np.ndarray
+    entry: np.ndarray  # +1 BUY, -1 SELL, 0
+    kind: np.ndarray  # KIND_CROSS / KIND_PULLBACK where entry != 0
+    primary_cross: np.ndarray  # +1 / -1 on the bar the pair crosses
+    secondary_cross: np.ndarray
+    rsi: np.ndarray
+    computed: np.ndarray  # bool: bar past the warm-up
+
+
+@dataclass(frozen=True)
+class FgmSignal:
+    ts: datetime
+    entry: int
+    strength: int
+    confluence: float
+    phase: int
+    kind: str  # "cross" / "pullback"
+
+
+@dataclass(frozen=True)
+class SignalCheck:
+    ts: datetime  # log line time
+    bar_ts: datetime  # open time of the bar the log signal refers to
+    entry_log: int
+    entry_calc: int
+    strength_log: int
+    strength_calc: int
+    confluence_log: float
+    confluence_calc: float
+    match: bool  # entry, strength and confluence all agree
+
+
+def _pair(cross: int, custom: tuple[int, int]) -> tuple[int, int]:
+    if cross == CROSS_CUSTOM:
+        return custom[0] - 1, custom[1] - 1
+    return _CROSS_PAIRS[cross]
+
+
+def _shift(x: np.ndarray, k: int, fill: Any = 0) -> np.ndarray:
+    """x[t - k] at t (`fill` for the first k bars)."""
+    out = np.empty_like(x)
+    out[:k] = fill
+    out[k:] = x[: len(x) - k]
+    return out
+
+
+def _crosses(fast: np.ndarray, slow: np.ndarray) -> np.ndarray:
+    """+1 where fast crosses above slow on the bar, -1 below, else 0."""
+    fp, sp = _shift(fast, 1), _shift(slow, 1)
+    up = (fp <= sp) & (fast > slow)
+    down = (fp >= sp) & (fast < slow)
+    out = up.astype(np.int64) - down
+    out[:1] = 0
+    return out
+
+
+def fgm(bars: Bars, params: FgmParams = FgmParams(), tick_volume: Any = None) -> FgmResult:
+    """Every buffer of the indicator for every bar (see module docstring).
+
+    `tick_volume` defaults to `bars.volume` when the export had one, and
+    otherwise the volume filter is off.
+    """
+    p = params
+    n = len(bars)
+    close, open_, high, low = bars.close, bars.open, bars.high, bars.low
+    price = APPLIED_PRICES[p.applied_price](bars)
+    e = np.stack([ema(price, period) for period in p.periods])
+    rsi = wilder_rsi(close, 14)
+    computed = np.arange(n) >= p.periods[4] + 10
+
+    # Strength and phase: EMA pairs in order, and the close against EMA5.
+    bull_pairs = (e[:-1] > e[1:]).sum(axis=0)
+    bear_pairs = (e[:-1] < e[1:]).sum(axis=0)
+    above, below = close > e[4], close < e[4]
+    bull, bear = bull_pairs + above, bear_pairs + below
+    strength = np.where(bear > bull, -bear, bull)
+    phase = np.select(
+        [(bull_pairs == 4) & above, (bear_pairs == 4) & below, bull_pairs >= 3, bear_pairs >= 3],
+        [2, -2, 1, -1],
+        0,
+    )
+    valid = (e > 0).all(axis=0) & computed
+    strength = np.where(valid, strength, 0)
+    phase = np.where(valid & (close > 0), phase, 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        range_pct = np.abs(e[0] - e[4]) / close * 100.0
+    bounds = [p.conf_range_max, p.conf_range_high, p.conf_range_med, p.conf_range_low]
+    confluence = np.select([range_pct < b for b in bounds], [100.0, 75.0, 50.0, 25.0], 10.0)
+    confluence = np.where(computed & (close > 0), confluence, 0.0)
+    conf_ok = (confluence >= p.confluence_threshold) | (not p.require_confluence)
+
+    signal = np.where((strength >= p.min_strength) & conf_ok, np.sign(phase) * strength, 0)
+    signal = np.where(computed, signal, 0)
+
+    # STRATEGY 1: crossover of the primary pair with a body break.
+    min_strength = p.min_strength
+    if p.signal_mode == MODE_CONSERVATIVE and min_strength < 4:
+        min_strength = 4
+    elif p.signal_mode == MODE_AGGRESSIVE and min_strength > 2:
+        min_strength = 2
+    heavy = sum(p.periods) / 5.0 > 40.0
+    cross_req = 1 if heavy and p.signal_mode != MODE_CONSERVATIVE else min_strength
+
+    fi, si = _pair(p.primary_cross, p.custom_cross)
+    fc, sc = e[fi], e[si]
+    fp, sp = _shift(fc, 1), _shift(sc, 1)
+    fp2, sp2 = _shift(fc, 2), _shift(sc, 2)
+    fp3, sp3 = _shift(fc, 3), _shift(sc, 3)
+    o1, c1 = _shift(open_, 1), _shift(close, 1)
+    o2, c2 = _shift(open_, 2), _shift(close, 2)
+    tol = p.point * (p.periods[si] / 10.0) * (0.5 if p.signal_mode == MODE_CONSERVATIVE else 1.0)
+
+    bull_now = (fp <= sp) & (fc > sc)
+    bull_prev = (fp2 <= sp2) & (fp > sp)
+    bull_prev2 = (fp3 <= sp3) & (fp2 > sp2)
+    # Ignore a late cross already signalled on the bar(s) before.
+    bb1 = (c1 > o1) & (c1 > fp)
+    bb2 = (c2 > o2) & (c2 > fp2)
+    ignore = (bull_prev & ~bull_now & bb1) | (bull_prev2 & ~bull_prev & ~bull_now & (bb1 | bb2))
+    buy_cross = (
+        (bull_now | bull_prev | bull_prev2)
+        & ~ignore
+        & (strength >= cross_req)
+        & conf_ok
+        & (sc >= sp - tol)
+        & (close > open_)
+        & (close > fc)
+    )
+
+    bear_now = (fp >= sp) & (fc < sc)
+    bear_prev = (fp2 >= sp2) & (fp < sp)
+    bear_prev2 = (fp3 >= sp3) & (fp2 < sp2)
+    bb1 = (c1 < o1) & (c1 < fp)
+    bb2 = (c2 < o2) & (c2 < fp2)
+    ignore = (bear_prev & ~bear_now & bb1) | (bear_prev2 & ~bear_prev & ~bear_now & (bb1 | bb2))
+    sell_cross = (
+        (bear_now | bear_prev | bear_prev2)
+        & ~ignore
+        & (np.abs(strength) >= cross_req)
+        & conf_ok
+        & (sc <= sp + tol)
+        & (close < open_)
+        & (close < fc)
+    )
+    sell_cross &= ~buy_cross
+
+    # STRATEGY 2: pullbacks, only where no cross fired.
+    buy_pb = np.zeros(n, dtype=bool)
+    sell_pb = np.zeros(n, dtype=bool)
+    if p.enable_pullbacks:
+        quiet = np.ones(n, dtype=bool)
+        vol = bars.volume if tick_volume is None else np.asarray(tick_volume, dtype=np.float64)
+        if p.pullback_use_vol and vol is not None:
+            vol_avg = sma(vol, p.vol_ma_period)
+            vol_avg[: p.vol_ma_period] = 0.0
+            quiet = ~((vol_avg > 0) & (vol > vol_avg * p.pullback_vol_fact))
+        use_rsi = p.pullback_use_rsi
+
+        shallow, medium, deep = low <= fc, low <= e[2], low <= sc
+        rsi_bad = use_rsi & ((shallow & ~medium & (rsi < 40)) | (medium & (rsi < p.pullback_rsi_low)))
+        buy_pb = (close > e[4]) & (shallow | medium | deep) & ~rsi_bad & (close > open_) & conf_ok
+
+        shallow, medium, deep = high >= fc, high >= e[2], high >= sc
+        rsi_bad = use_rsi & ((shallow & ~medium & (rsi > 60)) | (medium & (rsi > p.pullback_rsi_high)))
+        sell_pb = (close < e[4]) & (shallow | medium | deep) & ~rsi_bad & (close < open_) & conf_ok
+
+        no_cross = ~(buy_cross | sell_cross) & quiet
+        buy_pb &= no_cross
+        sell_pb &= no_cross
+
+    entry = buy_cross.astype(np.int64) - sell_cross + buy_pb - sell_pb
+    entry = np.where(computed, entry, 0)
+    kind = np.where(buy_cross | sell_cross, KIND_CROSS, np.where(buy_pb | sell_pb, KIND_PULLBACK, 0))
+    kind = np.where(entry != 0, kind, 0)
+
+    f2, s2 = _pair(p.secondary_cross, p.custom_cross)
+    return FgmResult(
+        ema=e,
+        strength=strength.astype(np.int64),
+        phase=phase.astype(np.int64),
+        confluence=confluence,
+        signal=signal.astype(np.int64),
+        entry=entry,
+        kind=kind,
+        primary_cross=_crosses(fc, sc),
+        secondary_cross=_crosses(e[f2], e[s2]),
+        rsi=rsi,
+        computed=computed,
+    )
+
+
+def fgm_signals(bars: Bars, out: FgmResult) -> EventTable:
+    """FgmSignal table of the bars with an entry."""
+    at = np.flatnonzero(out.entry)
+    return EventTable.from_columns(
+        FgmSignal,
+        ts=bars.ts[at],
+        entry=out.entry[at],
+        strength=out.strength[at],
+        confluence=out.confluence[at],
+        phase=out.phase[at],
+        kind=np.where(out.kind[at] == KIND_CROSS, "cross", "pullback").tolist(),
+    )
+
+
+def match_log_signals(bars: Bars, out: FgmResult, log_signals: EventTable) -> EventTable:
+    """SignalCheck of every log "Sinal detectado!" line (log_events Signal table) against the port.
+
+    A line logged at tick time t with Bar=k refers to the bar k bars before
+    the one holding t. Lines outside the bar history are left out.
+    """
+    ts = np.asarray(log_signals["ts"], dtype=np.int64)
+    at = np.searchsorted(bars.ts, ts, side="right") - 1 - np.asarray(log_signals["bar"], dtype=np.int64)
+    inside = (at >= 0) & (ts < bars.ts[-1] + 2 * _bar_seconds(bars)) if len(bars) else np.zeros(len(ts), dtype=bool)
+    at, sel = at[inside], np.flatnonzero(inside)
+    entry_log = np.asarray(log_signals["entry"], dtype=np.int64)[sel]
+    strength_log = np.asarray(log_signals["strength"], dtype=np.int64)[sel]
+    conf_log = np.asarray(log_signals["confluence"], dtype=np.float64)[sel]
+    entry, strength, conf = out.entry[at], out.strength[at], out.confluence[at]
+    return EventTable.from_columns(
+        SignalCheck,
+        ts=ts[sel],
+        bar_ts=bars.ts[at],
+        entry_log=entry_log,
+        entry_calc=entry,
+        strength_log=strength_log,
+        strength_calc=strength,
+        confluence_log=conf_log,
+        confluence_calc=conf,
+        match=(entry == entry_log) & (strength == strength_log) & np.isclose(conf, conf_log),
+    )
+
+
+def _bar_seconds(bars: Bars) -> int:
+    return int(np.median(np.diff(bars.ts))) if len(bars) > 1 else 60
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Sinais do FGM_Indicator calculados sobre o histórico de barras")
+    ap.add_argument("bars", help="CSV de barras exportado do MT5")
+    ap.add_argument("--log", help="log do MT5 para comparar com as linhas 'Sinal detectado!'")
+    ap.add_argument("--indicator-defaults", action="store_true", help="inputs padrão do indicador em vez dos do EA")
+    args = ap.parse_args()
+
+    bars = load_bars(args.bars)
+    params = FgmParams() if args.indicator_defaults else EA_PARAMS
+    out = fgm(bars, params)
+    sig = fgm_signals(bars, out)
+    kinds = sig["kind"]
+    print(f"Barras: {len(bars)} | Sinais: {len(sig)} (BUY {int((sig['entry'] > 0).sum())}, SELL {int((sig['entry'] < 0).sum())})")
+    print(f"  Cruzamento: {int((kinds == 'cross').sum())} | Pullback: {int((kinds == 'pullback').sum())}")
+
+    if args.log:
+        from event_cache import load_event_tables
+
+        check = match_log_signals(bars, out, load_event_tables(Path(args.log))["signals"])
+        if not check:
+            print("Nenhuma linha 'Sinal detectado!' dentro do histórico de barras")
+            return 0
+        agree = check["entry_calc"] == check["entry_log"]
+        print(f"\nLinhas do log no histórico: {len(check)}")
+        print(f"  Entry igual: {agree.mean() * 100:.1f}% | Entry+Strength+Confluence iguais: {check['match'].mean() * 100:.1f}%")
+        for row in check.where(~check["match"]).tolist()[:10]:
+            print(
+                f"  {row.bar_ts:%Y.%m.%d %H:%M} log Entry={row.entry_log} Strength={row.strength_log} "
+                f"Conf={row.confluence_log:.1f}% | calc Entry={row.entry_calc} Strength={row.strength_calc} "
+                f"Conf={row.confluence_calc:.1f}%"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
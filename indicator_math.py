@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""Moving averages of MT5 indicators over whole price arrays, vectorized with numpy.
+
+The Python ports of the EA's indicators (fgm_indicator, ...) need MT5's
+EMA, SMA and Wilder RSI over millions of bars. An EMA is a first-order
+recursion, y[t] = decay * y[t - 1] + u[t], which numpy has no ufunc for.
+`linear_filter()` runs it in blocks instead: inside a block of B bars,
+
+    y[j] = decay**j * cumsum(u[k] * decay**-k)[j]
+
+is one cumsum over a (blocks, B) array, with B small enough that
+decay**-B stays finite. Only the carry from one block into the next is a
+Python loop, one step per block (a few thousand for ten years of M1 bars).
+`LinearFilter` is the same computation one value at a time, with the same
+blocks and the same floating-point operations, so a series fed bar by bar
+gives exactly the array `linear_filter()` gives.
+
+The seeds follow MT5's built-in indicators:
+
+- `ema()`: first value = first price, then price * 2 / (n + 1) + previous
+  * (1 - 2 / (n + 1)) (iMA MODE_EMA);
+- `sma()`: mean of the last n prices, NaN before n prices (iMA MODE_SMA);
+- `running_sma()` / `RunningSma`: SimpleMAOnBuffer() of MovingAverages.mqh,
+  the sum of the first n prices over n and then previous + (price - price
+  n bars back) / n, 0 before that (what custom indicators use on their
+  own buffers);
+- `wilder_rsi()`: average gain / loss of the first n price changes, then
+  Wilder smoothing; 0 before that, 50 when both averages are 0 and 100
+  when only the loss is (iRSI);
+- `moving_average()`: iMA applied to another indicator's buffer from its
+  first drawn bar, MODE_SMA / EMA / SMMA / LWMA.
+"""
+
+from __future__ import annotations
+
+import math
+from collections import deque
+from typing import Any
+
+import numpy as np
+
+
+# Largest decay**-B a block may reach (float64 tops out near 1e308), and
+# the longest block (bounds the padding of short series).
+_MAX_SCALE_LOG10 = 250.0
+_MAX_BLOCK = 4096
+
+
+def _block_factors(decay: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """decay**j, decay**-j and decay**(j + 1) over one block (j = 0 .. B - 1)."""
+    block = int(min(_MAX_BLOCK, max(1, _MAX_SCALE_LOG10 // -math.log10(decay))))
+    j = np.arange(block)
+    return decay**j, decay ** -j.astype(np.float64), decay ** (j + 1)
+
+
+def linear_filter(u: Any, decay: float) -> np.ndarray:
+    """y[t] = decay * y[t - 1] + u[t] with y[-1] = 0, for 0 <= decay < 1."""
+    u = np.asarray(u, dtype=np.float64)
+    n = len(u)
+    if n == 0 or decay == 0.0:
+        return u.copy()
+    up, down, tail = _block_factors(decay)
+    block = len(up)
+    nb = -(-n // block)
+    padded = np.zeros(nb * block)
+    padded[:n] = u
+    local = np.cumsum(padded.reshape(nb, block) * down, axis=1) * up
+
+    # Value at the end of each block, carried into the next one.
+    carry = 0.0
+    carries = np.empty(nb)
+    for b, end in enumerate(local[:, -1].tolist()):
+        carries[b] = carry
+        carry = end + carry * tail[-1]
+    return (local + carries[:, None] * tail).ravel()[:n]
+
+
+class LinearFilter:
+    """linear_filter() fed one value at a time (same result, bit for bit)."""
+
+    def __init__(self, decay: float):
+        self.decay = decay
+        self._up, self._down, self._tail = (f.tolist() for f in _block_factors(decay)) if decay else ([], [], [])
+        self._j = 0
+        self._sum = 0.0
+        self._carry = 0.0
+
+    def update(self, u: float) -> float:
+        if not self.decay:
+            return u
+        j = self._j
+        self._sum += u * self._down[j]
+        local = self._sum * self._up[j]
+        y = local + self._carry * self._tail[j]
+        if j + 1 == len(self._up):
+            self._carry = local + self._carry * self._tail[-1]
+            self._sum, self._j = 0.0, 0
+        else:
+            self._j = j + 1
+        return y
+
+
+def ema(price: Any, period: int) -> np.ndarray:
+    """MT5 exponential moving average (seeded with the first price)."""
+    x = np.asarray(price, dtype=np.float64)
+    if not len(x):
+        return x.copy()
+    alpha = 2.0 / (period + 1.0)
+    u = x * alpha
+    u[0] = x[0]
+    return linear_filter(u, 1.0 - alpha)
+
+
+def sma(price: Any, period: int) -> np.ndarray:
+    """Simple moving average of the last `period` prices (NaN before that)."""
+    x = np.asarray(price, dtype=np.float64)
+    return window_mean(np.concatenate(([0.0], np.cumsum(x))), period)
+
+
+def window_mean(prefix: np.ndarray, period: int) -> np.ndarray:
+    """sma() from the prefix sums [0, x0, x0 + x1, ...], to share them between periods."""
+    out = np.full(len(prefix) - 1, np.nan)
+    if period < 1 or len(out) < period:
+        return out
+    out[period - 1 :] = (prefix[period:] - prefix[:-period]) / period
+    return out
+
+
+def price_changes(price: Any) -> tuple[np.ndarray, np.ndarray]:
+    """Gains and losses (both >= 0) of consecutive prices."""
+    d = np.diff(np.asarray(price, dtype=np.float64))
+    return np.maximum(d, 0.0), np.maximum(-d, 0.0)
+
+
+def wilder_rsi(price: Any, period: int = 14) -> np.ndarray:
+    """MT5 RSI: Wilder-smoothed average gain over average loss."""
+    x = np.asarray(price, dtype=np.float64)
+    if not len(x):
+        return np.zeros(0)
+    return rsi_from_changes(*price_changes(x), period)
+
+
+def rsi_from_changes(gains: np.ndarray, losses: np.ndarray, period: int) -> np.ndarray:
+    """wilder_rsi() from price_changes(), to share them between periods."""
+    n = len(gains) + 1
+    rsi = np.zeros(n)
+    if n <= period:
+        return rsi
+
+    def smooth(v):
+        # From bar `period` on: SMA of the first `period` changes, then Wilder.
+        u = v[period - 1 :] / period
+        u[0] = v[:period].mean()
+        return linear_filter(u, (period - 1.0) / period)
+
+    pos, neg = smooth(gains), smooth(losses)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = np.where(neg != 0.0, 100.0 - 100.0 / (1.0 + pos / neg), np.where(pos != 0.0, 100.0, 50.0))
+    rsi[period:] = value
+    return rsi
+
+
+MA_METHODS = ("sma", "ema", "smma", "lwma")  # ENUM_MA_METHOD order
+
+
+def moving_average(values: Any, period: int, method: str = "sma", begin: int = 0) -> np.ndarray:
+    """MT5 iMA of a buffer whose first value is at `begin` (NaN where not drawn).
+
+    SMA, SMMA and LWMA start `period` values after `begin` (SMMA from their
+    SMA, then (previous x (n - 1) + value) / n); EMA starts at `begin` with
+    the value itself.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    src = x[begin:]
+    if period < 1 or not len(src):
+        return out
+    if method == "ema":
+        out[begin:] = ema(src, period)
+    elif len(src) < period:
+        return out
+    elif method == "sma":
+        out[begin:] = sma(src, period)
+    elif method == "smma":
+        u = src[period - 1 :] / period
+        u[0] = src[:period].mean()
+        out[begin + period - 1 :] = linear_filter(u, (period - 1.0) / period)
+    elif method == "lwma":
+        w = np.arange(1.0, period + 1.0)
+        windows = np.lib.stride_tricks.sliding_window_view(src, period)
+        out[begin + period - 1 :] = windows @ (w / w.sum())
+    else:
+        raise ValueError(f"unknown MA method {method!r}")
+    return out
+
+
+def running_sma(price: Any, period: int) -> np.ndarray:
+    """MT5 SimpleMAOnBuffer(): 0 before `period` prices, all 0 when period <= 1."""
+    x = np.asarray(price, dtype=np.float64)
+    out = np.zeros(len(x))
+    if period <= 1 or len(x) < period:
+        return out
+    first = 0.0
+    for v in x[:period].tolist():
+        first += v
+    steps = (x[period:] - x[:-period]) / period
+    out[period - 1 :] = np.cumsum(np.concatenate(([first / period], steps)))
+    return out
+
+
+class RunningSma:
+    """running_sma() fed one price at a time (same result, bit for bit)."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self._window: deque[float] = deque()
+        self._value = 0.0
+
+    def update(self, price: float) -> float:
+        p = self.period
+        if p <= 1:
+            return 0.0
+        window = self._window
+        window.append(price)
+        if len(window) > p:
+            self._value = self._value + (price - window.popleft()) / p
+        elif len(window) == p:
+            first = 0.0
+            for v in window:
+                first += v
+            self._value = first / p
+        return self._value
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""Canonical events of the FGM TrendRider EA log (stdlib-only).
+
+Every analyzer used to carry its own copy of the same regexes. This module is
+the single parser for the EA's structured lines:
+- "Sinal detectado! Bar=..., Entry=..., Strength=..., Confluence=...%"
+- "FILTRO BLOQUEOU: ..."
+- "[OBV MACD DEBUG] Bar1: Hist=... | Bar2: Hist=... | Color=... | Threshold=..."
+- "BAD ENTRY #n/m today | Profit=... | Close=... | Dir=... | ..."
+- "[INFO] TRADE: BUY @ ... | Vol: ... | SL: ... | TP: ..."
+- "[INFO] TRADE CLOSED: WIN|LOSS | Profit: ... | Razão: ..."
+- "RSIOMA ESTADO: APROVADO (...)", "RSIOMA STATUS: REPROVADO [...]" and
+  "RSIOMA FILTRO: BUY|SELL bloqueado - RSI(...)"
+
+plus the tester's "initial deposit" line (`parse_initial_deposit()`).
+
+Each event carries `seq`, its position among all parsed events of the log,
+so consumers can merge event types back into file order (e.g. a BAD ENTRY is
+logged right before the TRADE CLOSED it describes, with the same timestamp).
+
+Lines are not run through a cascade of regexes: `split_line()` splits the
+MT5 prefix once and `dispatch()` picks a small per-event parser from a dict
+keyed by the message's leading literal. Analyzers with their own event types
+(e.g. analyze_strategy_definitive) use the same `dispatch()` with their own
+parsers.
+
+The analyzers map these events onto their own record types; `event_cache`
+stores them on disk so a log is parsed only once.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Mapping, NamedTuple, TypeVar
+
+from log_time import parse_ts
+
+
+# Bump whenever a pattern or an event field changes: it is part of the
+# event_cache key, so stale caches are rebuilt.
+PARSER_VERSION = 3
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class Signal:
+    seq: int
+    ts: datetime
+    bar: int
+    entry: int  # 1=BUY, -1=SELL
+    strength: int
+    confluence: float
+
+
+@dataclass(frozen=True)
+class FilterBlock:
+    seq: int
+    ts: datetime
+    details: str
+
+
+@dataclass(frozen=True)
+class ObvDebug:
+    seq: int
+    ts: datetime
+    hist1: float
+    hist2: float
+    color: int
+    threshold: float
+
+
+@dataclass(frozen=True)
+class TradeOpen:
+    seq: int
+    ts: datetime
+    side: str  # BUY/SELL
+    price: float
+    volume: float
+    sl: float
+    tp: float
+
+
+@dataclass(frozen=True)
+class TradeClose:
+    seq: int
+    ts: datetime
+    outcome: str  # WIN/LOSS
+    profit: float
+    reason: str
+
+
+@dataclass(frozen=True)
+class BadEntry:
+    seq: int
+    ts: datetime
+    profit: float
+    close_reason: str
+    direction: str
+    regime: str
+    strength: int
+    confluence: float
+    sl_pts: float
+    risk_pct: float
+    spread: float
+    slope: float
+    volume: int
+    phase: int
+    ema200_ok: bool
+    rsi: float
+    rsi_ma: float
+    obv: int
+
+
+@dataclass(frozen=True)
+class RsiomaCheck:
+    seq: int
+    ts: datetime
+    approved: bool
+    side: str  # BUY/SELL
+    rsi: float  # NaN when the line does not log it
+    ma: float
+
+
+@dataclass
+class LogEvents:
+    signals: list[Signal] = field(default_factory=list)
+    filter_blocks: list[FilterBlock] = field(default_factory=list)
+    obv_debug: list[ObvDebug] = field(default_factory=list)
+    opens: list[TradeOpen] = field(default_factory=list)
+    closes: list[TradeClose] = field(default_factory=list)
+    bad_entries: list[BadEntry] = field(default_factory=list)
+    rsioma: list[RsiomaCheck] = field(default_factory=list)
+
+
+# (attribute of LogEvents, event type) in a fixed order; event_cache relies on it.
+EVENT_TABLES: tuple[tuple[str, type], ...] = (
+    ("signals", Signal),
+    ("filter_blocks", FilterBlock),
+    ("obv_debug", ObvDebug),
+    ("opens", TradeOpen),
+    ("closes", TradeClose),
+    ("bad_entries", BadEntry),
+    ("rsioma", RsiomaCheck),
+)
+
+
+class LogLine(NamedTuple):
+    """A tester log line split into its parts by `split_line()`."""
+
+    ts: str  # tester time, "YYYY.MM.DD HH:MM:SS"
+    level: str  # "INFO"/"DEBUG"/"ERROR" for CStats lines, "" for plain Print()
+    msg: str
+
+
+def _split(line: str) -> tuple[str, str, str] | None:
+    parts = line.split("\t", 4)
+    if len(parts) < 5:
+        return None
+    rest = parts[4]
+    if len(rest) < 19 or rest[4] != "." or rest[10] != " ":
+        return None
+    body = rest[19:].lstrip(" ")
+    if body[:1] == "[" and body[9:12] == "] [":
+        end = body.find("] ", 12)
+        if end > 0:
+            return rest[:19], body[12:end], body[end + 2 :]
+    return rest[:19], "", body
+
+
+def split_line(line: str) -> LogLine | None:
+    """Split "<agent>\\t<n>\\t<clock>\\t<core>\\t<ts>   [HH:MM:SS] [LEVEL] <msg>" once.
+
+    The "[HH:MM:SS] [LEVEL] " part is only present on lines written through
+    CStats (LogNormal/LogDebug/...); plain Print() lines go straight to the
+    message. Returns None for lines without a tester timestamp.
+    """
+    parts = _split(line)
+    return None if parts is None else LogLine._make(parts)
+
+
+def message_key(msg: str) -> str:
+    """Leading literal of a message (its first word), used for dispatch."""
+    return msg.partition(" ")[0]
+
+
+def dispatch(lines: Iterable[str], parsers: Mapping[str, Callable[[LogLine], T | None]]) -> Iterator[tuple[LogLine, T]]:
+    """Yield (line, parsed) for each line whose message a parser recognizes.
+
+    `parsers` maps a message's leading literal (see `message_key()`) to a small
+    parser that returns None when the message is not the event it handles.
+    Each line is split once and costs one dict lookup; a LogLine is only
+    built, and a regex only run, for lines with a registered leading literal.
+    """
+    get = parsers.get
+    new = tuple.__new__
+    for line in lines:
+        parts = _split(line)
+        if parts is None:
+            continue
+        parse = get(parts[2].partition(" ")[0])
+        if parse is not None:
+            rec = new(LogLine, parts)
+            hit = parse(rec)
+            if hit is not None:
+                yield rec, hit
+
+
+SIGNAL_RE = re.compile(
+    r"Sinal detectado!.*Bar=(?P<bar>\d+),\s+Entry=(?P<entry>-?\d+),\s+Strength=(?P<strength>-?\d+),\s+Confluence=(?P<conf>[0-9.]+)%"
+)
+FILTER_BLOCK_RE = re.compile(r"FILTRO BLOQUEOU:\s+(?P<details>.+)")
+OBV_DEBUG_RE = re.compile(
+    r"\[OBV MACD DEBUG\].*Bar1:\s+Hist=(?P<hist1>[0-9.-]+).*Bar2:\s+Hist=(?P<hist2>[0-9.-]+).*Color=(?P<color>\d+).*Threshold=(?P<threshold>[0-9.-]+)"
+)
+BAD_ENTRY_RE = re.compile(
+    r"BAD ENTRY.*Profit=(?P<profit>-?[0-9.]+).*Close=(?P<close>[^|]+)\|.*Dir=(?P<dir>\w+).*Regime=(?P<regime>[^|]+)\|.*F=(?P<strength>\d+).*Conf=(?P<conf>[0-9.]+)%.*SLpts=(?P<sl_pts>[0-9.]+).*Risk=(?P<risk>[0-9.]+)%.*Spread=(?P<spread>[0-9.]+).*Slope=(?P<slope>-?[0-9.]+).*Vol=(?P<vol>\d+)/.*Phase=(?P<phase>-?\d+)(?:.*EMA200=(?P<ema200>\w+))?.*RSI=(?P<rsi>[0-9.]+)/MA(?P<rsi_ma>[0-9.]+).*OBV=(?P<obv>\d+)"
+)
+OPEN_RE = re.compile(
+    r"TRADE:\s+(?P<side>BUY|SELL)\s+@\s+(?P<price>[0-9.]+).*Vol:\s+(?P<vol>[0-9.]+).*SL:\s+(?P<sl>[0-9.]+).*TP:\s+(?P<tp>[0-9.]+)"
+)
+CLOSE_RE = re.compile(
+    r"TRADE CLOSED:\s+(?P<outcome>WIN|LOSS).*Profit:\s+(?P<profit>-?[0-9.]+).*Raz[aã]o:\s+(?P<reason>.+)"
+)
+# CFilters::CheckRSIOMA; "Vermelha" is the RSI line, "Azul" its MA.
+RSIOMA_APPROVED_RE = re.compile(
+    r"RSIOMA ESTADO: APROVADO \((?:Vermelha )?(?P<rsi>[0-9.]+) (?P<op>[<>]) (?:Azul )?(?P<ma>[0-9.]+)\)"
+)
+RSIOMA_REJECTED_RE = re.compile(
+    r"RSIOMA STATUS: REPROVADO \[(?P<side>BUY|SELL)\]\.\s+(?P<first>Azul|Vermelha) \((?P<a>[0-9.]+)\) >= \w+ \((?P<b>[0-9.]+)\)"
+)
+RSIOMA_BLOCKED_RE = re.compile(r"RSIOMA FILTRO: (?P<side>BUY|SELL) bloqueado - RSI\((?P<rsi>[0-9.]+)\)")
+
+# Every event message contains one of these literals; callers can prefilter
+# with LogSource(path).marked_lines(EVENT_MARKERS).
+EVENT_MARKERS = (
+    "Sinal detectado!",
+    "FILTRO BLOQUEOU:",
+    "[OBV MACD DEBUG]",
+    "BAD ENTRY",
+    "TRADE:",
+    "TRADE CLOSED:",
+    "RSIOMA ESTADO:",
+    "RSIOMA STATUS:",
+    "RSIOMA FILTRO:",
+)
+
+# The tester (not the EA) writes "initial deposit 10000.00 USD, leverage
+# 1:100" once, near the top; LogSource.marked_lines((DEPOSIT_MARKER,)) finds
+# it without decoding the other lines.
+DEPOSIT_MARKER = "initial deposit"
+DEPOSIT_RE = re.compile(r"initial deposit\s+(?P<amount>\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+def parse_initial_deposit(lines: Iterable[str]) -> float | None:
+    """Amount of the first "initial deposit" line among `lines`, or None."""
+    for line in lines:
+        m = DEPOSIT_RE.search(line)
+        if m:
+            return float(m["amount"])
+    return None
+
+
+# The parsers below match the message (anchored) and return the event's
+# fields after (seq, ts).
+
+def _signal(rec: LogLine) -> tuple | None:
+    m = SIGNAL_RE.match(rec.msg)
+    if m is None:
+        return None
+    return int(m["bar"]), int(m["entry"]), int(m["strength"]), float(m["conf"])
+
+
+def _filter_block(rec: LogLine) -> tuple | None:
+    m = FILTER_BLOCK_RE.match(rec.msg)
+    return None if m is None else (m["details"],)
+
+
+def _obv_debug(rec: LogLine) -> tuple | None:
+    m = OBV_DEBUG_RE.match(rec.msg)
+    if m is None:
+        return None
+    return float(m["hist1"]), float(m["hist2"]), int(m["color"]), float(m["threshold"])
+
+
+def _bad_entry(rec: LogLine) -> tuple | None:
+    m = BAD_ENTRY_RE.match(rec.msg)
+    if m is None:
+        return None
+    return (
+        float(m["profit"]),
+        m["close"].strip(),
+        m["dir"],
+        m["regime"].strip(),
+        int(m["strength"]),
+        float(m["conf"]),
+        float(m["sl_pts"]),
+        float(m["risk"]),
+        float(m["spread"]),
+        float(m["slope"]),
+        int(m["vol"]),
+        int(m["phase"]),
+        # Older EA builds did not log EMA200; treat it as passed.
+        m["ema200"] in (None, "OK"),
+        float(m["rsi"]),
+        float(m["rsi_ma"]),
+        int(m["obv"]),
+    )
+
+
+def _open(rec: LogLine) -> tuple | None:
+    m = OPEN_RE.match(rec.msg)
+    if m is None:
+        return None
+    return m["side"], float(m["price"]), float(m["vol"]), float(m["sl"]), float(m["tp"])
+
+
+def _close(rec: LogLine) -> tuple | None:
+    m = CLOSE_RE.match(rec.msg)
+    if m is None:
+        return None
+    return m["outcome"], float(m["profit"]), m["reason"].strip()
+
+
+def _rsioma(rec: LogLine) -> tuple | None:
+    msg = rec.msg
+    if (m := RSIOMA_APPROVED_RE.match(msg)) is not None:
+        # BUY needs RSI > MA, SELL RSI < MA
+        return True, "BUY" if m["op"] == ">" else "SELL", float(m["rsi"]), float(m["ma"])
+    if (m := RSIOMA_REJECTED_RE.match(msg)) is not None:
+        a, b = float(m["a"]), float(m["b"])
+        rsi, ma = (b, a) if m["first"] == "Azul" else (a, b)
+        return False, m["side"], rsi, ma
+    if (m := RSIOMA_BLOCKED_RE.match(msg)) is not None:
+        return False, m["side"], float(m["rsi"]), float("nan")
+    return None
+
+
+def _event_parser(attr: str, cls: type, parse: Callable[[LogLine], tuple | None]):
+    def parse_event(rec: LogLine) -> tuple[str, type, tuple] | None:
+        values = parse(rec)
+        return None if values is None else (attr, cls, values)
+
+    return parse_event
+
+
+# leading literal -> parser yielding (LogEvents attribute, event type, fields)
+_EVENT_PARSERS = {
+    "Sinal": _event_parser("signals", Signal, _signal),
+    "FILTRO": _event_parser("filter_blocks", FilterBlock, _filter_block),
+    "[OBV": _event_parser("obv_debug", ObvDebug, _obv_debug),
+    "BAD": _event_parser("bad_entries", BadEntry, _bad_entry),
+    "TRADE:": _event_parser("opens", TradeOpen, _open),
+    "TRADE": _event_parser("closes", TradeClose, _close),
+    "RSIOMA": _event_parser("rsioma", RsiomaCheck, _rsioma),
+}
+
+
+def parse_log_events(lines: Iterable[str]) -> LogEvents:
+    """Parse every EA event of a log in a single pass over its lines."""
+    ev = LogEvents()
+    seq = 0
+
+    for rec, (attr, cls, values) in dispatch(lines, _EVENT_PARSERS):
+        getattr(ev, attr).append(cls(seq, parse_ts(rec.ts), *values))
+        seq += 1
+
+    return ev
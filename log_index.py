@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Sidecar day index of a tester log, for random access (stdlib-only).
+
+Questions like "what happened after 2023.01.26" used to scan and
+timestamp-parse every line of a multi-year log. The index records, for each
+simulated day, the byte range of its lines and how many events of each kind
+it holds:
+
+    signal, open, close, filter_block, bad_entry, risk
+
+It is built once, while a log is read for the first time, and stored in
+`.event_cache/<log name>.idx` (JSON) next to the event cache. Later queries
+for a date range or an event kind seek straight to the matching days
+through `LogSource.range_lines()`.
+
+A day is a run of consecutive lines with the same tester date; lines without
+a timestamp belong to the day before them. If a log holds several test
+passes, a day can appear again later and then has several spans.
+
+The index is keyed like the event cache (path, size, mtime, hash of head and
+tail), so a rewritten or grown log is simply re-indexed. Compressed logs have
+no usable byte offsets: they are streamed and filtered day by day instead.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from event_cache import CACHE_DIR_NAME, log_key
+from log_events import split_line
+from log_source import LogSource
+
+
+# Bump whenever the kinds or the span rules change.
+INDEX_VERSION = 1
+
+KINDS = ("signal", "open", "close", "filter_block", "bad_entry", "risk")
+
+# message leading literal -> ((message prefix, kind), ...)
+_KIND_PREFIXES = {
+    "Sinal": (("Sinal detectado!", "signal"),),
+    "TRADE:": (("TRADE:", "open"),),
+    "TRADE": (("TRADE CLOSED:", "close"),),
+    "Posição": (("Posição fechada", "close"),),  # older EA builds
+    "FILTRO": (("FILTRO BLOQUEOU:", "filter_block"),),
+    "BAD": (("BAD ENTRY", "bad_entry"),),
+    "CRiskManager:": (("CRiskManager:", "risk"),),
+    "Proteção": (("Proteção diária", "risk"),),
+}
+
+
+def line_kind(msg: str) -> str | None:
+    """Event kind of a log message (see KINDS), or None."""
+    for prefix, kind in _KIND_PREFIXES.get(msg.partition(" ")[0], ()):
+        if msg.startswith(prefix):
+            return kind
+    return None
+
+
+@dataclass(frozen=True)
+class DaySpan:
+    day: str  # "YYYY.MM.DD"
+    start: int  # byte offset of the day's first line
+    end: int  # byte offset just past its last line
+    counts: dict[str, int] = field(default_factory=dict)
+
+
+def _wanted(span: DaySpan, first_day: str | None, last_day: str | None, kinds: tuple[str, ...] | None) -> bool:
+    return (
+        (first_day is None or span.day >= first_day)
+        and (last_day is None or span.day <= last_day)
+        and (kinds is None or any(span.counts.get(k) for k in kinds))
+    )
+
+
+@dataclass
+class LogIndex:
+    key: dict
+    spans: list[DaySpan]
+
+    def select(
+        self, first_day: str | None = None, last_day: str | None = None, kinds: Iterable[str] | None = None
+    ) -> list[DaySpan]:
+        """Spans of the days in [first_day, last_day] holding any of `kinds` (all if None)."""
+        kinds = None if kinds is None else tuple(kinds)
+        return [s for s in self.spans if _wanted(s, first_day, last_day, kinds)]
+
+    def byte_ranges(
+        self, first_day: str | None = None, last_day: str | None = None, kinds: Iterable[str] | None = None
+    ) -> list[tuple[int, int]]:
+        """[start, end) byte ranges of `select()`, adjacent spans merged."""
+        ranges: list[tuple[int, int]] = []
+        for s in self.select(first_day, last_day, kinds):
+            if ranges and ranges[-1][1] == s.start:
+                ranges[-1] = (ranges[-1][0], s.end)
+            else:
+                ranges.append((s.start, s.end))
+        return ranges
+
+    def count(self, kind: str, first_day: str | None = None, last_day: str | None = None) -> int:
+        return sum(s.counts.get(kind, 0) for s in self.select(first_day, last_day))
+
+
+class _Builder:
+    """Accumulates day spans from (offset, line) pairs in file order."""
+
+    def __init__(self) -> None:
+        self.spans: list[DaySpan] = []
+        self._day: str | None = None
+        self._start = 0
+        self._counts: dict[str, int] = {}
+
+    def add(self, offset: int, line: str) -> str | None:
+        """Account for one line; returns the day it belongs to (None before the first timestamp)."""
+        rec = split_line(line)
+        if rec is not None:
+            day = rec.ts[:10]
+            if day != self._day:
+                self._close(offset)
+                self._day, self._start, self._counts = day, offset, {}
+            kind = line_kind(rec.msg)
+            if kind is not None:
+                self._counts[kind] = self._counts.get(kind, 0) + 1
+        return self._day
+
+    def _close(self, end: int) -> None:
+        if self._day is not None:
+            self.spans.append(DaySpan(self._day, self._start, end, self._counts))
+
+    def finish(self, end: int) -> list[DaySpan]:
+        self._close(end)
+        self._day = None
+        return self.spans
+
+
+def index_path(log_path: Path) -> Path:
+    log_path = Path(log_path)
+    return log_path.parent / CACHE_DIR_NAME / f"{log_path.name}.idx"
+
+
+def _index_key(src: LogSource) -> dict:
+    return {**log_key(src.path), "index_version": INDEX_VERSION}
+
+
+def save_index(src: LogSource, index: LogIndex) -> Path:
+    """Write `index` next to the log (atomically) and return its path."""
+    target = index_path(src.path)
+    target.parent.mkdir(exist_ok=True)
+    tmp = target.with_suffix(f".tmp{os.getpid()}")
+    data = {"key": index.key, "spans": [asdict(s) for s in index.spans]}
+    tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, target)
+    return target
+
+
+def _store(src: LogSource, index: LogIndex) -> None:
+    try:
+        save_index(src, index)
+    except OSError:  # read-only log directory: just don't cache
+        pass
+
+
+def load_index(src: LogSource) -> LogIndex | None:
+    """The stored index of a log, or None if missing, stale or unreadable."""
+    if src.compressed:
+        return None
+    try:
+        data = json.loads(index_path(src.path).read_text(encoding="utf-8"))
+        if data["key"] != _index_key(src):
+            return None
+        return LogIndex(data["key"], [DaySpan(**s) for s in data["spans"]])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def build_index(src: LogSource) -> LogIndex:
+    """Index a (plain) log in one pass and store the index."""
+    key = _index_key(src)
+    builder = _Builder()
+    for offset, line in src.offset_lines(end=key["size"]):
+        builder.add(offset, line)
+    index = LogIndex(key, builder.finish(key["size"]))
+    _store(src, index)
+    return index
+
+
+def get_index(src: LogSource) -> LogIndex:
+    """The stored index of a plain log, built first if needed."""
+    index = load_index(src)
+    return index if index is not None else build_index(src)
+
+
+def lines_between(
+    src: LogSource, first_day: str | None = None, last_day: str | None = None, kinds: Iterable[str] | None = None
+) -> Iterator[str]:
+    """Lines of the days in [first_day, last_day] holding any of `kinds` (all if None).
+
+    With a valid index only those days are read. Otherwise the whole log is
+    read once, the index is built on the way and each day's lines are passed
+    on when the day ends (only then are its counts known). Both paths yield
+    the same lines; lines before the first timestamp belong to no day.
+    """
+    kinds = None if kinds is None else tuple(kinds)
+    index = load_index(src)
+    if index is not None:
+        for start, end in index.byte_ranges(first_day, last_day, kinds):
+            yield from src.range_lines(start, end)
+        return
+
+    builder = _Builder()
+    if src.compressed:
+        # No byte offsets to index: filter each day as it streams by.
+        lines = enumerate(src.lines())
+        key = None
+    else:
+        key = _index_key(src)
+        lines = src.offset_lines(end=key["size"])
+
+    day_lines: list[str] = []
+    for offset, line in lines:
+        closed = len(builder.spans)
+        day = builder.add(offset, line)
+        if len(builder.spans) > closed:
+            if _wanted(builder.spans[-1], first_day, last_day, kinds):
+                yield from day_lines
+            day_lines = []
+        if day is not None:
+            day_lines.append(line)
+    spans = builder.finish(key["size"] if key else 0)
+    if spans and _wanted(spans[-1], first_day, last_day, kinds):
+        yield from day_lines
+
+    if key is not None:
+        _store(src, LogIndex(key, spans))
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""Single reader for MT5 Strategy Tester logs (stdlib-only).
+
+Tester logs are usually UTF-16LE with BOM (Windows/Wine), sometimes UTF-8 or
+latin-1 after a manual conversion. Multi-year logs are several GB, so the
+analyzers must never hold the whole file (or its decoded text) in memory,
+nor read it twice. Every analyzer opens its log through `LogSource`, which
+sniffs the encoding once from the first bytes instead of trying codecs one
+after another on the whole file.
+
+`LogSource.lines()` reads the file in fixed-size chunks, feeds them to an
+incremental decoder and yields one line at a time, so peak memory is
+O(chunk_size + longest line) regardless of the file size.
+
+`LogSource.marked_lines()` is the fast path for analyzers that only care
+about a few event types: it mmaps the log, searches the *encoded* marker
+literals at byte level and decodes only the lines that contain a hit. Nearly
+every line of a tester log is noise (risk-manager spam), so this skips most
+decoding and regex work.
+
+`LogSource.byte_ranges()` + `range_lines()` let one log be parsed by several
+processes: the file is cut into byte ranges that start right after a line
+break (on a code-unit boundary), and each range is decoded independently.
+
+Archived logs compressed with gzip, bzip2 or xz (`.log.gz`, `.log.bz2`,
+`.log.xz`) are recognized by their magic bytes and streamed through the
+stdlib decompressors, so `lines()` and `marked_lines()` accept them
+directly, with no temporary files. Byte offsets only make sense for plain
+files; callers check `LogSource.compressed` and fall back to streaming.
+"""
+
+from __future__ import annotations
+
+import bz2
+import codecs
+import gzip
+import lzma
+import mmap
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+
+DEFAULT_CHUNK_SIZE = 1 << 20  # 1 MiB per read()
+SNIFF_SIZE = 512  # bytes needed to tell UTF-16 from UTF-8
+
+
+# magic bytes -> opener returning a binary stream of the decompressed log
+_COMPRESSED_FORMATS = (
+    (b"\x1f\x8b", gzip.open),
+    (b"BZh", bz2.open),
+    (b"\xfd7zXZ\x00", lzma.open),
+)
+
+
+def _opener_for(magic: bytes):
+    for prefix, opener in _COMPRESSED_FORMATS:
+        if magic.startswith(prefix):
+            return opener
+    return None
+
+
+def sniff_encoding(head: bytes) -> tuple[str, int]:
+    """Return (codec, bom_length) for a log, looking only at its first bytes."""
+    if head.startswith(codecs.BOM_UTF16_LE):
+        return "utf-16-le", len(codecs.BOM_UTF16_LE)
+    if head.startswith(codecs.BOM_UTF16_BE):
+        return "utf-16-be", len(codecs.BOM_UTF16_BE)
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8", len(codecs.BOM_UTF8)
+    # BOM-less UTF-16LE (e.g. a log cut with `dd`): ASCII text has a NUL in
+    # every odd byte.
+    sample = head[:SNIFF_SIZE]
+    if len(sample) >= 8 and sample[1::2].count(0) >= len(sample) // 4:
+        return "utf-16-le", 0
+    # "utf-8" means "UTF-8, falling back to latin-1 on the first invalid byte".
+    return "utf-8", 0
+
+
+class _Utf8OrLatin1Decoder:
+    """Incremental UTF-8 decoder that switches to latin-1 on the first error.
+
+    The old readers decoded the whole file as UTF-8 and, if that failed,
+    decoded it again as latin-1. A stream cannot look ahead, so lines before
+    the first invalid byte stay UTF-8 and everything from there on is latin-1.
+    """
+
+    def __init__(self) -> None:
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._fallback = False
+
+    def decode(self, data: bytes, final: bool = False) -> str:
+        if self._fallback:
+            return data.decode("latin-1")
+        pending, _ = self._utf8.getstate()
+        try:
+            return self._utf8.decode(data, final)
+        except UnicodeDecodeError:
+            self._fallback = True
+            return (pending + data).decode("latin-1")
+
+
+def _make_decoder(encoding: str):
+    if encoding == "utf-8":
+        return _Utf8OrLatin1Decoder()
+    return codecs.getincrementaldecoder(encoding)(errors="ignore")
+
+
+class LogSource:
+    """One tester log, sniffed once.
+
+    The constructor reads only the first bytes of the file (of the
+    decompressed stream, for an archive) to learn its compression, encoding
+    and BOM. Every access method reuses that instead of guessing again, and
+    each one reads the file at most once:
+
+    - `lines()`: every line, streaming;
+    - `marked_lines(markers)`: only the lines containing a marker;
+    - `byte_ranges(parts)` + `range_lines(start, end)`: line-aligned pieces
+      that can be decoded independently (e.g. in worker processes);
+    - `complete_lines_end()`: end of the last complete line of a log that is
+      still being written;
+    - `follow()`: its complete lines as the tester appends them (a tail).
+
+    Byte offsets refer to the file on disk, so the byte-range methods raise
+    ValueError for a compressed log; check `compressed` first.
+    """
+
+    def __init__(self, log_path: Path | str) -> None:
+        self.path = Path(log_path)
+        with self.path.open("rb") as f:
+            head = f.read(SNIFF_SIZE)
+        self._opener = _opener_for(head)
+        if self._opener is not None:
+            with self._opener(self.path, "rb") as f:
+                head = f.read(SNIFF_SIZE)
+        self.encoding, self.bom_len = sniff_encoding(head)
+        self._unit = 2 if self.encoding.startswith("utf-16") else 1
+        self._newline = "\n".encode(self.encoding)
+
+    def __repr__(self) -> str:
+        kind = " compressed" if self.compressed else ""
+        return f"<LogSource {str(self.path)!r} {self.encoding}{kind}>"
+
+    @property
+    def compressed(self) -> bool:
+        """True for a gzip/bzip2/xz archive of a log (detected by magic bytes)."""
+        return self._opener is not None
+
+    def open(self) -> BinaryIO:
+        """Binary stream of the log from its first byte (BOM included), decompressed."""
+        if self._opener is None:
+            return self.path.open("rb")
+        return self._opener(self.path, "rb")
+
+    def lines(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+        """Yield the lines of the log (without line terminators), streaming.
+
+        Lines are split on "\\n" with a trailing "\\r" removed, which matches
+        `str.splitlines()` for the CRLF/LF logs MT5 writes.
+        """
+        with self.open() as f:
+            f.read(self.bom_len)
+            chunk = f.read(chunk_size)
+            yield from _split_decoded(_make_decoder(self.encoding), chunk, f, chunk_size, -1)
+
+    def _plain(self, what: str) -> None:
+        if self.compressed:
+            raise ValueError(f"{what} needs an uncompressed log: {self.path}")
+
+    def byte_ranges(self, parts: int) -> list[tuple[int, int]]:
+        """Cut the log into at most `parts` contiguous [start, end) byte ranges.
+
+        Every range except the first starts right after a "\\n" code unit, so
+        the ranges decode to exactly the lines `lines()` yields, in the same
+        order. The first range starts after the BOM.
+        """
+        self._plain("byte_ranges()")
+        base, unit, newline = self.bom_len, self._unit, self._newline
+        size = self.path.stat().st_size
+        cuts = [base]
+        parts = max(1, parts)
+        with self.path.open("rb") as f:
+            for i in range(1, parts):
+                guess = base + (size - base) * i // parts
+                guess -= (guess - base) % unit
+                if guess <= cuts[-1]:
+                    continue
+                f.seek(guess)
+                offset = guess
+                while True:
+                    block = f.read(DEFAULT_CHUNK_SIZE)
+                    if not block:
+                        offset = size
+                        break
+                    j = _find_aligned(block, newline, 0, 0, unit)
+                    if j >= 0:
+                        offset += j + len(newline)
+                        break
+                    offset += len(block)
+                if offset >= size:
+                    break
+                if offset > cuts[-1]:
+                    cuts.append(offset)
+        cuts.append(size)
+        return [(a, b) for a, b in zip(cuts, cuts[1:]) if b > a]
+
+    def complete_lines_end(self) -> int:
+        """Byte offset just past the last line break (of a log still being written).
+
+        Bytes after it belong to a line the tester has not finished writing, so
+        an incremental reader should stop there. Returns the BOM length if the
+        log has no complete line yet.
+        """
+        self._plain("complete_lines_end()")
+        base, unit, newline = self.bom_len, self._unit, self._newline
+        size = self.path.stat().st_size
+        with self.path.open("rb") as f:
+            hi = size
+            while hi > base:
+                lo = max(base, hi - DEFAULT_CHUNK_SIZE)
+                f.seek(lo)
+                # Look for newlines *starting* in [lo, hi); one may end past hi.
+                block = f.read(min(size, hi + len(newline) - 1) - lo)
+                j = _rfind_aligned(block, newline, 0, len(block), base - lo, unit)
+                if j >= 0:
+                    return lo + j + len(newline)
+                hi = lo
+        return base
+
+    def range_lines(self, start: int, end: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+        """Yield the lines in bytes [start, end) of the log (see `byte_ranges()`).
+
+        For a UTF-8 log with invalid bytes, the latin-1 fallback is decided per
+        range instead of from the first bad byte of the whole file.
+        """
+        self._plain("range_lines()")
+        with self.path.open("rb") as f:
+            f.seek(start)
+            chunk = f.read(min(chunk_size, end - start))
+            yield from _split_decoded(
+                _make_decoder(self.encoding), chunk, f, chunk_size, end - start - len(chunk)
+            )
+
+    def follow(
+        self, start: int | None = None, poll_seconds: float = 1.0, idle_timeout: float | None = None
+    ) -> Iterator[str]:
+        """Yield complete lines from byte `start` on, waiting for more as the log grows.
+
+        `start` defaults to just after the BOM and must be a line start. A line
+        is yielded once its line break is written. Stops after `idle_timeout`
+        seconds without new lines (None = never) or when the file shrinks,
+        i.e. it was rewritten by a new test run.
+        """
+        self._plain("follow()")
+        pos = self.bom_len if start is None else start
+        idle = 0.0
+        while True:
+            if self.path.stat().st_size < pos:
+                return
+            end = self.complete_lines_end()
+            if end > pos:
+                yield from self.range_lines(pos, end)
+                pos = end
+                idle = 0.0
+                continue
+            if idle_timeout is not None and idle >= idle_timeout:
+                return
+            time.sleep(poll_seconds)
+            idle += poll_seconds
+
+    def offset_lines(
+        self, start: int | None = None, end: int | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[tuple[int, str]]:
+        """Yield (byte offset, line) for the lines in bytes [start, end) of the log.
+
+        `start` defaults to just after the BOM and must be a line start (see
+        `byte_ranges()`); `end` defaults to the end of the file. The raw bytes
+        are split on the encoded "\\n" (a UTF-16 match that does not start on a
+        code unit is glued back) and each line is decoded on its own, as in
+        `marked_lines()`.
+        """
+        self._plain("offset_lines()")
+        encoding, unit, newline = self.encoding, self._unit, self._newline
+        pos = self.bom_len if start is None else start
+        remaining = (self.path.stat().st_size if end is None else end) - pos
+        pending = b""
+        with self.path.open("rb") as f:
+            f.seek(pos)
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                pieces = (pending + chunk).split(newline)
+                pending = pieces.pop()
+                carry = None
+                for raw in pieces:
+                    if carry is not None:
+                        raw = carry + newline + raw
+                        carry = None
+                    if len(raw) % unit:
+                        carry = raw
+                        continue
+                    yield pos, _decode_line(raw, encoding)
+                    pos += len(raw) + len(newline)
+                if carry is not None:
+                    pending = carry + newline + pending
+        if pending:
+            yield pos, _decode_line(pending, encoding)
+
+    def marked_lines(self, markers: Iterable[str]) -> Iterator[str]:
+        """Yield, in file order, only the lines containing any of `markers`.
+
+        The markers are encoded once in the log's encoding and searched directly
+        in the mmapped bytes; line boundaries are found by searching the encoded
+        "\\n" backwards/forwards from each hit. For UTF-16 every match is checked
+        to start on a code-unit boundary (relative to the BOM), so a byte pattern
+        straddling two characters is never mistaken for a hit. Only the matching
+        lines are decoded, each one from a zero-copy memoryview slice.
+
+        Lines are identical to what `lines()` yields, except that an invalid
+        UTF-8 line falls back to latin-1 on its own. A compressed log cannot be
+        mmapped: its decoded lines are filtered instead.
+        """
+        needles = tuple(dict.fromkeys(markers))
+        if self.compressed:
+            yield from (line for line in self.lines() if any(n in line for n in needles))
+            return
+
+        with self.path.open("rb") as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                return
+        with mm:
+            encoding, base, unit, newline = self.encoding, self.bom_len, self._unit, self._newline
+            encoded = [n.encode(encoding) for n in needles]
+            size = len(mm)
+            view = memoryview(mm)
+            try:
+                heads = [_find_aligned(mm, n, base, base, unit) for n in encoded]
+                while True:
+                    live = [h for h in heads if h >= 0]
+                    if not live:
+                        return
+                    hit = min(live)
+
+                    start = _rfind_aligned(mm, newline, base, hit, base, unit)
+                    start = base if start < 0 else start + len(newline)
+                    end = _find_aligned(mm, newline, hit, base, unit)
+                    end = size if end < 0 else end
+
+                    yield _decode_line(view[start:end], encoding)
+
+                    # Skip every other hit on the same line.
+                    nxt = end + len(newline)
+                    heads = [
+                        _find_aligned(mm, n, nxt, base, unit) if 0 <= h < nxt else h
+                        for n, h in zip(encoded, heads)
+                    ]
+            finally:
+                view.release()
+
+
+def _split_decoded(decoder, chunk: bytes, f, chunk_size: int, remaining: int) -> Iterator[str]:
+    """Decode `chunk` and then the rest of `f` (at most `remaining` bytes, -1 = all) into lines."""
+    pending = ""
+    while chunk:
+        parts = (pending + decoder.decode(chunk)).split("\n")
+        pending = parts.pop()
+        for line in parts:
+            yield line[:-1] if line.endswith("\r") else line
+        if remaining == 0:
+            break
+        n = chunk_size if remaining < 0 else min(chunk_size, remaining)
+        chunk = f.read(n)
+        if remaining > 0:
+            remaining -= len(chunk)
+
+    tail = pending + decoder.decode(b"", final=True)
+    if tail:
+        yield tail[:-1] if tail.endswith("\r") else tail
+
+
+def _decode_line(raw, encoding: str) -> str:
+    if encoding == "utf-8":
+        try:
+            line = str(raw, "utf-8")
+        except UnicodeDecodeError:
+            line = str(raw, "latin-1")
+    else:
+        line = str(raw, encoding, "ignore")
+    return line[:-1] if line.endswith("\r") else line
+
+
+def _find_aligned(buf, sub: bytes, start: int, base: int, unit: int) -> int:
+    """buf.find() restricted to offsets that start a code unit."""
+    i = buf.find(sub, start)
+    while i >= 0 and (i - base) % unit:
+        i = buf.find(sub, i + 1)
+    return i
+
+
+def _rfind_aligned(buf, sub: bytes, lo: int, hi: int, base: int, unit: int) -> int:
+    """buf.rfind() in [lo, hi) restricted to offsets that start a code unit."""
+    i = buf.rfind(sub, lo, hi)
+    while i >= 0 and (i - base) % unit:
+        i = buf.rfind(sub, lo, i + len(sub) - 1)
+    return i
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Fast decoding of MT5 tester timestamps ("YYYY.MM.DD HH:MM:SS").
+
+`datetime.strptime()` re-parses its format string on every call and used to
+dominate the analyzers' profiles. The tester timestamp is fixed width, so
+these helpers just slice it and convert the parts with int(). The date part
+is memoized: a multi-year log has a few thousand distinct days but millions
+of lines.
+
+Epoch seconds are naive tester (server) time, like the datetimes the
+analyzers already build: no timezone is applied in either direction.
+
+`epochs_to_datetime64()` / `ts_to_datetime64()` hand the integers to numpy as
+`datetime64[s]` arrays so downstream code can compare and bucket whole
+columns. numpy is imported lazily; the rest of the module is stdlib-only.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import Iterable
+
+
+EPOCH = datetime(1970, 1, 1)
+_EPOCH_ORDINAL = EPOCH.toordinal()
+_SECOND = timedelta(seconds=1)
+
+# "YYYY.MM.DD" -> (year, month, day) / epoch seconds of that midnight
+_DAY_PARTS: dict[str, tuple[int, int, int]] = {}
+_DAY_EPOCH: dict[str, int] = {}
+
+
+def _day_parts(day: str) -> tuple[int, int, int]:
+    parts = _DAY_PARTS.get(day)
+    if parts is None:
+        if len(day) != 10 or day[4] != "." or day[7] != ".":
+            raise ValueError(f"invalid tester date: {day!r}")
+        parts = _DAY_PARTS[day] = (int(day[0:4]), int(day[5:7]), int(day[8:10]))
+    return parts
+
+
+def day_epoch(day: str) -> int:
+    """Epoch seconds of midnight of a "YYYY.MM.DD" tester date."""
+    sec = _DAY_EPOCH.get(day)
+    if sec is None:
+        sec = _DAY_EPOCH[day] = (date(*_day_parts(day)).toordinal() - _EPOCH_ORDINAL) * 86400
+    return sec
+
+
+def ts_epoch(ts: str) -> int:
+    """Epoch seconds of a "YYYY.MM.DD HH:MM:SS" tester timestamp."""
+    return day_epoch(ts[:10]) + int(ts[11:13]) * 3600 + int(ts[14:16]) * 60 + int(ts[17:19])
+
+
+def parse_ts(ts: str) -> datetime:
+    """Drop-in replacement for `datetime.strptime(ts, "%Y.%m.%d %H:%M:%S")`."""
+    y, m, d = _day_parts(ts[:10])
+    return datetime(y, m, d, int(ts[11:13]), int(ts[14:16]), int(ts[17:19]))
+
+
+def to_epoch(dt: datetime) -> int:
+    return (dt - EPOCH) // _SECOND
+
+
+def from_epoch(sec: int) -> datetime:
+    return EPOCH + timedelta(seconds=sec)
+
+
+def epochs_to_datetime64(epochs: Iterable[int]):
+    """numpy `datetime64[s]` array from epoch seconds."""
+    import numpy as np
+
+    if hasattr(epochs, "__len__"):
+        arr = np.asarray(epochs, dtype=np.int64)
+    else:
+        arr = np.fromiter(epochs, dtype=np.int64)
+    return arr.view("datetime64[s]")
+
+
+def ts_to_datetime64(timestamps: Iterable[str]):
+    """numpy `datetime64[s]` array from tester timestamps, without building datetimes."""
+    import numpy as np
+
+    return np.fromiter(map(ts_epoch, timestamps), dtype=np.int64).view("datetime64[s]")
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""Python port of Indicators/FGM_TrendRider_EA/OBV_MACD_v3.mq5, batch and bar by bar.
+
+The OBV MACD filter was only visible through the "[OBV MACD DEBUG] Bar1:
+Hist=.. | Bar2: Hist=.. | Color=.. | Threshold=.." lines CFilters prints
+when it checks a signal. The port gives its buffers for every bar:
+
+    out = obv_macd(bars.close, bars.volume)           # whole history
+    out.hist, out.color, out.threshold, ...
+
+    live = ObvMacd()
+    for close, vol in stream:
+        bar = live.update(close, vol)                 # O(1) per bar
+
+Both give the same numbers, bit for bit: `update()` runs the same
+floating-point operations in the same order as the batch (the EMAs go
+through indicator_math.LinearFilter, the SMAs through RunningSma).
+
+The computation is the .mq5's full recalculation:
+
+- OBV: first bar = its volume, then +volume when the close rises, -volume
+  when it falls, unchanged otherwise;
+- smoothed OBV: SimpleMAOnBuffer(InpObvSmooth) (the raw OBV when <= 1);
+- MACD: EMA(InpFastEMA) - EMA(InpSlowEMA) of the smoothed OBV, both seeded
+  with its first value;
+- signal: SimpleMAOnBuffer(InpSignalSMA) of the MACD (0 when <= 1);
+- histogram: MACD - signal (0 on the first bar);
+- threshold: EMA(InpThreshPeriod) of |histogram| x InpThreshMult seeded
+  with 0 (just |histogram| x InpThreshMult when the period is <= 1);
+- color: 0 histogram >= 0 and rising, 2 >= 0 otherwise, 1 < 0 and falling,
+  3 < 0 otherwise (0 on the first bar).
+
+The EMAs are computed as previous x (1 - k) + value x k instead of MT5's
+previous + k x (value - previous), which can differ in the last bits.
+Values are cumulative from the first bar given, so they match the terminal
+only once the EMAs have forgotten where the two histories start.
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from event_table import EventTable
+from excursions import Bars, load_bars
+from indicator_math import LinearFilter, RunningSma, linear_filter, running_sma
+
+
+# ENUM_PLOT_COLOR_INDEX
+COLOR_POS_STRONG, COLOR_NEG_STRONG, COLOR_POS_WEAK, COLOR_NEG_WEAK = range(4)
+
+
+@dataclass(frozen=True)
+class ObvMacdParams:
+    """Inputs of OBV_MACD_v3.mq5 (the EA passes the same defaults)."""
+
+    fast_ema: int = 12
+    slow_ema: int = 26
+    signal_sma: int = 9
+    obv_smooth: int = 5
+    thresh_period: int = 34
+    thresh_mult: float = 0.6
+
+
+@dataclass(frozen=True)
+class ObvMacdResult:
+    obv: np.ndarray
+    obv_smooth: np.ndarray
+    macd: np.ndarray
+    signal: np.ndarray
+    hist: np.ndarray
+    color: np.ndarray  # int64, COLOR_*
+    threshold: np.ndarray
+
+
+@dataclass(frozen=True)
+class ObvMacdBar:
+    obv: float
+    obv_smooth: float
+    macd: float
+    signal: float
+    hist: float
+    color: int
+    threshold: float
+
+
+@dataclass(frozen=True)
+class ObvDebugCheck:
+    ts: datetime  # log line time
+    bar_ts: datetime  # open time of the bar read
+    hist_log: float
+    hist_calc: float
+    color_log: int
+    color_calc: int
+    threshold_log: float
+    threshold_calc: float
+
+
+def _alpha(period: int) -> float:
+    return 2.0 / (period + 1.0)
+
+
+def _ema_inputs(x: np.ndarray, period: int) -> np.ndarray:
+    """u[t] of the EMA as a linear_filter(): first value, then value x k."""
+    u = x * _alpha(period)
+    if len(u):
+        u[0] = x[0]
+    return u
+
+
+def obv_macd(close: Any, volume: Any, params: ObvMacdParams = ObvMacdParams()) -> ObvMacdResult:
+    """Every buffer of the indicator for every bar (tick or real volume, as given)."""
+    p = params
+    close = np.asarray(close, dtype=np.float64)
+    vol = np.asarray(volume, dtype=np.float64)
+
+    delta = np.where(close[1:] > close[:-1], vol[1:], np.where(close[1:] < close[:-1], -vol[1:], 0.0))
+    obv = np.cumsum(np.concatenate((vol[:1], delta)))
+    smooth = running_sma(obv, p.obv_smooth) if p.obv_smooth > 1 else obv
+
+    fast = linear_filter(_ema_inputs(smooth, p.fast_ema), 1.0 - _alpha(p.fast_ema))
+    slow = linear_filter(_ema_inputs(smooth, p.slow_ema), 1.0 - _alpha(p.slow_ema))
+    macd = fast - slow
+    signal = running_sma(macd, p.signal_sma)
+    hist = macd - signal
+    hist[:1] = 0.0
+
+    level = np.abs(hist) * p.thresh_mult
+    if p.thresh_period <= 1:
+        threshold = level
+    else:
+        u = level * _alpha(p.thresh_period)
+        u[:1] = 0.0
+        threshold = linear_filter(u, 1.0 - _alpha(p.thresh_period))
+
+    prev = np.concatenate(([0.0], hist[:-1]))
+    color = np.where(
+        hist >= 0,
+        np.where(hist > prev, COLOR_POS_STRONG, COLOR_POS_WEAK),
+        np.where(hist < prev, COLOR_NEG_STRONG, COLOR_NEG_WEAK),
+    )
+    color[:1] = COLOR_POS_STRONG
+    return ObvMacdResult(obv, smooth, macd, signal, hist, color.astype(np.int64), threshold)
+
+
+class ObvMacd:
+    """obv_macd() one bar at a time, in constant time and memory per bar."""
+
+    def __init__(self, params: ObvMacdParams = ObvMacdParams()):
+        p = self.params = params
+        self._smooth = RunningSma(p.obv_smooth)
+        self._signal = RunningSma(p.signal_sma)
+        self._fast = LinearFilter(1.0 - _alpha(p.fast_ema))
+        self._slow = LinearFilter(1.0 - _alpha(p.slow_ema))
+        self._threshold = LinearFilter(1.0 - _alpha(p.thresh_period)) if p.thresh_period > 1 else None
+        self._bars = 0
+        self._close = 0.0
+        self._obv = 0.0
+        self._hist = 0.0
+
+    def update(self, close: float, volume: float) -> ObvMacdBar:
+        """Feed the next closed bar and get the indicator values on it."""
+        p = self.params
+        close, volume = float(close), float(volume)
+        first = self._bars == 0
+        if first:
+            obv = volume
+        elif close > self._close:
+            obv = self._obv + volume
+        elif close < self._close:
+            obv = self._obv - volume
+        else:
+            obv = self._obv + 0.0
+        smooth = self._smooth.update(obv) if p.obv_smooth > 1 else obv
+
+        if first:
+            fast = self._fast.update(smooth)
+            slow = self._slow.update(smooth)
+        else:
+            fast = self._fast.update(smooth * _alpha(p.fast_ema))
+            slow = self._slow.update(smooth * _alpha(p.slow_ema))
+        macd = fast - slow
+        signal = self._signal.update(macd)
+        hist = 0.0 if first else macd - signal
+
+        level = abs(hist) * p.thresh_mult
+        if p.thresh_period <= 1:
+            threshold = level
+        else:
+            threshold = self._threshold.update(0.0 if first else level * _alpha(p.thresh_period))
+
+        if first:
+            color = COLOR_POS_STRONG
+        elif hist >= 0:
+            color = COLOR_POS_STRONG if hist > self._hist else COLOR_POS_WEAK
+        else:
+            color = COLOR_NEG_STRONG if hist < self._hist else COLOR_NEG_WEAK
+
+        self._bars += 1
+        self._close, self._obv, self._hist = close, obv, hist
+        return ObvMacdBar(obv, smooth, macd, signal, hist, color, threshold)
+
+
+def match_log_debug(bars: Bars, out: ObvMacdResult, debug: EventTable, shift: int = 1) -> EventTable:
+    """ObvDebugCheck of every log_events ObvDebug line against the port.
+
+    CFilters reads the bar `shift` bars before the one holding the line's
+    time (the bar of the FGM signal, 1 when it waits for the bar close).
+    Lines outside the bar history are left out.
+    """
+    ts = np.asarray(debug["ts"], dtype=np.int64)
+    at = np.searchsorted(bars.ts, ts, side="right") - 1 - shift
+    if len(bars):
+        period = int(np.median(np.diff(bars.ts))) if len(bars) > 1 else 60
+        inside = (at >= 0) & (ts < bars.ts[-1] + 2 * period)
+    else:
+        inside = np.zeros(len(ts), dtype=bool)
+    at, sel = at[inside], np.flatnonzero(inside)
+    return EventTable.from_columns(
+        ObvDebugCheck,
+        ts=ts[sel],
+        bar_ts=bars.ts[at],
+        hist_log=np.asarray(debug["hist1"], dtype=np.float64)[sel],
+        hist_calc=out.hist[at],
+        color_log=np.asarray(debug["color"], dtype=np.int64)[sel],
+        color_calc=out.color[at],
+        threshold_log=np.asarray(debug["threshold"], dtype=np.float64)[sel],
+        threshold_calc=out.threshold[at],
+    )
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="OBV MACD calculado sobre o histórico de barras")
+    ap.add_argument("bars", help="CSV de barras exportado do MT5 (com <TICKVOL>)")
+    ap.add_argument("--log", help="log do MT5 para comparar com as linhas [OBV MACD DEBUG]")
+    ap.add_argument("--shift", type=int, default=1, help="barra lida pelo EA em relação à linha do log")
+    args = ap.parse_args()
+
+    bars = load_bars(args.bars)
+    if bars.volume is None:
+        print("O CSV não tem coluna de volume (<TICKVOL>)")
+        return 1
+    out = obv_macd(bars.close, bars.volume)
+    counts = np.bincount(out.color, minlength=4)
+    print(f"Barras: {len(bars)}")
+    print(
+        f"  Verde forte: {counts[0]} | Vermelho forte: {counts[1]} | "
+        f"Verde fraco: {counts[2]} | Vermelho fraco: {counts[3]}"
+    )
+    death = np.abs(out.hist) < out.threshold * 0.8
+    print(f"  |Hist| < 80% do Threshold (lateralização): {death.mean() * 100:.1f}% das barras")
+
+    if args.log:
+        from event_cache import load_event_tables
+
+        check = match_log_debug(bars, out, load_event_tables(Path(args.log))["obv_debug"], args.shift)
+        if not check:
+            print("Nenhuma linha [OBV MACD DEBUG] dentro do histórico de barras")
+            return 0
+        same_color = check["color_calc"] == check["color_log"]
+        rel = np.abs(check["hist_calc"] - check["hist_log"]) / np.maximum(np.abs(check["hist_log"]), 1e-9)
+        print(f"\nLinhas do log no histórico: {len(check)}")
+        print(f"  Cor igual: {same_color.mean() * 100:.1f}% | Hist com erro < 1%: {(rel < 0.01).mean() * 100:.1f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""O(1)-per-trade running summary of closed trades, mergeable across chunks.
+
+`trade_metrics()` needs the whole profit array. For a live tester log, or a
+log too big to hold its trades, `OnlineMetrics` keeps a fixed handful of
+numbers instead and is updated once per "TRADE CLOSED" line:
+
+    m = OnlineMetrics()
+    for profit, reason in closes:
+        m.update(profit, reason)
+    m.summary(initial_deposit)
+
+It tracks count, wins and losses, gross profit and loss, the mean and
+variance of the profit (Welford), the running balance and its peak, the
+largest drawdown, and the current and longest win / loss / stop-loss
+streaks.
+
+Two accumulators merge (`a.merge(b)`, with `b`'s trades after `a`'s) into
+exactly what one accumulator fed both sequences would hold, so chunks of a
+log parsed by separate workers reduce into the summary of the whole log
+(`online_metrics_parallel()`). For that, balances are kept relative to the
+start of the chunk, and each streak also records the run it starts with.
+The variance merge is Chan's parallel form of Welford's update.
+
+Definitions follow trade_metrics and analyze_log_advanced.summarize(): a win
+is a profit > 0, a loss a profit < 0, and a stop-loss trade is a loss whose
+reason contains "Stop Loss". The drawdown peak includes the starting
+balance. Only the percent drawdown *at the largest absolute drawdown* is
+available: the largest percent drawdown of a chunk depends on the balance it
+starts from, which a worker does not know.
+"""
+
+from __future__ import annotations
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import reduce
+from typing import Any, Iterable
+
+from log_events import _close, dispatch
+from log_source import LogSource
+
+
+# Every line online_metrics() reads contains this literal.
+CLOSE_MARKERS = ("TRADE CLOSED:",)
+
+
+@dataclass
+class Streak:
+    """Runs of consecutive flagged trades: current, longest and leading run."""
+
+    n: int = 0  # trades seen
+    head: int = 0  # run the sequence starts with (== n if all flagged)
+    current: int = 0  # run the sequence ends with
+    best: int = 0
+
+    def update(self, flag: bool) -> None:
+        self.n += 1
+        if flag:
+            self.current += 1
+            if self.head == self.n - 1:
+                self.head = self.n
+            if self.current > self.best:
+                self.best = self.current
+        else:
+            self.current = 0
+
+    def merge(self, later: Streak) -> Streak:
+        return Streak(
+            n=self.n + later.n,
+            head=self.n + later.head if self.head == self.n else self.head,
+            current=later.n + self.current if later.current == later.n else later.current,
+            best=max(self.best, later.best, self.current + later.head),
+        )
+
+
+@dataclass
+class OnlineMetrics:
+    """Running summary of closed trades (see module docstring)."""
+
+    trades: int = 0
+    wins: int = 0
+    losses: int = 0
+    gross_profit: float = 0.0
+    gross_loss: float = 0.0  # positive
+    mean: float = 0.0
+    m2: float = 0.0  # sum of squared deviations from the mean
+    # Balances relative to the balance before the first trade.
+    balance: float = 0.0
+    peak: float = 0.0
+    trough: float = 0.0
+    max_dd: float = 0.0
+    max_dd_peak: float = 0.0  # peak the largest drawdown is measured from
+    win_streak: Streak = field(default_factory=Streak)
+    loss_streak: Streak = field(default_factory=Streak)
+    stoploss_streak: Streak = field(default_factory=Streak)
+
+    def update(self, profit: float, reason: str = "") -> None:
+        """Add the next closed trade."""
+        self.trades += 1
+        win, loss = profit > 0, profit < 0
+        if win:
+            self.wins += 1
+            self.gross_profit += profit
+        elif loss:
+            self.losses += 1
+            self.gross_loss -= profit
+        delta = profit - self.mean
+        self.mean += delta / self.trades
+        self.m2 += delta * (profit - self.mean)
+
+        self.balance += profit
+        if self.balance > self.peak:
+            self.peak = self.balance
+        elif self.balance < self.trough:
+            self.trough = self.balance
+        if self.peak - self.balance > self.max_dd:
+            self.max_dd = self.peak - self.balance
+            self.max_dd_peak = self.peak
+
+        self.win_streak.update(win)
+        self.loss_streak.update(loss)
+        self.stoploss_streak.update(loss and "Stop Loss" in reason)
+
+    def merge(self, later: OnlineMetrics) -> OnlineMetrics:
+        """Accumulator of this sequence followed by `later`'s."""
+        n = self.trades + later.trades
+        delta = later.mean - self.mean
+        offset = self.balance
+        # The largest drawdown lies within one side or runs from a peak of
+        # this side down to a trough of the later one (first one wins ties).
+        max_dd, max_dd_peak = self.max_dd, self.max_dd_peak
+        across = self.peak - (offset + later.trough)
+        if across > max_dd:
+            max_dd, max_dd_peak = across, self.peak
+        if later.max_dd > max_dd:
+            max_dd, max_dd_peak = later.max_dd, offset + later.max_dd_peak
+        return OnlineMetrics(
+            trades=n,
+            wins=self.wins + later.wins,
+            losses=self.losses + later.losses,
+            gross_profit=self.gross_profit + later.gross_profit,
+            gross_loss=self.gross_loss + later.gross_loss,
+            mean=self.mean + delta * later.trades / n if n else 0.0,
+            m2=self.m2 + later.m2 + delta * delta * self.trades * later.trades / n if n else 0.0,
+            balance=offset + later.balance,
+            peak=max(self.peak, offset + later.peak),
+            trough=min(self.trough, offset + later.trough),
+            max_dd=max_dd,
+            max_dd_peak=max_dd_peak,
+            win_streak=self.win_streak.merge(later.win_streak),
+            loss_streak=self.loss_streak.merge(later.loss_streak),
+            stoploss_streak=self.stoploss_streak.merge(later.stoploss_streak),
+        )
+
+    @property
+    def variance(self) -> float:
+        """Population variance of the profit (0 below 2 trades)."""
+        return self.m2 / self.trades if self.trades >= 2 else 0.0
+
+    def summary(self, initial_deposit: float = 0.0) -> dict[str, Any]:
+        """The analyze_log_advanced.summarize() figures this accumulator can give."""
+        n = self.trades
+        peak = initial_deposit + self.max_dd_peak
+        return {
+            "trades": n,
+            "wins": self.wins,
+            "losses": self.losses,
+            "win_rate_pct": self.wins / n * 100.0 if n else 0.0,
+            "net": self.balance,
+            "gross_profit": self.gross_profit,
+            "gross_loss": self.gross_loss,
+            "profit_factor": self.gross_profit / self.gross_loss if self.gross_loss > 0 else float("inf"),
+            "expectancy": self.mean,
+            "avg_win": self.gross_profit / self.wins if self.wins else 0.0,
+            "avg_loss": -self.gross_loss / self.losses if self.losses else 0.0,
+            "std_profit": math.sqrt(self.variance),
+            "max_dd_abs": self.max_dd,
+            "dd_pct_at_max_abs": self.max_dd / peak * 100.0 if self.max_dd and peak > 0 else 0.0,
+            "max_consec_losses": self.loss_streak.best,
+            "max_consec_wins": self.win_streak.best,
+            "max_consec_stoploss": self.stoploss_streak.best,
+            "consec_losses": self.loss_streak.current,
+            "consec_wins": self.win_streak.current,
+            "consec_stoploss": self.stoploss_streak.current,
+            "peak_balance": initial_deposit + self.peak,
+            "final_balance": initial_deposit + self.balance,
+        }
+
+
+def merge_all(parts: Iterable[OnlineMetrics]) -> OnlineMetrics:
+    """Merge accumulators given in sequence order."""
+    return reduce(OnlineMetrics.merge, parts, OnlineMetrics())
+
+
+_CLOSE_PARSERS = {"TRADE": _close}
+
+
+def online_metrics(lines: Iterable[str], into: OnlineMetrics | None = None) -> OnlineMetrics:
+    """Feed the TRADE CLOSED lines in `lines` to `into` (or a new accumulator)."""
+    m = OnlineMetrics() if into is None else into
+    update = m.update
+    for _, (_, profit, reason) in dispatch(lines, _CLOSE_PARSERS):
+        update(profit, reason)
+    return m
+
+
+def _range_metrics(job: tuple[LogSource, int, int]) -> OnlineMetrics:
+    src, start, end = job
+    return online_metrics(src.range_lines(start, end))
+
+
+def online_metrics_parallel(src: LogSource, workers: int, end: int | None = None) -> OnlineMetrics:
+    """online_metrics() of the log up to byte `end` (default: all of it), over byte ranges in a process pool.
+
+    `end` must be a line start, e.g. `src.complete_lines_end()` for a log
+    still being written.
+    """
+    if workers <= 1 or src.compressed:
+        if end is None:
+            return online_metrics(src.marked_lines(CLOSE_MARKERS))
+        return online_metrics(src.range_lines(src.bom_len, end))
+    ranges = src.byte_ranges(workers * 4)
+    if end is not None:
+        ranges = [(start, min(stop, end)) for start, stop in ranges if start < end]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = pool.map(_range_metrics, [(src, start, stop) for start, stop in ranges])
+        return merge_all(parts)
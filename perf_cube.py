@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Pre-aggregated performance cube: trades, PnL, wins and losses per cell.
+
+Reports slice the same trades by hour, weekday, strength, direction, regime
+and close reason, and each breakdown used to be another pass over the
+trades (a `group_stats()` call or a `defaultdict` loop). `build_cube()`
+makes one pass instead: every trade gets a cell index from its axis codes
+(`ravel_multi_index`), and each measure is one `bincount` into a dense
+numpy array with one axis per dimension.
+
+    cube = trade_cube(trades)                          # analyze_log_advanced trades
+    cube.rollup("hour").rows()                         # per hour
+    cube.select(direction="SELL").rollup("strength")   # SELL trades per strength
+
+Any slice or roll-up after that is a sum over axes of the dense arrays, so
+its cost depends on the cube's size, not on the number of trades. Cubes of
+different runs add up with `combine()`, which aligns their labels first,
+so a dashboard over thousands of runs is still one sum per view.
+
+Measures: `trades`, `wins` (profit > 0), `losses` (profit < 0),
+`gross_profit` and `gross_loss` (positive); `pnl` is their difference.
+Each axis has sorted labels (`labels_of(name)`). Hour (0-23) and weekday
+(0 = Monday) always have all their labels, so empty hours show up as zero
+rows. Unknown values (e.g. a trade without a matched signal) get their own
+label: -1 for numbers, "" for strings.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Mapping
+
+import numpy as np
+
+from event_table import Categorical, EventTable
+
+
+MEASURES = ("trades", "wins", "losses", "gross_profit", "gross_loss")
+
+FIXED_LABELS = {"hour": np.arange(24), "weekday": np.arange(7)}
+
+
+@dataclass(frozen=True)
+class PerfCube:
+    dims: tuple[str, ...]
+    labels: tuple[np.ndarray, ...]  # sorted, one per dim
+    trades: np.ndarray  # int64, shape = label counts
+    wins: np.ndarray
+    losses: np.ndarray
+    gross_profit: np.ndarray  # float64
+    gross_loss: np.ndarray
+
+    @property
+    def pnl(self) -> np.ndarray:
+        return self.gross_profit - self.gross_loss
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        return self.trades.shape
+
+    def labels_of(self, dim: str) -> np.ndarray:
+        return self.labels[self.dims.index(dim)]
+
+    def _with(self, dims, labels, reduce) -> PerfCube:
+        return PerfCube(tuple(dims), tuple(labels), *(reduce(getattr(self, m)) for m in MEASURES))
+
+    def rollup(self, *keep: str) -> PerfCube:
+        """Cube over the `keep` dims only (in that order), summing out the others."""
+        axes = tuple(i for i, d in enumerate(self.dims) if d not in keep)
+        rest = [d for d in self.dims if d in keep]
+        order = [rest.index(d) for d in keep]
+        return self._with(
+            keep,
+            (self.labels_of(d) for d in keep),
+            lambda a: np.transpose(a.sum(axis=axes), order),
+        )
+
+    def select(self, **values: Any) -> PerfCube:
+        """Sub-cube with only the given label(s) on some dims (all dims kept)."""
+        index = [np.arange(len(lab)) for lab in self.labels]
+        labels = list(self.labels)
+        for dim, value in values.items():
+            i = self.dims.index(dim)
+            hit = np.isin(labels[i], np.atleast_1d(np.asarray(value, dtype=labels[i].dtype)))
+            index[i] = np.flatnonzero(hit)
+            labels[i] = labels[i][hit]
+        where = np.ix_(*index)
+        return self._with(self.dims, labels, lambda a: a[where])
+
+    def total(self) -> dict[str, float]:
+        return {m: getattr(self, m).sum().item() for m in (*MEASURES, "pnl")}
+
+    def rows(self, include_empty: bool = False) -> list[tuple]:
+        """(label, trades, pnl, wins, losses, win rate %) per label of a 1-dim cube."""
+        if len(self.dims) != 1:
+            raise ValueError(f"rows() needs a 1-dim cube, got {self.dims}")
+        trades = self.trades
+        win_rate = np.divide(self.wins * 100.0, trades, out=np.zeros(len(trades)), where=trades > 0)
+        out = zip(
+            self.labels[0].tolist(),
+            trades.tolist(),
+            self.pnl.tolist(),
+            self.wins.tolist(),
+            self.losses.tolist(),
+            win_rate.tolist(),
+        )
+        return [r for r in out if include_empty or r[1]]
+
+
+def _axis(name: str, values: Any) -> tuple[np.ndarray, np.ndarray]:
+    """(sorted labels, per-trade code) of one axis."""
+    if isinstance(values, Categorical):
+        # Only the categories some trade uses: a categorical may carry many
+        # more (e.g. a shared string pool), and each one would be a cube slice.
+        used, inverse = np.unique(values.codes, return_inverse=True)
+        cats = values.categories
+        names = np.asarray([cats[i] for i in used.tolist()], dtype=str) if len(used) else np.empty(0, dtype=str)
+        labels, remap = np.unique(names, return_inverse=True)
+        return labels, remap[inverse.ravel()]
+    v = np.asarray(values)
+    if name in FIXED_LABELS:
+        return FIXED_LABELS[name], v.astype(np.int64)
+    if v.dtype == object:
+        v = v.astype(str)
+    return np.unique(v, return_inverse=True)
+
+
+def build_cube(profits: Any, axes: Mapping[str, Any]) -> PerfCube:
+    """Cube of `profits` over `axes` (name -> per-trade values), in one pass."""
+    p = np.asarray(profits, dtype=np.float64)
+    dims, labels, codes = [], [], []
+    for name, values in axes.items():
+        lab, code = _axis(name, values)
+        # Besides the fixed hour/weekday axes, an axis is sized by the distinct
+        # values present, so the cube never outgrows the trades.
+        if name not in FIXED_LABELS and len(lab) > len(p):
+            raise ValueError(f"axis {name!r} has {len(lab)} labels for {len(p)} trades")
+        dims.append(name)
+        labels.append(lab)
+        codes.append(np.asarray(code, dtype=np.int64).ravel())
+    shape = tuple(len(lab) for lab in labels)
+    size = int(np.prod(shape, dtype=np.int64))
+    cell = np.ravel_multi_index(codes, shape) if len(p) else np.empty(0, dtype=np.int64)
+
+    def count(mask=None, weights=None):
+        c = cell if mask is None else cell[mask]
+        w = weights if mask is None or weights is None else weights[mask]
+        out = np.bincount(c, weights=w, minlength=size)
+        return out.reshape(shape)
+
+    win, loss = p > 0, p < 0
+    return PerfCube(
+        tuple(dims),
+        tuple(labels),
+        trades=count(),
+        wins=count(win),
+        losses=count(loss),
+        gross_profit=count(win, p),
+        gross_loss=count(loss, -p),
+    )
+
+
+def calendar_axes(epochs: Any) -> dict[str, np.ndarray]:
+    """hour and weekday axes of epoch-second times (tester time)."""
+    t = np.asarray(epochs, dtype=np.int64)
+    # 1970-01-01 was a Thursday (weekday 3).
+    return {"hour": t % 86400 // 3600, "weekday": (t // 86400 + 3) % 7}
+
+
+def trade_cube(trades: EventTable, regime: Any = None) -> PerfCube:
+    """hour x weekday x strength x direction x regime x reason cube of analyze_log_advanced trades.
+
+    Hour and weekday are those of the open. The trades carry no regime: pass
+    one per trade (e.g. from the BAD ENTRY lines), otherwise the axis has the
+    single label "".
+    """
+    strength = np.where(trades.valid("strength"), trades["strength"], -1).astype(np.int64)
+    axes = {
+        **calendar_axes(trades["open_ts"]),
+        "strength": strength,
+        "direction": trades.categorical("side"),
+        "regime": np.full(len(trades), "") if regime is None else regime,
+        "reason": trades.categorical("reason"),
+    }
+    return build_cube(trades["profit"], axes)
+
+
+def combine(cubes: list[PerfCube]) -> PerfCube:
+    """Sum of cubes with the same dims; labels are the union of theirs."""
+    if not cubes:
+        raise ValueError("combine() needs at least one cube")
+    dims = cubes[0].dims
+    if any(c.dims != dims for c in cubes):
+        raise ValueError("combine() needs cubes with the same dims")
+    labels = [np.unique(np.concatenate([c.labels[i] for c in cubes])) for i in range(len(dims))]
+    shape = tuple(len(lab) for lab in labels)
+    sums = {m: np.zeros(shape, dtype=getattr(cubes[0], m).dtype) for m in MEASURES}
+    for c in cubes:
+        where = np.ix_(*(np.searchsorted(labels[i], c.labels[i]) for i in range(len(dims))))
+        for m in MEASURES:
+            sums[m][where] += getattr(c, m)
+    return PerfCube(dims, tuple(labels), **sums)
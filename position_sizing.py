@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Position-sizing sweep: the recorded trades replayed under a grid of lot rules.
+
+analyze_strategy_definitive prints one Kelly number, while the EA sizes each
+trade with `Inp_LotMode`, `Inp_RiskPercent` and the strength multipliers
+`Inp_ForceMultF3/F4/F5` (CRiskManager::CalculateLot). `sweep()` replays the
+same trade sequence under every rule of a grid at once:
+
+- fixed lot: lot = `lot`, whatever the balance;
+- risk %: the money at risk to the SL is `risk_pct` % of the balance times
+  the strength multiplier (|strength| 3/4/5 -> F3/F4/F5, anything else 0.5,
+  as GetRiskMultiplier() does), so the trade returns that amount times its
+  R-multiple;
+- fractional Kelly: risk % with `risk_pct` = fraction x the Kelly
+  fraction of the trades' R-multiples (win rate p, payoff b = average win
+  R / average loss R, f* = p - (1 - p) / b; 0 when negative). With no
+  edge (f* = 0) the Kelly rules would risk nothing, so they are left out.
+
+Each trade is reduced to its PnL per lot (profit / volume) and its
+R-multiple (risk_of_ruin.r_multiples(): profit over the money its recorded
+lot risked to the SL). A trade without SL gets no lot in the risk modes, as
+in the EA. Every grid point is then a row of one (rules, trades) array:
+fixed lots add `lot x PnL per lot` (a cumulative sum), risk rules compound
+`1 + risk x multiplier x R` (a cumulative sum of logs, so a trade that loses
+more than the balance ends the row at 0). Max drawdown is the running peak
+of each row. Lots are not rounded to the volume step and the fixed-lot
+safety cap of CalculateLot() is not applied.
+
+A row is "ruined" at the first trade that leaves the balance
+`ruin_dd_pct` % below the initial balance (`Inp_MaxTotalDD`, after which
+the EA stops trading); its final balance is the balance at that point.
+
+    grid = sweep_trades(trades, 1000.0, risk_pcts=[0.5, 1, 2, 3],
+                        kelly_fractions=[0.25, 0.5], strength_mults=[(0.5, 1, 1.5), (1, 1, 1)])
+    best = grid.take(np.argsort(-grid["final_balance"]))
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from itertools import product
+from typing import Any, Iterable
+
+import numpy as np
+
+from deal_matcher import SymbolSpec
+from event_table import Categorical, EventTable
+from risk_of_ruin import r_multiples
+
+
+# EA defaults of Inp_ForceMultF3/F4/F5.
+EA_STRENGTH_MULTS = (0.5, 1.0, 1.5)
+
+
+@dataclass(frozen=True)
+class SizingResult:
+    mode: str  # "fixed" / "risk" / "kelly"
+    lot: float  # fixed lot, NaN for the risk modes
+    risk_pct: float  # per trade before the multiplier, NaN for fixed lots
+    kelly_fraction: float  # NaN unless mode == "kelly"
+    mult_f3: float  # strength multipliers, NaN for fixed lots
+    mult_f4: float
+    mult_f5: float
+    final_balance: float
+    return_pct: float
+    max_dd_pct: float
+    ruined: bool
+    ruin_trade: int  # index of the trade that ruined the row, -1 if none
+    trades: int  # trades with a lot > 0
+
+
+def kelly_fraction(r: Any) -> float:
+    """Kelly fraction f* = p - (1 - p) / b of R-multiples (0 when negative or undefined)."""
+    r = np.asarray(r, dtype=np.float64)
+    r = r[np.isfinite(r)]
+    wins, losses = r[r > 0], r[r <= 0]
+    if not len(wins) or not len(losses) or losses.mean() == 0:
+        return 0.0
+    p = len(wins) / len(r)
+    b = wins.mean() / -losses.mean()
+    return max(0.0, p - (1.0 - p) / b)
+
+
+def _strength_code(strength: Any) -> np.ndarray:
+    """0 for the default multiplier, 1/2/3 for |strength| 3/4/5."""
+    s = np.abs(np.nan_to_num(np.asarray(strength, dtype=np.float64), nan=0.0)).astype(np.int64)
+    return np.where((s >= 3) & (s <= 5), s - 2, 0)
+
+
+def _paths(equity: np.ndarray, initial_balance: float, ruin_dd_pct: float) -> dict[str, np.ndarray]:
+    """Final balance, max DD and ruin of each (rules, trades) equity row."""
+    rows = np.arange(len(equity))
+    eq = np.concatenate((np.full((len(equity), 1), float(initial_balance)), equity), axis=1)
+    floor = initial_balance * (1.0 - ruin_dd_pct / 100.0) if ruin_dd_pct > 0 else 0.0
+    below = eq[:, 1:] <= floor
+    ruined = below.any(axis=1)
+    ruin_trade = np.where(ruined, below.argmax(axis=1), -1)
+    # Stop each ruined row at its ruin trade.
+    stop = np.where(ruined, ruin_trade + 1, eq.shape[1] - 1)
+    eq = np.where(np.arange(eq.shape[1]) <= stop[:, None], eq, eq[rows, stop][:, None])
+    peak = np.maximum.accumulate(eq, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dd = np.where(peak > 0, 1.0 - eq / peak, 0.0)
+    final = eq[rows, stop]
+    return {
+        "final_balance": final,
+        "return_pct": (final / initial_balance - 1.0) * 100.0,
+        "max_dd_pct": dd.max(axis=1) * 100.0,
+        "ruined": ruined,
+        "ruin_trade": ruin_trade,
+    }
+
+
+def sweep(
+    profit: Any,
+    volume: Any,
+    r_multiple: Any,
+    strength: Any,
+    initial_balance: float,
+    *,
+    fixed_lots: Iterable[float] = (),
+    risk_pcts: Iterable[float] = (),
+    kelly_fractions: Iterable[float] = (),
+    strength_mults: Iterable[tuple[float, float, float]] = (EA_STRENGTH_MULTS,),
+    ruin_dd_pct: float = 10.0,
+) -> EventTable:
+    """SizingResult table of the trades (in order) under every rule of the grid.
+
+    Risk % and Kelly rules are crossed with every (F3, F4, F5) multiplier
+    triple of `strength_mults`; fixed lots do not use them. Kelly rules are
+    only generated when kelly_fraction() of the R-multiples is positive.
+    """
+    p = np.asarray(profit, dtype=np.float64)
+    vol = np.asarray(volume, dtype=np.float64)
+    r = np.asarray(r_multiple, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_lot = np.where(vol > 0, p / vol, 0.0)
+    sized = np.isfinite(r)
+    r = np.where(sized, r, 0.0)
+    code = _strength_code(strength)
+    kelly = kelly_fraction(r[sized])
+
+    lots = np.asarray(list(fixed_lots), dtype=np.float64)
+    mults = np.asarray(list(strength_mults), dtype=np.float64).reshape(-1, 3)
+    risk_rules = [("risk", pct, np.nan) for pct in risk_pcts]
+    if kelly > 0:
+        risk_rules += [("kelly", frac * kelly * 100.0, frac) for frac in kelly_fractions]
+    grid = list(product(risk_rules, mults.tolist()))
+
+    parts = []
+    if len(lots):
+        # Fixed lot: balance = initial + cumulative lot x PnL per lot.
+        equity = initial_balance + np.cumsum(lots[:, None] * per_lot[None, :], axis=1)
+        res = _paths(equity, initial_balance, ruin_dd_pct)
+        nan = np.full(len(lots), np.nan)
+        parts.append(
+            dict(
+                mode=["fixed"] * len(lots),
+                lot=lots,
+                risk_pct=nan,
+                kelly_fraction=nan,
+                mult_f3=nan,
+                mult_f4=nan,
+                mult_f5=nan,
+                trades=np.full(len(lots), np.count_nonzero(vol > 0)),
+                **res,
+            )
+        )
+    if grid:
+        pct = np.array([rule[1] for rule, _ in grid])
+        frac = np.array([rule[2] for rule, _ in grid])
+        # Multiplier of each (rule, trade): column 0 is the default 0.5.
+        table = np.column_stack((np.full(len(grid), 0.5), np.array([m for _, m in grid])))
+        risk = (pct / 100.0)[:, None] * table[:, code]
+        growth = np.maximum(1.0 + risk * r[None, :], 0.0)
+        with np.errstate(divide="ignore"):
+            equity = initial_balance * np.exp(np.cumsum(np.log(growth), axis=1))
+        res = _paths(equity, initial_balance, ruin_dd_pct)
+        parts.append(
+            dict(
+                mode=[rule[0] for rule, _ in grid],
+                lot=np.full(len(grid), np.nan),
+                risk_pct=pct,
+                kelly_fraction=frac,
+                mult_f3=table[:, 1],
+                mult_f4=table[:, 2],
+                mult_f5=table[:, 3],
+                trades=np.count_nonzero((risk > 0) & sized, axis=1),
+                **res,
+            )
+        )
+    if not parts:
+        return EventTable.empty(SizingResult)
+    cols = {name: np.concatenate([np.asarray(part[name]) for part in parts]) for name in parts[0] if name != "mode"}
+    modes = [m for part in parts for m in part["mode"]]
+    return EventTable.from_columns(SizingResult, mode=Categorical.from_values(modes), **cols)
+
+
+def sweep_trades(
+    trades: EventTable,
+    initial_balance: float,
+    *,
+    symbol: str = "USDJPY",
+    spec: SymbolSpec = SymbolSpec(),
+    account_currency: str = "USD",
+    **grid: Any,
+) -> EventTable:
+    """sweep() of an analyze_log_advanced.pair_trades() table, in close order."""
+    trades = trades.sort_by("close_ts")
+    r = r_multiples(trades, symbol, spec, account_currency)
+    strength = np.where(trades.valid("strength"), trades["strength"], 0)
+    return sweep(trades["profit"], trades["volume"], r, strength, initial_balance, **grid)
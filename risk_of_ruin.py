@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""Monte Carlo risk of ruin under the EA's CRiskManager stop rules.
+
+The reports show one historical drawdown. What matters is how likely the
+account is to hit `Inp_MaxDailyDD` or `Inp_MaxTotalDD` and be paused
+("CRiskManager: Drawdown total de ... excedeu limite" in the log) when the
+same trades come in another order. `simulate()` resamples the closed trades
+of `pair_trades()` into many equity paths and replays them with the rules of
+`CRiskManager::CheckDailyProtection()`:
+
+- daily: once the balance is `daily_dd_pct` below the day's starting
+  balance, no more trades that day;
+- consecutive stops: after `max_consec_losses` trades in a row with
+  profit <= 0 (the EA's `isWin = profit > 0`), no more trades that day; the
+  count restarts every day, as `ResetDailyProtection()` does;
+- total: once the balance is `total_dd_pct` below the initial balance the EA
+  stays paused for good. That is what "ruin" means here (a balance <= 0
+  counts too, for rules that are switched off with 0).
+
+Trades are resampled with replacement, either one by one (`block=None`) or
+in blocks of `block` consecutive trades (circular block bootstrap, keeps
+losing streaks together). Each path has as many trades as the history, laid
+out on the historical trading days (the same number of trades per day), so
+the daily rules see realistic days. Values are either the money PnL of each
+trade (fixed lot, `risk_pct=None`) or R-multiples (`r_multiples()`) sized
+at `risk_pct` % of the balance before the trade, as `Inp_LotMode` =
+LOT_RISK_PERCENT does.
+
+The EA checks the rules on equity, floating PnL included; only closed
+trades are known here, so the checks use the balance after each close.
+
+All paths of a chunk advance one trading day at a time as numpy arrays of
+shape (trades that day, paths). Since a pause blocks every later trade of
+the day, the trades taken form a prefix and the day is exact in one
+vectorized step. Chunks run in a process pool (`simulate_parallel()`), each
+with its own `SeedSequence` child, so results do not depend on the number of
+workers.
+
+    values, days = trade_values(trades), day_sizes(trades["close_ts"])
+    paths = simulate_parallel(values, days, 1000.0, paths=200_000, block=20)
+    summarize(paths, 1000.0)
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from deal_matcher import SymbolSpec, conversion_factor
+from event_table import EventTable, concat
+
+
+@dataclass(frozen=True)
+class RiskRules:
+    """Stop rules of CRiskManager (EA inputs Inp_MaxDailyDD, Inp_MaxTotalDD, Inp_MaxConsecLoss); 0 = off."""
+
+    daily_dd_pct: float = 3.0
+    total_dd_pct: float = 10.0
+    max_consec_losses: int = 3
+
+
+@dataclass(frozen=True)
+class PathResult:
+    final_balance: float
+    max_dd_pct: float  # peak-to-trough of the closed balance
+    ruined: bool
+    ruin_trade: int  # trades taken before the total stop, -1 if never
+    daily_halts: int  # days paused by the daily drawdown rule
+    consec_halts: int  # days paused by the consecutive-stops rule
+    trades_taken: int
+    longest_underwater_days: int  # trading days below a previous peak, until ruin
+
+
+def r_multiples(
+    trades: EventTable, symbol: str = "USDJPY", spec: SymbolSpec = SymbolSpec(), account_currency: str = "USD"
+) -> np.ndarray:
+    """Profit of each trade over the money it risked to its SL (NaN without SL).
+
+    `trades` is a pair_trades() table, or anything with open_price, sl,
+    volume and profit columns. The risk is converted at the SL price, the
+    exit price of a stopped trade, as deal_matcher converts profits.
+    """
+    entry = np.asarray(trades["open_price"], dtype=np.float64)
+    sl = np.asarray(trades["sl"], dtype=np.float64)
+    volume = np.asarray(trades["volume"], dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        risk = np.abs(entry - sl) * volume * conversion_factor(symbol, spec, account_currency, np.where(sl > 0, sl, entry))
+        return np.where((sl > 0) & (risk > 0), np.asarray(trades["profit"], dtype=np.float64) / risk, np.nan)
+
+
+def day_sizes(close_ts: Any) -> np.ndarray:
+    """Trades per trading day (tester time), in day order."""
+    days = np.asarray(close_ts, dtype=np.int64) // 86400
+    return np.unique(days, return_counts=True)[1] if len(days) else np.empty(0, dtype=np.int64)
+
+
+def _indices(rng: np.random.Generator, n: int, paths: int, total: int, block: int | None):
+    """Per-day index sampler: takes (path rows, first, count) of a day, returns (count, rows) trade indices."""
+    if not block or block <= 1:
+        return lambda rows, first, count: rng.integers(0, n, size=(count, len(rows)))
+    starts = rng.integers(0, n, size=(-(-total // block), paths))
+
+    def take(rows, first, count):
+        pos = np.arange(first, first + count)
+        return (starts[pos // block][:, rows] + (pos % block)[:, None]) % n
+
+    return take
+
+
+def _accumulate(ufunc: np.ufunc, a: np.ndarray) -> np.ndarray:
+    """ufunc.accumulate(a, axis=0) one row at a time: a day has few trades and
+    many paths, and numpy's accumulate over a short axis 0 is much slower."""
+    out = np.array(a)
+    for i in range(1, len(out)):
+        ufunc(out[i - 1], out[i], out=out[i])
+    return out
+
+
+def simulate(
+    values: Any,
+    days: Any,
+    initial_balance: float,
+    rules: RiskRules = RiskRules(),
+    *,
+    paths: int = 10_000,
+    block: int | None = None,
+    risk_pct: float | None = None,
+    seed: Any = None,
+) -> EventTable:
+    """PathResult table of `paths` resampled equity paths (see module docstring).
+
+    `values` are per-trade money PnL, or R-multiples when `risk_pct` is
+    given (NaN values are dropped); `days` is trades per trading day
+    (`day_sizes()`).
+    """
+    v = np.asarray(values, dtype=np.float64)
+    v = v[np.isfinite(v)]
+    days = np.asarray(days, dtype=np.int64)
+    days = days[days > 0]
+    total = int(days.sum())
+    if not len(v) or not total:
+        return EventTable.empty(PathResult)
+    rng = np.random.default_rng(seed)
+    take = _indices(rng, len(v), paths, total, block)
+    init = float(initial_balance)
+    floor = init * (1.0 - rules.total_dd_pct / 100.0) if rules.total_dd_pct > 0 else 0.0
+
+    # One row per state variable, one column per path still live. Paths
+    # stopped for good are copied to `out` and dropped, so later days only
+    # cost what is still trading.
+    names = ("bal", "peak", "max_dd", "daily_halts", "consec_halts", "taken", "under", "longest", "ruin_trade", "row")
+    BAL, PEAK, MAX_DD, DAILY, CONSEC, TAKEN, UNDER, LONGEST, RUIN_TRADE, ROW = range(len(names))
+    state = np.zeros((len(names), paths))
+    state[BAL] = state[PEAK] = init
+    state[RUIN_TRADE] = -1
+    state[ROW] = np.arange(paths)
+    out = state.copy()
+    ruined_rows = []
+
+    first = 0
+    for count in days.tolist():
+        if not state.shape[1]:
+            break
+        x = v[take(state[ROW].astype(np.int64), first, count)]
+        first += count
+        start = state[BAL]
+        if risk_pct is None:
+            after = start + _accumulate(np.add, x)
+        else:
+            after = start * _accumulate(np.multiply, 1.0 + x * (risk_pct / 100.0))
+
+        # Conditions after each trade; the first one pauses the rest of the day.
+        pos = np.arange(count)[:, None]
+        daily = after <= start * (1.0 - rules.daily_dd_pct / 100.0) if rules.daily_dd_pct > 0 else None
+        consec = None
+        if rules.max_consec_losses > 0:
+            last_win = _accumulate(np.maximum, np.where(x <= 0, -1, pos))
+            consec = pos - last_win >= rules.max_consec_losses
+        ruin = after <= floor
+        halt = ruin
+        for cond in (daily, consec):
+            if cond is not None:
+                halt = halt | cond
+        seen = _accumulate(np.logical_or, halt)
+        paused = seen[-1]
+        last = np.minimum(count - seen.sum(axis=0), count - 1)
+        cols = np.arange(len(last))
+        end = after[last, cols]
+        eff = np.where(pos <= last, after, end)
+        run_peak = np.maximum(state[PEAK], _accumulate(np.maximum, eff))
+        # The peak never drops below the initial balance, so it is > 0.
+        dd = (1.0 - (eff / run_peak).min(axis=0)) * 100.0
+        np.maximum(state[MAX_DD], dd, out=state[MAX_DD])
+        state[PEAK] = run_peak[-1]
+
+        # What paused the day, checked in CheckDailyProtection() order.
+        by_daily = paused & daily[last, cols] if daily is not None else np.zeros(len(last), dtype=bool)
+        state[DAILY] += by_daily
+        if consec is not None:
+            state[CONSEC] += paused & ~by_daily & consec[last, cols]
+        state[TAKEN] += last + 1
+        state[BAL] = end
+        state[UNDER] = np.where(end >= state[PEAK], 0.0, state[UNDER] + 1.0)
+        np.maximum(state[LONGEST], state[UNDER], out=state[LONGEST])
+
+        ruined = paused & ruin[last, cols]
+        if ruined.any():
+            state[RUIN_TRADE, ruined] = state[TAKEN, ruined]
+            ruined_rows.append(state[:, ruined])
+            state = state[:, ~ruined]
+
+    for part in (*ruined_rows, state):
+        out[:, part[ROW].astype(np.int64)] = part
+    return EventTable.from_columns(
+        PathResult,
+        final_balance=out[BAL],
+        max_dd_pct=out[MAX_DD],
+        ruined=out[RUIN_TRADE] >= 0,
+        ruin_trade=out[RUIN_TRADE].astype(np.int64),
+        daily_halts=out[DAILY].astype(np.int64),
+        consec_halts=out[CONSEC].astype(np.int64),
+        trades_taken=out[TAKEN].astype(np.int64),
+        longest_underwater_days=out[LONGEST].astype(np.int64),
+    )
+
+
+def _simulate_chunk(job: tuple) -> EventTable:
+    values, days, initial_balance, rules, paths, block, risk_pct, seed = job
+    return simulate(values, days, initial_balance, rules, paths=paths, block=block, risk_pct=risk_pct, seed=seed)
+
+
+def simulate_parallel(
+    values: Any,
+    days: Any,
+    initial_balance: float,
+    rules: RiskRules = RiskRules(),
+    *,
+    paths: int = 100_000,
+    block: int | None = None,
+    risk_pct: float | None = None,
+    seed: int | None = None,
+    workers: int = 0,
+    chunk: int = 5_000,
+) -> EventTable:
+    """simulate() of `paths` paths in chunks of `chunk` over a process pool (0 workers = one per CPU)."""
+    sizes = [chunk] * (paths // chunk) + ([paths % chunk] if paths % chunk else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    v = np.asarray(values, dtype=np.float64)
+    d = np.asarray(days, dtype=np.int64)
+    jobs = [(v, d, initial_balance, rules, size, block, risk_pct, s) for size, s in zip(sizes, seeds)]
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(jobs) <= 1:
+        parts = [_simulate_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            parts = list(pool.map(_simulate_chunk, jobs))
+    return concat(parts, PathResult) if parts else EventTable.empty(PathResult)
+
+
+def summarize(results: EventTable, initial_balance: float, quantiles: tuple[float, ...] = (50, 90, 95, 99)) -> dict:
+    """Ruin probability, drawdown / final balance / recovery quantiles of a PathResult table."""
+    if not results:
+        return {"paths": 0}
+    ruined = results["ruined"]
+    dd = results["max_dd_pct"]
+    final = results["final_balance"]
+    alive = ~ruined
+    underwater = results["longest_underwater_days"][alive]
+    q = np.asarray(quantiles, dtype=np.float64)
+    return {
+        "paths": len(results),
+        "ruin_prob": float(ruined.mean()),
+        "median_ruin_trade": float(np.median(results["ruin_trade"][ruined])) if ruined.any() else None,
+        "daily_halt_prob": float((results["daily_halts"] > 0).mean()),
+        "mean_daily_halts": float(results["daily_halts"].mean()),
+        "consec_halt_prob": float((results["consec_halts"] > 0).mean()),
+        "mean_consec_halts": float(results["consec_halts"].mean()),
+        "max_dd_pct": dict(zip(quantiles, np.percentile(dd, q).tolist())),
+        "final_balance": dict(zip(quantiles, np.percentile(final, 100 - q).tolist())),
+        "profit_prob": float((final > initial_balance).mean()),
+        "underwater_days": dict(zip(quantiles, np.percentile(underwater, q).tolist())) if len(underwater) else {},
+    }
+
+
+def trade_values(trades: EventTable, risk_pct: float | None = None, **options: Any) -> np.ndarray:
+    """Money PnL of the trades, or their R-multiples when sizing by `risk_pct`."""
+    return r_multiples(trades, **options) if risk_pct is not None else np.asarray(trades["profit"], dtype=np.float64)
+
+
+def main() -> int:
+    from analyze_log_advanced import events_from_tables, pair_trades
+    from event_cache import load_event_tables
+    from log_events import DEPOSIT_MARKER, parse_initial_deposit
+    from log_source import LogSource
+
+    ap = argparse.ArgumentParser(description="Monte Carlo do risco de ruína com as regras do CRiskManager")
+    ap.add_argument("log", help="log do MT5")
+    ap.add_argument("--paths", type=int, default=100_000, help="caminhos simulados")
+    ap.add_argument("--block", type=int, default=0, help="tamanho do bloco do bootstrap (0 = iid)")
+    ap.add_argument("--risk-pct", type=float, help="risco %% por trade sobre R-múltiplos (padrão: PnL do log, lote fixo)")
+    ap.add_argument("--daily-dd", type=float, default=3.0, help="Inp_MaxDailyDD (%%)")
+    ap.add_argument("--total-dd", type=float, default=10.0, help="Inp_MaxTotalDD (%%)")
+    ap.add_argument("--max-consec-loss", type=int, default=3, help="Inp_MaxConsecLoss")
+    ap.add_argument("--deposit", type=float, help="saldo inicial (padrão: initial deposit do log)")
+    ap.add_argument("--jobs", type=int, default=0, help="processos (0 = um por CPU)")
+    ap.add_argument("--seed", type=int)
+    args = ap.parse_args()
+
+    log_path = Path(args.log)
+    if not log_path.exists():
+        raise SystemExit(f"Log não encontrado: {log_path}")
+    src = LogSource(log_path)
+    deposit = args.deposit or parse_initial_deposit(src.marked_lines((DEPOSIT_MARKER,)))
+    if not deposit:
+        raise SystemExit("Depósito inicial não encontrado no log: use --deposit")
+    trades = pair_trades(*events_from_tables(load_event_tables(log_path)))
+    if not trades:
+        raise SystemExit("Nenhum trade encontrado no log!")
+
+    values = trade_values(trades, args.risk_pct)
+    rules = RiskRules(args.daily_dd, args.total_dd, args.max_consec_loss)
+    results = simulate_parallel(
+        values,
+        day_sizes(trades["close_ts"]),
+        deposit,
+        rules,
+        paths=args.paths,
+        block=args.block or None,
+        risk_pct=args.risk_pct,
+        seed=args.seed,
+        workers=args.jobs,
+    )
+    s = summarize(results, deposit)
+
+    sizing = f"risco {args.risk_pct:.2f}% por trade" if args.risk_pct is not None else "lote fixo (PnL do log)"
+    print(f"\n=== RISCO DE RUÍNA ({s['paths']} caminhos, {len(trades)} trades, {sizing}) ===")
+    print(f"Bootstrap: {'blocos de ' + str(args.block) if args.block else 'iid'} | Depósito: {deposit:.2f}")
+    print(f"Regras: DD diário {rules.daily_dd_pct:.1f}% | DD total {rules.total_dd_pct:.1f}% | {rules.max_consec_losses} stops consecutivos")
+    print(f"\nProbabilidade de ruína (DD total): {s['ruin_prob'] * 100:.2f}%")
+    if s["median_ruin_trade"] is not None:
+        print(f"  Mediana de trades até a ruína: {s['median_ruin_trade']:.0f}")
+    print(f"Pausa por DD diário: {s['daily_halt_prob'] * 100:.2f}% dos caminhos (média {s['mean_daily_halts']:.2f} dias)")
+    print(f"Pausa por stops consecutivos: {s['consec_halt_prob'] * 100:.2f}% dos caminhos (média {s['mean_consec_halts']:.2f} dias)")
+    print(f"Probabilidade de terminar com lucro: {s['profit_prob'] * 100:.2f}%")
+    print("\nQuantil | DD máx % | Saldo final (pior) | Dias abaixo do pico (sem ruína)")
+    for q in s["max_dd_pct"]:
+        under = s["underwater_days"].get(q)
+        print(
+            f"P{q:<6g} | {s['max_dd_pct'][q]:8.2f} | {s['final_balance'][q]:18.2f} | "
+            + (f"{under:.0f}" if under is not None else "-")
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Rolling-window performance of a closed-trade sequence, in O(n).
+
+Regime breaks (e.g. the collapse after 2023.01.26) show up as a window
+where profit factor, win rate and expectancy drop. Recomputing the
+metrics for every window costs O(n x window); here every figure of every
+window comes from prefix sums, so the whole series costs O(n):
+
+    pts = rolling_by_trades(profits, close_ts, 50)            # last 50 trades
+    pts = rolling_by_time(profits, close_ts, 30 * 86400)      # last 30 days
+
+Each returns an `EventTable` of `RollingPoint`, one row per window, keyed by
+the window's end:
+
+- trades, wins, win rate, net, profit factor and expectancy: differences of
+  prefix sums of count, wins, gross profit and gross loss;
+- `dd_abs`: how far the balance at the end of the window is below the
+  highest balance inside it (the balance before its first trade included).
+  The sliding maximum is one numpy pass (van Herk/Gil-Werman block prefix
+  and suffix maxima) for trade-count windows, and a monotonic deque for
+  calendar windows, whose width in trades varies;
+- `trades_per_day`: trade frequency. For calendar windows the window length
+  is fixed; for trade-count windows it is the time the N trades spanned.
+
+Trade-count windows emit one point per trade (from the first full window,
+thinned by `step`). Calendar windows are evaluated on a grid every
+`step_seconds`, so a ten-year series stays a few hundred rows for the
+report. Profit factor is inf when a window has no loss, as in trade_metrics.
+Trades are taken in close time order (stable).
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+
+from event_table import EventTable
+
+
+DAY = 86400
+
+
+@dataclass(frozen=True)
+class RollingPoint:
+    ts: datetime  # end of the window (close time of its last trade, or grid time)
+    trades: int
+    wins: int
+    win_rate_pct: float
+    net: float
+    profit_factor: float
+    expectancy: float
+    dd_abs: float
+    trades_per_day: float
+
+
+def _sorted(profits: Any, close_ts: Any) -> tuple[np.ndarray, np.ndarray]:
+    p = np.asarray(profits, dtype=np.float64)
+    t = np.asarray(close_ts, dtype=np.int64)
+    if len(t) > 1 and not (t[1:] >= t[:-1]).all():
+        order = np.argsort(t, kind="stable")
+        p, t = p[order], t[order]
+    return p, t
+
+
+def _prefix(p: np.ndarray) -> tuple[np.ndarray, ...]:
+    """Prefix sums (length n + 1) of wins, gross profit, gross loss and balance."""
+
+    def csum(x):
+        return np.concatenate(([0], np.cumsum(x)))
+
+    return csum(p > 0), csum(np.where(p > 0, p, 0.0)), csum(np.where(p < 0, -p, 0.0)), csum(p)
+
+
+def sliding_max(x: Any, width: int) -> np.ndarray:
+    """max(x[i:i + width]) for every full window, in one O(n) numpy pass."""
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    if width < 1 or width > n:
+        return np.empty(0)
+    pad = -n % width
+    blocks = np.concatenate((x, np.full(pad, -np.inf))).reshape(-1, width)
+    # Max from the start of each block, and to its end; a window spans the
+    # tail of one block and the head of the next.
+    head = np.maximum.accumulate(blocks, axis=1).ravel()
+    tail = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    return np.maximum(tail[: n - width + 1], head[width - 1 : n])
+
+
+def _points(
+    ts: np.ndarray, lo: np.ndarray, hi: np.ndarray, pre: tuple[np.ndarray, ...], peak: np.ndarray, days: np.ndarray
+) -> EventTable:
+    """RollingPoint table of the windows of trades [lo, hi)."""
+    wins_c, gp_c, gl_c, bal = pre
+    trades = hi - lo
+    wins = wins_c[hi] - wins_c[lo]
+    gp = gp_c[hi] - gp_c[lo]
+    gl = gl_c[hi] - gl_c[lo]
+    net = bal[hi] - bal[lo]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        win_rate = np.where(trades > 0, wins * 100.0 / trades, 0.0)
+        pf = np.where(gl > 0, gp / gl, np.inf)
+        expectancy = np.where(trades > 0, net / trades, 0.0)
+        per_day = np.where(days > 0, trades / days, 0.0)
+    return EventTable.from_columns(
+        RollingPoint,
+        ts=ts,
+        trades=trades,
+        wins=wins,
+        win_rate_pct=win_rate,
+        net=net,
+        profit_factor=pf,
+        expectancy=expectancy,
+        dd_abs=peak - bal[hi],
+        trades_per_day=per_day,
+    )
+
+
+def rolling_by_trades(profits: Any, close_ts: Any, window: int, step: int = 1) -> EventTable:
+    """Metrics over each run of `window` consecutive trades (every `step`-th window)."""
+    p, t = _sorted(profits, close_ts)
+    n = len(p)
+    if window < 1 or n < window:
+        return EventTable.empty(RollingPoint)
+    pre = _prefix(p)
+    # Window i holds trades [i, i + window) and balances bal[i..i + window].
+    peak = sliding_max(pre[3], window + 1)[::step]
+    lo = np.arange(0, n - window + 1, step)
+    hi = lo + window
+    days = (t[hi - 1] - t[lo]) / DAY
+    return _points(t[hi - 1], lo, hi, pre, peak, days)
+
+
+def rolling_by_time(
+    profits: Any, close_ts: Any, window_seconds: int, step_seconds: int = DAY, start: int | None = None
+) -> EventTable:
+    """Metrics over the trades closed in (g - window_seconds, g] for each grid time g.
+
+    The grid runs every `step_seconds` from `start` (default: the first close,
+    rounded down to a multiple of `step_seconds`) up to the last close. The
+    final window ends at the last close itself, not at the next grid time,
+    so it is not padded with time past the end of the trades.
+    """
+    p, t = _sorted(profits, close_ts)
+    if not len(p):
+        return EventTable.empty(RollingPoint)
+    if start is None:
+        start = int(t[0]) // step_seconds * step_seconds
+    grid = np.arange(start + step_seconds, int(t[-1]) + 2 * step_seconds, step_seconds, dtype=np.int64)
+    grid = grid[: np.searchsorted(grid, t[-1], side="left") + 1]
+    if len(grid):
+        grid[-1] = max(int(t[-1]), start)
+    lo = np.searchsorted(t, grid - window_seconds, side="right")
+    hi = np.searchsorted(t, grid, side="right")
+    pre = _prefix(p)
+    bal = pre[3]
+
+    # Both window ends only move forward: a deque of balance indices with
+    # decreasing balances gives each window's maximum in amortized O(1).
+    peak = np.empty(len(grid))
+    q: deque[int] = deque()
+    pushed = 0
+    for g, (a, b) in enumerate(zip(lo.tolist(), hi.tolist())):
+        while pushed <= b:
+            v = bal[pushed]
+            while q and bal[q[-1]] <= v:
+                q.pop()
+            q.append(pushed)
+            pushed += 1
+        while q[0] < a:
+            q.popleft()
+        peak[g] = bal[q[0]]
+    days = np.full(len(grid), window_seconds / DAY)
+    return _points(grid, lo, hi, pre, peak, days)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""NumPy port of Indicators/FGM_TrendRider_EA/RSIOMA_v2HHLSX_MT5.mq5 and of the EA's RSIOMA check.
+
+RSIOMA blocks many signals in analyze_rejections and
+analyze_deep_strategy, but it could only be studied through the "RSIOMA
+ESTADO: APROVADO (x > y)" / "RSIOMA STATUS: REPROVADO" lines of the signals
+the EA actually checked. `rsioma()` gives both lines of the indicator for
+every bar:
+
+- buffer 0 ("RSI", red): iRSI(RSI_Period) of the close;
+- buffer 1 ("RSI MA", blue): iMA(MA_Period, MA_Method) applied to the RSI
+  handle, i.e. drawn from the RSI's first value (bar RSI_Period) on.
+
+Version 2 of the indicator is a moving average *of* the RSI (the MT4
+original was an RSI of a moving average); this follows the .mq5 the EA
+loads. `verdict()` is CFilters::CheckRSIOMA() on those lines: a BUY is
+blocked when RSI >= overbought, when RSI < 50 (InpRSIOMA_CheckMid) or when
+RSI <= MA; a SELL mirrors it.
+
+For sweeps, `RsiomaCache` keeps every stage that other settings share:
+
+    cache = RsiomaCache(bars.close)
+    for rsi_period in (7, 14, 21):
+        for ma_period in (5, 9, 14):
+            out = cache.rsioma(rsi_period, ma_period)
+
+The price changes are computed once, each RSI period once, and each RSI's
+prefix sums once, so every SMA length on it is a single subtraction. EMA,
+SMMA and LWMA lines are cached per (RSI period, MA period, method).
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from event_table import EventTable
+from excursions import Bars, load_bars
+from indicator_math import MA_METHODS, moving_average, price_changes, rsi_from_changes, window_mean
+
+
+# What CheckRSIOMA() decides for a side on a bar (first failing rule).
+VERDICT_APPROVED, VERDICT_EXTREME, VERDICT_MID, VERDICT_STATE = range(4)
+VERDICT_NAMES = ("aprovado", "sobrecompra/sobrevenda", "nível 50", "RSI x MA")
+
+
+@dataclass(frozen=True)
+class RsiomaParams:
+    """Inputs of RSIOMA_v2HHLSX_MT5.mq5 plus the EA's Inp_RSIOMA_* filter settings."""
+
+    rsi_period: int = 14
+    ma_period: int = 9
+    ma_method: str = "sma"  # the EA always loads it with MODE_SMA
+    overbought: float = 70.0
+    oversold: float = 30.0
+    check_mid: bool = True
+
+
+@dataclass(frozen=True)
+class RsiomaResult:
+    rsi: np.ndarray  # 0 before bar rsi_period, as iRSI
+    ma: np.ndarray  # NaN where the MA is not drawn
+
+
+@dataclass(frozen=True)
+class RsiomaLogCheck:
+    ts: datetime  # log line time
+    bar_ts: datetime  # open time of the bar read
+    side: str
+    approved_log: bool
+    approved_calc: bool
+    rsi_log: float  # NaN when the line does not log it
+    rsi_calc: float
+    ma_log: float
+    ma_calc: float
+
+
+class RsiomaCache:
+    """RSIOMA lines of one price series, caching the stages shared between settings."""
+
+    def __init__(self, close: Any):
+        self.close = np.asarray(close, dtype=np.float64)
+        self._changes: tuple[np.ndarray, np.ndarray] | None = None
+        self._rsi: dict[int, np.ndarray] = {}
+        self._prefix: dict[int, np.ndarray] = {}
+        self._ma: dict[tuple[int, int, str], np.ndarray] = {}
+
+    def rsi(self, period: int) -> np.ndarray:
+        if period not in self._rsi:
+            if not len(self.close):
+                self._rsi[period] = np.zeros(0)
+            else:
+                if self._changes is None:
+                    self._changes = price_changes(self.close)
+                self._rsi[period] = rsi_from_changes(*self._changes, period)
+        return self._rsi[period]
+
+    def ma(self, rsi_period: int, ma_period: int, method: str = "sma") -> np.ndarray:
+        key = (rsi_period, ma_period, method)
+        if key not in self._ma:
+            rsi = self.rsi(rsi_period)
+            if method == "sma":
+                if rsi_period not in self._prefix:
+                    self._prefix[rsi_period] = np.concatenate(([0.0], np.cumsum(rsi[rsi_period:])))
+                out = np.full(len(rsi), np.nan)
+                out[rsi_period:] = window_mean(self._prefix[rsi_period], ma_period)
+            else:
+                out = moving_average(rsi, ma_period, method, begin=rsi_period)
+            self._ma[key] = out
+        return self._ma[key]
+
+    def rsioma(self, rsi_period: int = 14, ma_period: int = 9, method: str = "sma") -> RsiomaResult:
+        return RsiomaResult(self.rsi(rsi_period), self.ma(rsi_period, ma_period, method))
+
+
+def rsioma(close: Any, params: RsiomaParams = RsiomaParams()) -> RsiomaResult:
+    """Both lines of the indicator for every bar (one-off; use RsiomaCache for sweeps)."""
+    return RsiomaCache(close).rsioma(params.rsi_period, params.ma_period, params.ma_method)
+
+
+def verdict(rsi: Any, ma: Any, buy: Any, params: RsiomaParams = RsiomaParams()) -> np.ndarray:
+    """VERDICT_* of CheckRSIOMA() for each (RSI, MA, side); bars without an MA fail the state rule."""
+    rsi = np.asarray(rsi, dtype=np.float64)
+    ma = np.asarray(ma, dtype=np.float64)
+    buy = np.asarray(buy, dtype=bool)
+    extreme = np.where(buy, rsi >= params.overbought, rsi <= params.oversold)
+    mid = params.check_mid & np.where(buy, rsi < 50, rsi > 50)
+    state_ok = np.where(buy, rsi > ma, rsi < ma)
+    return np.select([extreme, mid, ~state_ok], [VERDICT_EXTREME, VERDICT_MID, VERDICT_STATE], VERDICT_APPROVED)
+
+
+def _bar_index(bars: Bars, ts: np.ndarray, shift: int) -> tuple[np.ndarray, np.ndarray]:
+    """Bar `shift` bars before the one holding each time, and which times fall inside the history."""
+    at = np.searchsorted(bars.ts, ts, side="right") - 1 - shift
+    if not len(bars):
+        return at, np.zeros(len(ts), dtype=bool)
+    period = int(np.median(np.diff(bars.ts))) if len(bars) > 1 else 60
+    return at, (at >= 0) & (ts < bars.ts[-1] + 2 * period)
+
+
+def match_log_checks(
+    bars: Bars, out: RsiomaResult, checks: EventTable, params: RsiomaParams = RsiomaParams(), shift: int = 1
+) -> EventTable:
+    """RsiomaLogCheck of every log_events RsiomaCheck line against the port.
+
+    CheckRSIOMA() reads the bar `shift` bars before the one holding the
+    line's time (the FGM signal's bar). Lines outside the history are left out.
+    """
+    ts = np.asarray(checks["ts"], dtype=np.int64)
+    at, inside = _bar_index(bars, ts, shift)
+    at, sel = at[inside], np.flatnonzero(inside)
+    side = checks["side"][sel]
+    rsi, ma = out.rsi[at], out.ma[at]
+    return EventTable.from_columns(
+        RsiomaLogCheck,
+        ts=ts[sel],
+        bar_ts=bars.ts[at],
+        side=side,
+        approved_log=np.asarray(checks["approved"], dtype=bool)[sel],
+        approved_calc=verdict(rsi, ma, side == "BUY", params) == VERDICT_APPROVED,
+        rsi_log=checks["rsi"][sel],
+        rsi_calc=rsi,
+        ma_log=checks["ma"][sel],
+        ma_calc=ma,
+    )
+
+
+def _int_list(text: str) -> list[int]:
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="RSIOMA calculado sobre o histórico de barras, com varredura de períodos")
+    ap.add_argument("bars", help="CSV de barras exportado do MT5")
+    ap.add_argument("--log", help="log do MT5: compara com as linhas RSIOMA e varre os períodos nesses sinais")
+    ap.add_argument("--rsi", default="7,9,14,21", help="períodos de RSI da varredura")
+    ap.add_argument("--ma", default="5,9,14,21", help="períodos da MA do RSI da varredura")
+    ap.add_argument("--method", default="sma", choices=MA_METHODS)
+    ap.add_argument("--shift", type=int, default=1, help="barra lida pelo EA em relação à linha do log")
+    args = ap.parse_args()
+
+    bars = load_bars(args.bars)
+    cache = RsiomaCache(bars.close)
+    params = RsiomaParams(ma_method=args.method)
+    out = cache.rsioma(params.rsi_period, params.ma_period, params.ma_method)
+    drawn = ~np.isnan(out.ma)
+    print(f"Barras: {len(bars)} | RSI > MA em {(out.rsi[drawn] > out.ma[drawn]).mean() * 100:.1f}% das barras")
+
+    if args.log:
+        from event_cache import load_event_tables
+
+        checks = load_event_tables(Path(args.log))["rsioma"]
+        check = match_log_checks(bars, out, checks, params, args.shift)
+        if not check:
+            print("Nenhuma linha RSIOMA dentro do histórico de barras")
+            return 0
+        logged = ~np.isnan(check["rsi_log"])
+        close_rsi = np.abs(check["rsi_calc"][logged] - check["rsi_log"][logged]) <= 0.01
+        print(f"\nLinhas RSIOMA do log no histórico: {len(check)}")
+        print(
+            f"  Decisão igual: {(check['approved_calc'] == check['approved_log']).mean() * 100:.1f}% | "
+            f"RSI igual (±0.01): {close_rsi.mean() * 100 if logged.any() else 0:.1f}%"
+        )
+        at, inside = _bar_index(bars, np.asarray(checks["ts"], dtype=np.int64), args.shift)
+        at, buy = at[inside], checks["side"][inside] == "BUY"
+        sample = "sinais checados no log"
+    else:
+        at = np.tile(np.arange(len(bars)), 2)
+        buy = np.repeat([True, False], len(bars))
+        sample = "barras (BUY e SELL)"
+
+    print(f"\nVarredura ({args.method.upper()}) — % aprovado nos {sample}:")
+    ma_periods = _int_list(args.ma)
+    print("  RSI \\ MA " + "".join(f"{m:>8}" for m in ma_periods))
+    for rsi_period in _int_list(args.rsi):
+        row = []
+        for ma_period in ma_periods:
+            res = cache.rsioma(rsi_period, ma_period, args.method)
+            ok = verdict(res.rsi[at], res.ma[at], buy, params) == VERDICT_APPROVED
+            row.append(f"{ok.mean() * 100 if len(ok) else 0:7.1f}%")
+        print(f"  {rsi_period:>8} " + "".join(row))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
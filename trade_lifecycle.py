@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""Single-pass assembly of each trade's lifecycle, keyed by ticket (stdlib-only).
+
+One trade is spread over many log lines:
+
+    Sinal detectado! ...                    the signal
+    PASSO 1: ... / RSIOMA ... / OBV MACD ... its filter checks
+    deal #D buy ... (based on order #T)     tester: the opening deal
+    [INFO] TRADE: BUY @ ...                 the EA's open line
+    🎯 [BE] Break Even ATIVADO para BUY #T  break-even, by position ticket
+    📈 [TS] Trailing MOVEU BUY #T | ...     each trailing-stop move
+    stop loss triggered #T ...              tester: SL/TP hit
+    [INFO] BAD ENTRY ... | Dir=BUY | ...    loss diagnostics (before the close)
+    [INFO] TRADE CLOSED: LOSS | ...         the EA's close line
+
+`LifecycleAssembler` is a state machine fed those events in file order. It
+keeps only the latest signal, the positions still open and the hints seen on
+the current tick, and hands out one `TradeLifecycle` as soon as its
+TRADE CLOSED line arrives, so memory does not grow with the log.
+
+Positions may overlap. The EA's open/close lines carry no ticket, so:
+
+- an open takes the order ticket of the opening deal logged on the same
+  tick for the same side; otherwise it gets one from the first BE/TS line
+  naming a ticket for that side;
+- a close goes to the position named by an SL/TP trigger on the same tick,
+  else to the oldest open position of the BAD ENTRY's side (same tick),
+  else to the oldest one on the other side of the closing deal (same tick),
+  else to the oldest open position (the single-position case);
+- a close with no open position is still reported, without open details.
+
+`iter_lifecycles()` runs it over log lines; `lifecycles_from_events()` over
+cached `log_events` (signals, opens, closes and BAD ENTRY only).
+"""
+
+from __future__ import annotations
+
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Iterator
+
+import log_events
+from log_events import (
+    CLOSE_RE,
+    OBV_DEBUG_RE,
+    OPEN_RE,
+    RSIOMA_APPROVED_RE,
+    RSIOMA_BLOCKED_RE,
+    RSIOMA_REJECTED_RE,
+    SIGNAL_RE,
+    BadEntry,
+    LogEvents,
+    LogLine,
+    dispatch,
+)
+from log_time import parse_ts
+
+
+# Positions open at once before the oldest is given up as never closed.
+MAX_OPEN = 1000
+
+
+@dataclass
+class SignalState:
+    """A "Sinal detectado!" signal and the filter checks logged after it."""
+
+    id: int  # 1-based, in log order
+    ts: datetime
+    entry: int  # 1=BUY, -1=SELL
+    strength: int
+    confluence: float
+    trend_ok: bool = False  # PASSO 1 confirmed
+    trend_price: float = 0.0
+    rsioma_ok: bool = False
+    rsioma_rsi: float = 0.0
+    rsioma_ma: float = 0.0
+    obv_ok: bool = False
+    obv_hist: float = 0.0
+    obv_color: int = -1
+    conflict: bool = False  # rejected: Entry/Strength conflict
+    executed: bool = False
+
+
+@dataclass
+class TradeLifecycle:
+    ticket: int | None  # position ticket, None if the log never names it
+    side: str  # BUY/SELL, "" for a close without a known open
+    open_ts: datetime | None = None
+    open_price: float = 0.0
+    volume: float = 0.0
+    sl: float = 0.0
+    tp: float = 0.0
+    signal: SignalState | None = None
+    be_ts: datetime | None = None  # first Break Even activation
+    trailing_moves: int = 0
+    last_trailing_sl: float | None = None
+    close_ts: datetime | None = None
+    outcome: str = ""  # WIN/LOSS
+    profit: float = 0.0
+    reason: str = ""
+    bad_entry: BadEntry | None = None
+    # Set when the position was still open at the end of the log (or evicted).
+    unclosed: bool = False
+
+    @property
+    def closed(self) -> bool:
+        return self.close_ts is not None
+
+
+TICKET_RE = re.compile(r".*\[(?:BE|TS)\].*?(?P<side>BUY|SELL) #(?P<ticket>\d+)")
+BE_RE = re.compile(r".*\[BE\] Break Even ATIVADO para (?P<side>BUY|SELL) #(?P<ticket>\d+)")
+TS_MOVE_RE = re.compile(r".*\[TS\] Trailing MOVEU (?P<side>BUY|SELL) #(?P<ticket>\d+) \| Novo SL: (?P<sl>[0-9.]+)")
+DEAL_RE = re.compile(r"deal #\d+ (?P<side>buy|sell) .*\(based on order #(?P<order>\d+)\)")
+TRIGGER_RE = re.compile(r"(?:stop loss|take profit) triggered #(?P<ticket>\d+) ")
+TREND_OK_RE = re.compile(r"PASSO 1:.*CONFIRMADA.*Close[=>< ]+(?P<close>[\d.]+)")
+OBV_APPROVED_RE = re.compile(r"OBV MACD:.*APROVADO")
+
+
+# Parsers per leading literal (see log_events.dispatch); each returns
+# (kind, data) or None.
+
+def _signal(rec: LogLine):
+    m = SIGNAL_RE.match(rec.msg)
+    return m and ("signal", (int(m["entry"]), int(m["strength"]), float(m["conf"])))
+
+
+def _passo(rec: LogLine):
+    m = TREND_OK_RE.match(rec.msg)
+    return m and ("trend_ok", float(m["close"]))
+
+
+def _rsioma(rec: LogLine):
+    if m := RSIOMA_APPROVED_RE.match(rec.msg):
+        return "rsioma", (True, float(m["rsi"]), float(m["ma"]))
+    if RSIOMA_REJECTED_RE.match(rec.msg) or RSIOMA_BLOCKED_RE.match(rec.msg):
+        return "rsioma", (False, None, None)
+    return None
+
+
+def _obv(rec: LogLine):
+    if rec.msg.startswith("OBV MACD STATUS: REPROVADO"):
+        return "obv", False
+    if OBV_APPROVED_RE.match(rec.msg):
+        return "obv", True
+    return None
+
+
+def _obv_debug(rec: LogLine):
+    m = OBV_DEBUG_RE.match(rec.msg)
+    return m and ("obv_hist", (float(m["hist1"]), int(m["color"])))
+
+
+def _conflict(rec: LogLine):
+    return ("conflict", None) if rec.msg.startswith("🚫 SINAL REJEITADO: Conflito Entry/Strength") else None
+
+
+def _open(rec: LogLine):
+    m = OPEN_RE.match(rec.msg)
+    return m and ("open", (m["side"], float(m["price"]), float(m["vol"]), float(m["sl"]), float(m["tp"])))
+
+
+def _close(rec: LogLine):
+    m = CLOSE_RE.match(rec.msg)
+    return m and ("close", (m["outcome"], float(m["profit"]), m["reason"].strip()))
+
+
+def _bad_entry(rec: LogLine):
+    values = log_events._bad_entry(rec)
+    return values and ("bad_entry", BadEntry(-1, parse_ts(rec.ts), *values))
+
+
+def _be(rec: LogLine):
+    m = BE_RE.match(rec.msg)
+    return m and ("be", (m["side"], int(m["ticket"])))
+
+
+def _ts(rec: LogLine):
+    if m := TS_MOVE_RE.match(rec.msg):
+        return "trailing", (m["side"], int(m["ticket"]), float(m["sl"]))
+    m = TICKET_RE.match(rec.msg)
+    return m and ("ticket", (m["side"], int(m["ticket"])))
+
+
+def _deal(rec: LogLine):
+    m = DEAL_RE.match(rec.msg)
+    return m and ("deal", (m["side"].upper(), int(m["order"])))
+
+
+def _trigger(rec: LogLine):
+    m = TRIGGER_RE.match(rec.msg)
+    return m and ("trigger", int(m["ticket"]))
+
+
+LIFECYCLE_PARSERS = {
+    "Sinal": _signal,
+    "PASSO": _passo,
+    "RSIOMA": _rsioma,
+    "OBV": _obv,
+    "[OBV": _obv_debug,
+    "🚫": _conflict,
+    "TRADE:": _open,
+    "TRADE": _close,
+    "BAD": _bad_entry,
+    "🎯": _be,
+    "📈": _ts,
+    "🚀": _ts,
+    "deal": _deal,
+    "stop": _trigger,
+    "take": _trigger,
+}
+
+# Literals of every line LIFECYCLE_PARSERS can match, for
+# LogSource.marked_lines().
+LIFECYCLE_MARKERS = (
+    "Sinal detectado!",
+    "PASSO 1:",
+    "RSIOMA",
+    "OBV MACD",
+    "SINAL REJEITADO",
+    "TRADE:",
+    "TRADE CLOSED:",
+    "BAD ENTRY",
+    "[BE]",
+    "[TS]",
+    "deal #",
+    "triggered #",
+)
+
+
+class LifecycleAssembler:
+    """State machine turning EA events into TradeLifecycle records (see module docstring)."""
+
+    def __init__(self, max_open: int = MAX_OPEN):
+        self.max_open = max_open
+        self.signal: SignalState | None = None
+        self.signals_seen = 0
+        # Open positions by arrival number (oldest first), and ticket -> number.
+        self._open: OrderedDict[int, TradeLifecycle] = OrderedDict()
+        self._by_ticket: dict[int, int] = {}
+        self._serial = 0
+        # Hints seen on the current tick, each with its timestamp.
+        self._deal: tuple[datetime, str, int] | None = None
+        self._trigger: tuple[datetime, int] | None = None
+        self._bad: tuple[datetime, BadEntry] | None = None
+
+    @property
+    def open_positions(self) -> list[TradeLifecycle]:
+        return list(self._open.values())
+
+    def feed(self, ts: datetime, kind: str, data) -> list[TradeLifecycle]:
+        """Apply one event (tester time, kind, data); returns the lifecycles it completed."""
+        done: list[TradeLifecycle] = []
+        getattr(self, f"_on_{kind}")(ts, data, done)
+        return done
+
+    def finish(self) -> list[TradeLifecycle]:
+        """Positions still open at the end of the log, marked `unclosed`."""
+        rest = list(self._open.values())
+        for lc in rest:
+            lc.unclosed = True
+        self._open.clear()
+        self._by_ticket.clear()
+        return rest
+
+    # -- signal and its checks ----------------------------------------------
+
+    def _on_signal(self, ts, data, done):
+        entry, strength, confluence = data
+        self.signals_seen += 1
+        self.signal = SignalState(self.signals_seen, ts, entry, strength, confluence)
+
+    def _on_trend_ok(self, ts, price, done):
+        if self.signal:
+            self.signal.trend_ok = True
+            self.signal.trend_price = price
+
+    def _on_rsioma(self, ts, data, done):
+        if self.signal:
+            ok, rsi, ma = data
+            self.signal.rsioma_ok = ok
+            if ok:
+                self.signal.rsioma_rsi, self.signal.rsioma_ma = rsi, ma
+
+    def _on_obv(self, ts, ok, done):
+        if self.signal:
+            self.signal.obv_ok = ok
+
+    def _on_obv_hist(self, ts, data, done):
+        if self.signal:
+            self.signal.obv_hist, self.signal.obv_color = data
+
+    def _on_conflict(self, ts, data, done):
+        if self.signal:
+            self.signal.conflict = True
+
+    # -- positions -------------------------------------------------------------
+
+    def _on_deal(self, ts, data, done):
+        side, order = data
+        self._deal = (ts, side, order)
+
+    def _on_trigger(self, ts, ticket, done):
+        self._trigger = (ts, ticket)
+
+    def _on_bad_entry(self, ts, bad, done):
+        self._bad = (ts, bad)
+
+    def _pop(self, serial: int) -> TradeLifecycle:
+        lc = self._open.pop(serial)
+        if lc.ticket is not None:
+            self._by_ticket.pop(lc.ticket, None)
+        return lc
+
+    def _on_open(self, ts, data, done):
+        side, price, volume, sl, tp = data
+        lc = TradeLifecycle(None, side, ts, price, volume, sl, tp)
+        deal = self._deal
+        if deal and deal[0] == ts and deal[1] == side and deal[2] not in self._by_ticket:
+            lc.ticket = deal[2]
+            self._deal = None
+        if self.signal is not None:
+            # A signal opens at most one trade.
+            self.signal.executed = True
+            lc.signal = self.signal
+            self.signal = None
+
+        self._serial += 1
+        self._open[self._serial] = lc
+        if lc.ticket is not None:
+            self._by_ticket[lc.ticket] = self._serial
+        if len(self._open) > self.max_open:
+            oldest = self._pop(next(iter(self._open)))
+            oldest.unclosed = True
+            done.append(oldest)
+
+    def _position(self, side: str, ticket: int) -> TradeLifecycle | None:
+        """Open position `ticket`; the oldest one of `side` without a ticket gets it if none has it."""
+        serial = self._by_ticket.get(ticket)
+        if serial is not None:
+            return self._open[serial]
+        for serial, lc in self._open.items():
+            if lc.ticket is None and lc.side == side:
+                lc.ticket = ticket
+                self._by_ticket[ticket] = serial
+                return lc
+        return None
+
+    def _on_ticket(self, ts, data, done):
+        self._position(*data)
+
+    def _on_be(self, ts, data, done):
+        lc = self._position(*data)
+        if lc is not None and lc.be_ts is None:
+            lc.be_ts = ts
+
+    def _on_trailing(self, ts, data, done):
+        side, ticket, sl = data
+        lc = self._position(side, ticket)
+        if lc is not None:
+            lc.trailing_moves += 1
+            lc.last_trailing_sl = sl
+
+    def _oldest(self, side: str | None) -> int | None:
+        for serial, lc in self._open.items():
+            if side is None or lc.side == side:
+                return serial
+        return None
+
+    def _on_close(self, ts, data, done):
+        outcome, profit, reason = data
+        bad = self._bad[1] if self._bad and self._bad[0] == ts else None
+        serial = None
+        if self._trigger and self._trigger[0] == ts:
+            serial = self._by_ticket.get(self._trigger[1])
+        if serial is None and bad is not None:
+            serial = self._oldest(bad.direction)
+        if serial is None and self._deal and self._deal[0] == ts:
+            # The closing deal is on the other side of the position.
+            serial = self._oldest("SELL" if self._deal[1] == "BUY" else "BUY")
+        if serial is None:
+            serial = self._oldest(None)
+        self._trigger = self._deal = self._bad = None
+
+        lc = self._pop(serial) if serial is not None else TradeLifecycle(None, "")
+        lc.close_ts = ts
+        lc.outcome, lc.profit, lc.reason = outcome, profit, reason
+        lc.bad_entry = bad
+        done.append(lc)
+
+
+def iter_lifecycles(lines: Iterable[str], include_unclosed: bool = False) -> Iterator[TradeLifecycle]:
+    """Lifecycles of the trades in `lines`, each yielded when it closes."""
+    asm = LifecycleAssembler()
+    for rec, (kind, data) in dispatch(lines, LIFECYCLE_PARSERS):
+        yield from asm.feed(parse_ts(rec.ts), kind, data)
+    if include_unclosed:
+        yield from asm.finish()
+
+
+def lifecycles_from_events(ev: LogEvents, include_unclosed: bool = False) -> Iterator[TradeLifecycle]:
+    """iter_lifecycles() over cached events (no filter checks, tickets or BE/TS)."""
+    events = sorted(
+        [
+            *((s.seq, s.ts, "signal", (s.entry, s.strength, s.confluence)) for s in ev.signals),
+            *((o.seq, o.ts, "open", (o.side, o.price, o.volume, o.sl, o.tp)) for o in ev.opens),
+            *((c.seq, c.ts, "close", (c.outcome, c.profit, c.reason)) for c in ev.closes),
+            *((b.seq, b.ts, "bad_entry", b) for b in ev.bad_entries),
+        ],
+        key=lambda e: e[0],
+    )
+    asm = LifecycleAssembler()
+    for _, ts, kind, data in events:
+        yield from asm.feed(ts, kind, data)
+    if include_unclosed:
+        yield from asm.finish()
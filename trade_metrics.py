@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Summary metrics of a sequence of closed-trade profits, vectorized with numpy.
+
+Profit factor, win rate, expectancy, drawdown and streaks used to be
+re-implemented as Python loops in each analyzer. They are all a handful of
+passes over one profit array:
+
+    m = trade_metrics(profits, initial_deposit=100.0, ts=close_ts)
+    m.profit_factor, m.max_dd_abs, m.max_consec_losses, ...
+
+- `equity_curve()`: balance before/after each trade, running peak, and
+  absolute and percent drawdown. It is one cumsum plus one
+  maximum.accumulate. The peak includes the starting balance, so a first
+  losing trade is already a drawdown.
+- `run_lengths()` / `max_run()`: lengths of runs of True, found from the
+  edges of the mask (no per-trade loop).
+- `group_stats()`: trades, PnL, wins and losses per key via `bincount`.
+  Groups come in order of first appearance.
+
+A win is a profit > 0 and a loss a profit < 0, and break-even trades count
+for neither. Scripts that go by the EA's WIN/LOSS label pass their own
+`win` / `loss` masks instead. When `ts` is given, trades are taken in
+timestamp order (stable), otherwise in the order given. Ten million
+trades take well under a second.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import Any
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class EquityCurve:
+    balance_before: np.ndarray
+    balance_after: np.ndarray
+    peak: np.ndarray
+    dd_abs: np.ndarray
+    dd_pct: np.ndarray  # 0 where the peak is not positive
+
+
+@dataclass(frozen=True)
+class TradeMetrics:
+    trades: int
+    wins: int
+    losses: int
+    win_rate_pct: float
+    gross_profit: float
+    gross_loss: float  # positive
+    net: float
+    profit_factor: float  # inf without losses
+    expectancy: float
+    avg_win: float
+    avg_loss: float  # negative (mean of the losses)
+    std_profit: float  # population std, 0 below 2 trades
+    max_dd_abs: float
+    max_dd_pct: float
+    dd_pct_at_max_abs: float  # percent drawdown where the absolute one peaks
+    max_consec_wins: int
+    max_consec_losses: int
+    final_balance: float
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class GroupStats:
+    keys: np.ndarray
+    trades: np.ndarray
+    pnl: np.ndarray
+    wins: np.ndarray
+    losses: np.ndarray
+
+    def win_rate_pct(self) -> np.ndarray:
+        return np.divide(self.wins * 100.0, self.trades, out=np.zeros(len(self.trades)), where=self.trades > 0)
+
+
+def _order(ts: Any) -> np.ndarray | None:
+    """Stable timestamp order, or None if `ts` is already sorted."""
+    if ts is None:
+        return None
+    t = np.asarray(ts)
+    if len(t) < 2 or (t[1:] >= t[:-1]).all():
+        return None
+    return np.argsort(t, kind="stable")
+
+
+def equity_curve(profits: Any, initial_deposit: float = 0.0) -> EquityCurve:
+    """Closed-trade balance, running peak and drawdown after each trade."""
+    p = np.asarray(profits, dtype=np.float64)
+    # cumsum adds left to right, so starting from the deposit gives exactly
+    # the balances of a running `balance += profit`.
+    balance = np.cumsum(np.concatenate(([float(initial_deposit)], p)))
+    peak = np.maximum.accumulate(balance)[1:]
+    after = balance[1:]
+    dd_abs = peak - after
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dd_pct = dd_abs / peak
+    dd_pct *= 100.0
+    positive = peak > 0
+    if not positive.all():
+        dd_pct[~positive] = 0.0
+    return EquityCurve(balance[:-1], after, peak, dd_abs, dd_pct)
+
+
+def run_lengths(mask: Any) -> np.ndarray:
+    """Lengths of the runs of True in `mask`, in order."""
+    m = np.asarray(mask, dtype=bool)
+    edges = np.diff(np.concatenate(([False], m, [False])).view(np.int8))
+    return np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+
+def max_run(mask: Any) -> int:
+    """Longest run of True in `mask` (0 if none)."""
+    runs = run_lengths(mask)
+    return int(runs.max()) if len(runs) else 0
+
+
+def trade_metrics(
+    profits: Any, initial_deposit: float = 0.0, ts: Any = None, *, win: Any = None, loss: Any = None
+) -> TradeMetrics:
+    """All summary metrics of `profits` (see module docstring)."""
+    p = np.asarray(profits, dtype=np.float64)
+    win = p > 0 if win is None else np.asarray(win, dtype=bool)
+    loss = p < 0 if loss is None else np.asarray(loss, dtype=bool)
+    order = _order(ts)
+    if order is not None:
+        p, win, loss = p[order], win[order], loss[order]
+    n = len(p)
+    n_win = int(np.count_nonzero(win))
+    n_loss = int(np.count_nonzero(loss))
+    gross_profit = float(np.dot(p, win))
+    gross_loss = abs(float(np.dot(p, loss)))
+    eq = equity_curve(p, initial_deposit)
+    final = float(eq.balance_after[-1]) if n else float(initial_deposit)
+    at_max = int(np.argmax(eq.dd_abs)) if n else -1
+    return TradeMetrics(
+        trades=n,
+        wins=n_win,
+        losses=n_loss,
+        win_rate_pct=n_win / n * 100.0 if n else 0.0,
+        gross_profit=gross_profit,
+        gross_loss=gross_loss,
+        net=final - initial_deposit,
+        profit_factor=gross_profit / gross_loss if gross_loss > 0 else float("inf"),
+        expectancy=float(p.mean()) if n else 0.0,
+        avg_win=gross_profit / n_win if n_win else 0.0,
+        avg_loss=-gross_loss / n_loss if n_loss else 0.0,
+        std_profit=float(p.std()) if n >= 2 else 0.0,
+        max_dd_abs=float(eq.dd_abs[at_max]) if n else 0.0,
+        max_dd_pct=float(eq.dd_pct.max()) if n else 0.0,
+        dd_pct_at_max_abs=float(eq.dd_pct[at_max]) if n else 0.0,
+        max_consec_wins=max_run(win),
+        max_consec_losses=max_run(loss),
+        final_balance=final,
+    )
+
+
+def group_stats(keys: Any, profits: Any, *, win: Any = None, loss: Any = None) -> GroupStats:
+    """Per-key trades, PnL, wins and losses, keys in order of first appearance."""
+    k = np.asarray(keys)
+    p = np.asarray(profits, dtype=np.float64)
+    win = p > 0 if win is None else np.asarray(win, dtype=bool)
+    loss = p < 0 if loss is None else np.asarray(loss, dtype=bool)
+    if not len(k):
+        empty = np.empty(0, dtype=np.int64)
+        return GroupStats(k, empty, np.empty(0), empty, empty)
+    if k.dtype.kind in "iu" and int(k.max()) - int(k.min()) <= 2 * len(k):
+        # Small integer keys (hours, codes, strengths): no sort needed.
+        offset = k - k.min()
+        seen = np.bincount(offset) > 0
+        first = np.full(len(seen), len(k))
+        np.minimum.at(first, offset, np.arange(len(k)))
+        uniq = np.flatnonzero(seen) + k.min()
+        first = first[seen]
+        inverse = np.cumsum(seen)[offset] - 1
+    else:
+        uniq, first, inverse = np.unique(k, return_index=True, return_inverse=True)
+    # Renumber the groups by first appearance.
+    order = np.argsort(first, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    codes = rank[inverse.ravel()]
+    size = len(uniq)
+    return GroupStats(
+        keys=uniq[order].astype(k.dtype, copy=False),
+        trades=np.bincount(codes, minlength=size),
+        pnl=np.bincount(codes, weights=p, minlength=size),
+        wins=np.bincount(codes[win], minlength=size),
+        losses=np.bincount(codes[loss], minlength=size),
+    )